@@ -0,0 +1,102 @@
+import os
+import re
+import tempfile
+import time
+import uuid
+
+# Output files that have to outlive a request (job downloads) are kept under ARTIFACT_DIR.
+# Files older than ARTIFACT_TTL_SECONDS are deleted, and the oldest files are deleted first
+# once the directory exceeds ARTIFACT_MAX_BYTES.
+ARTIFACT_DIR = os.environ.get('ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'bilxy_artifacts'))
+ARTIFACT_TTL_SECONDS = int(os.environ.get('ARTIFACT_TTL_SECONDS', '3600'))
+ARTIFACT_MAX_BYTES = int(os.environ.get('ARTIFACT_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+ARTIFACT_ID_PATTERN = re.compile(r'^[0-9a-f]{32}(\.[a-z]+)?$')
+
+
+def _artifact_path(artifact_id):
+    # Artifact ids are generated by put; anything else is not a valid id
+    if not artifact_id or not ARTIFACT_ID_PATTERN.match(artifact_id):
+        return None
+    return os.path.join(ARTIFACT_DIR, artifact_id)
+
+
+def put(data, suffix=''):
+    """Store bytes, or an iterable of bytes chunks, as a new artifact and return its id.
+    Evicts expired and excess artifacts first."""
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    evict(reserve_bytes=len(data) if isinstance(data, bytes) else 0)
+    artifact_id = uuid.uuid4().hex + suffix
+    fd, temp_path = tempfile.mkstemp(dir=ARTIFACT_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in ([data] if isinstance(data, bytes) else data):
+                file.write(chunk)
+        os.replace(temp_path, _artifact_path(artifact_id))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return artifact_id
+
+
+def path(artifact_id):
+    """Path of a stored artifact, or None if it never existed, expired or was evicted"""
+    artifact_path = _artifact_path(artifact_id)
+    if not artifact_path:
+        return None
+    try:
+        stat = os.stat(artifact_path)
+    except FileNotFoundError:
+        return None
+    if time.time() - stat.st_mtime > ARTIFACT_TTL_SECONDS:
+        delete(artifact_id)
+        return None
+    return artifact_path
+
+
+def delete(artifact_id):
+    artifact_path = _artifact_path(artifact_id)
+    if artifact_path:
+        try:
+            os.unlink(artifact_path)
+        except FileNotFoundError:
+            pass
+
+
+def evict(reserve_bytes=0, max_bytes=None):
+    """Delete expired artifacts, then the oldest ones until reserve_bytes more fit in max_bytes"""
+    max_bytes = ARTIFACT_MAX_BYTES if max_bytes is None else max_bytes
+    cutoff = time.time() - ARTIFACT_TTL_SECONDS
+    entries = []
+    total_size = 0
+    try:
+        names = os.listdir(ARTIFACT_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        artifact_path = os.path.join(ARTIFACT_DIR, name)
+        try:
+            stat = os.stat(artifact_path)
+        except FileNotFoundError:
+            continue
+        # Leftover .tmp files from an interrupted put expire like everything else
+        if stat.st_mtime < cutoff:
+            try:
+                os.unlink(artifact_path)
+            except FileNotFoundError:
+                pass
+            continue
+        if name.endswith('.tmp'):
+            continue
+        entries.append((stat.st_mtime, stat.st_size, artifact_path))
+        total_size += stat.st_size
+
+    for mtime, size, artifact_path in sorted(entries):
+        if total_size + reserve_bytes <= max_bytes:
+            break
+        try:
+            os.unlink(artifact_path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
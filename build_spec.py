@@ -7,7 +7,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=['pandas', 'openpyxl', 'PyPDF2', 'pdfplumber'],
+    hiddenimports=['pandas', 'openpyxl', 'PyPDF2', 'pdfplumber', 'pymupdf'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
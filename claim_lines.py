@@ -0,0 +1,421 @@
+import re
+
+import keyword_match
+
+# Shared by the claims parsers. A line is split into tokens once and every token is classified
+# once per parser into one shape character: its kind (see the kinds below) and what it can be
+# further on in a row (see the flags below). Reports repeat most of their words, so nearly every
+# token is a table lookup. How a line parses depends only on its shape, apart from the values it
+# takes from its tokens, so the parse is worked out once per shape (a plan, see plan) and each
+# line of that shape only picks out its fields.
+
+DATE_PATTERN = re.compile(r'\d{2}/\d{2}/\d{2}')
+INDICATORS = frozenset(['Pri', 'Sec', 'Oth'])
+SUB_INDICATORS = frozenset(['E', 'W', 'P', 'F', 'H'])
+ID_PATTERN = re.compile(r'[A-Za-z0-9\-_]+')
+ID_TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9\-_]+$')
+OVERDUE_DIGITS = re.compile(r'\d{1,3}')
+# ASCII digits all read as 0 when classifying a token (see token_shape)
+ZERO_DIGITS = str.maketrans('123456789', '000000000')
+REPEAT_COUNTS = re.compile(r'\{\d*,?\d*\}')
+# Where split_glued_account inserts a space: a digit or X running into a capital letter
+ACCOUNT_GAP_PATTERN = re.compile(r'(?<=[0-9X])(?=[A-Z])')
+
+# Token kinds. The date kinds come first: a token holding a date is never anything else.
+DATE_KIND = 'D'           # a date
+DATE_FIRST_KIND = 'T'     # a date with more text run on ('09/15/2205/27/25')
+DATE_IN_NAME_KIND = 'A'   # a name word (see name_word) with a date inside
+DATE_INSIDE_KIND = 'B'    # any other token with a date inside
+INDICATOR_KIND = 'I'      # Pri/Sec/Oth
+SUB_INDICATOR_KIND = 'E'  # E/W/P/F/H
+NAME_KIND = 'N'           # a name word
+MONEY_KIND = 'M'          # an amount by money_pattern (amounts have no letters, so no name word is one)
+OTHER_KIND = 'O'
+KINDS = (DATE_KIND + DATE_FIRST_KIND + DATE_IN_NAME_KIND + DATE_INSIDE_KIND + INDICATOR_KIND + SUB_INDICATOR_KIND +
+         NAME_KIND + MONEY_KIND + OTHER_KIND)
+# Shape flags: what a token can be further on in a row
+AMOUNT_FLAG = 1       # a claim amount (see token_value)
+OVERDUE_FLAG = 2      # an over due
+STATUS_FLAG = 4       # a status word
+ID_FLAG = 8           # an insurance ID, or starts with one
+ID_TOKEN_FLAG = 16    # an insurance ID as a whole
+FLAG_COUNT = 32
+# A token's shape character is chr(SHAPE_BASE + its kind's index in KINDS * FLAG_COUNT + its flags)
+SHAPE_BASE = 0x100
+# str.translate table giving the kinds of a shape
+SHAPE_KINDS = {SHAPE_BASE + index * FLAG_COUNT + flags: kind
+               for index, kind in enumerate(KINDS) for flags in range(FLAG_COUNT)}
+# Shape characters of a line before it is read, in place of the above: tokens that may make the
+# line a header, and tokens where split_glued_account inserts a space
+HEADER_KIND = 'h'
+GAP_KIND = 'g'
+
+# Plan forms (see plan)
+FEW_TOKENS = 'few tokens'
+NO_DATE = 'no date'
+GLUED_DATES = 'glued dates'
+PARTS_SLICE = 'parts slice'
+PARTS_PICKED = 'parts picked'
+
+TOKEN_TABLE_SIZE = 1 << 16
+
+
+def shape_char(kind, flags):
+    return chr(SHAPE_BASE + KINDS.index(kind) * FLAG_COUNT + flags)
+
+
+def shape_chars(kinds):
+    """The shape characters of the tokens of the given kinds"""
+    return ''.join(shape_char(kind, flags) for kind in kinds for flags in range(FLAG_COUNT))
+
+
+def shape_flags(shape):
+    """The flags of each token of a shape"""
+    return [(ord(char) - SHAPE_BASE) % FLAG_COUNT for char in shape]
+
+
+class TokenTable(dict):
+    """What classify gives for each token (or shape), computed on first sight. Cleared when it
+    grows past TOKEN_TABLE_SIZE, as amounts and IDs keep adding new tokens."""
+
+    def __init__(self, classify):
+        super().__init__()
+        self.classify = classify
+
+    def __missing__(self, token):
+        if len(self) >= TOKEN_TABLE_SIZE:
+            self.clear()
+        value = self[token] = self.classify(token)
+        return value
+
+
+class ClaimLineParser:
+    """Parses the data part of a claim line (after the account and patient name) into a record.
+
+    The differences between report formats are options:
+    - insurance_keywords: the insurance name starts at the first token containing one of them
+    - status_words: status tokens skipped between the amounts
+    - money_pattern: what a whole token must match to count as an amount in the row structure check
+    - header_words: lines containing one of them are report headers and footers (see is_header)
+    - strip_currency: '$' is removed from amounts
+    - scan_claim_amount: when the claim amount token is not a number, the next number is used
+    - overdue_digits: Over Due must be a 1-3 digit integer (kept as int); otherwise any float
+    - skip_status_before_id: status tokens before the insurance ID are skipped
+    - name_word: whether a token can be a word of a patient name (NAME_KIND); must not depend on
+      which ASCII digits the token holds
+    - split_glued_account: tokens where ACCOUNT_GAP_PATTERN inserts a space get GAP_KIND in
+      line_shapes
+    """
+
+    def __init__(self, insurance_keywords, status_words, money_pattern, header_words=(), strip_currency=False,
+                 scan_claim_amount=False, overdue_digits=False, skip_status_before_id=False, name_word=str.isalpha,
+                 split_glued_account=False):
+        self.keyword_search = keyword_match.compile_keywords(insurance_keywords).search
+        self.status_words = frozenset(status_words)
+        self.money_match = re.compile(rf'(?:{money_pattern})').fullmatch
+        self.header_search = keyword_match.compile_keywords(header_words).search if header_words else None
+        # A line holds a header word only if one of its tokens holds the word's first part
+        self.header_part_search = keyword_match.compile_keywords(
+            [word.split()[0] if word.split() else '' for word in header_words]).search if header_words else None
+        self.strip_currency = strip_currency
+        self.scan_claim_amount = scan_claim_amount
+        self.overdue_digits = overdue_digits
+        self.skip_status_before_id = skip_status_before_id
+        self.name_word = name_word
+        self.split_glued_account = split_glued_account
+
+        # Amounts, dates and IDs keep bringing new tokens, but which ASCII digits a token holds
+        # does not change its shape, unless a status or header word or money_pattern (outside its
+        # repeat counts) names one
+        self.digit_blind = not any(char in '0123456789' for text in (*status_words, *header_words,
+                                                                     REPEAT_COUNTS.sub('', money_pattern))
+                                   for char in text)
+        self.token_classes = TokenTable(self.token_class)
+        self.line_classes = TokenTable(self.line_class)
+        self.token_values = TokenTable(self.token_value)
+        self.token_shapes = TokenTable(self.token_shape)
+        self.line_shapes = TokenTable(self.line_shape) if header_words or split_glued_account else self.token_shapes
+        self.companies = TokenTable(self.insurance_company)
+        self.plans = TokenTable(self.plan)
+        self.walks = TokenTable(self.walk)
+        self.claim_plans = TokenTable(self.claim_plan)
+
+    def token_kind(self, token):
+        """The kind of a token, None for MONEY_KIND or OTHER_KIND (see token_class)"""
+        date = DATE_PATTERN.search(token)
+        if date:
+            if date.start() == 0:
+                return DATE_KIND if date.end() == len(token) else DATE_FIRST_KIND
+            return DATE_IN_NAME_KIND if self.name_word(token) else DATE_INSIDE_KIND
+        if token in INDICATORS:
+            return INDICATOR_KIND
+        if token in SUB_INDICATORS:
+            return SUB_INDICATOR_KIND
+        if self.name_word(token):
+            return NAME_KIND
+        return None
+
+    def token_class(self, token):
+        amount, overdue, insurance_id, id_token = self.token_value(token)
+        flags = ((amount is not None and AMOUNT_FLAG) | (overdue is not None and OVERDUE_FLAG) |
+                 (token in self.status_words and STATUS_FLAG) | (insurance_id is not None and ID_FLAG) |
+                 (id_token and ID_TOKEN_FLAG))
+        kind = self.token_kind(token)
+        if kind is None:
+            kind = MONEY_KIND if self.money_match(token) else OTHER_KIND
+        return shape_char(kind, flags)
+
+    def line_class(self, token):
+        if self.header_part_search is not None and self.header_part_search(token):
+            return HEADER_KIND
+        if self.split_glued_account and ACCOUNT_GAP_PATTERN.search(token):
+            return GAP_KIND
+        return self.token_class(token)
+
+    def token_shape(self, token):
+        if self.digit_blind:
+            return self.token_classes[token.translate(ZERO_DIGITS)]
+        return self.token_class(token)
+
+    def line_shape(self, token):
+        if self.digit_blind:
+            return self.line_classes[token.translate(ZERO_DIGITS)]
+        return self.line_class(token)
+
+    def token_value(self, token):
+        """(claim amount, over due, insurance ID, whether the whole token is an ID) the token
+        gives, None for an amount or ID it cannot be"""
+        text = self.amount_text(token)
+        try:
+            amount = float(text)
+        except ValueError:
+            amount = None
+        if self.overdue_digits:
+            # Only a 1-3 digit integer; anything else is left for the insurance ID
+            overdue = int(text) if OVERDUE_DIGITS.fullmatch(text) else None
+        else:
+            overdue = amount
+        insurance_id = ID_PATTERN.match(token)
+        return (amount, overdue, insurance_id.group() if insurance_id else None,
+                ID_TOKEN_PATTERN.match(token) is not None)
+
+    def insurance_company(self, insurance_name):
+        """(company, index of the word it starts at or None) of an insurance name: the name from
+        its first word containing a keyword, or the whole name when none does"""
+        words = insurance_name.split()
+        for index, word in enumerate(words):
+            if self.keyword_search(word):
+                return ' '.join(words[index:]), index
+        return insurance_name, None
+
+    def amount_text(self, token):
+        token = token.replace(',', '')
+        return token.replace('$', '') if self.strip_currency else token
+
+    def is_header(self, line):
+        return self.header_search is not None and self.header_search(line) is not None
+
+    def tokenize(self, text):
+        """(tokens, shape) of text, the shape one character per token"""
+        tokens = text.split()
+        return tokens, ''.join(map(self.token_shapes.__getitem__, tokens))
+
+    def plan(self, shape):
+        """How the data part of a line of this shape parses: (form, whether it has the structure of
+        a complete row, DOS index, insurance name indices, index after the insurance name, walk
+        from there). The form tells how the fields are read (see parse_tokens)."""
+        kinds = shape.translate(SHAPE_KINDS)
+        token_count = len(kinds)
+        complete = (token_count >= 5 and (DATE_KIND in kinds or DATE_FIRST_KIND in kinds) and
+                    kinds.count(MONEY_KIND) >= 2 and
+                    (INDICATOR_KIND in kinds[2:] or SUB_INDICATOR_KIND in kinds[2:] or
+                     any(flags & ID_TOKEN_FLAG for flags in shape_flags(shape[-2:]))))
+        if token_count < 5:
+            return FEW_TOKENS, complete, None, None, None, None
+        if DATE_FIRST_KIND in kinds or DATE_IN_NAME_KIND in kinds or DATE_INSIDE_KIND in kinds:
+            # The dates are read from the text, see glued_dates
+            return GLUED_DATES, complete, None, None, None, None
+
+        # With 1 or 2 dates the first is the DOS, with 3 the second, with 4 or more the third
+        date_count = kinds.count(DATE_KIND)
+        if not date_count:
+            return NO_DATE, complete, None, None, None, None
+        dos_index = kinds.find(DATE_KIND)
+        if date_count >= 3:
+            dos_index = kinds.find(DATE_KIND, dos_index + 1)
+            if date_count >= 4:
+                dos_index = kinds.find(DATE_KIND, dos_index + 1)
+
+        # The insurance name is the tokens before Pri/Sec/Oth, the dates left out
+        name_end = kinds.find(INDICATOR_KIND)
+        if name_end < 0:
+            name_end = token_count
+        name_kinds = kinds[:name_end]
+        name_start = name_end - len(name_kinds.lstrip(DATE_KIND))
+        if DATE_KIND in name_kinds[name_start:]:
+            form = PARTS_PICKED
+            name_indices = tuple(index for index, kind in enumerate(name_kinds) if kind != DATE_KIND)
+            next_index = name_indices[-1] + 1
+        else:
+            form = PARTS_SLICE
+            name_indices = slice(name_start, name_end)
+            next_index = name_end if name_start < name_end else 0
+        return form, complete, dos_index, name_indices, next_index, self.walks[shape[next_index:]]
+
+    def walk(self, shape):
+        """(claim amount, over due, insurance ID, whether the ID is read from its token) positions in
+        the shape of a row from just after the insurance name, None for a field the row lacks. The
+        ID runs over the rest of the row when it is not read from its token."""
+        kinds = shape.translate(SHAPE_KINDS)
+        flags = shape_flags(shape)
+        token_count = len(shape)
+        i = 0
+        # Skip Pri/Sec/Oth and E/W/P/F/H indicators
+        if i < token_count and kinds[i] == INDICATOR_KIND:
+            i += 1
+        if i < token_count and kinds[i] == SUB_INDICATOR_KIND:
+            i += 1
+
+        # Claim amount
+        claim_amount = None
+        if i < token_count:
+            if flags[i] & AMOUNT_FLAG:
+                claim_amount = i
+                i += 1
+            elif self.scan_claim_amount:
+                # A status such as Replc may come before the amount: use the next number
+                while i < token_count:
+                    i += 1
+                    if flags[i - 1] & AMOUNT_FLAG:
+                        claim_amount = i - 1
+                        break
+
+        # Skip a status word such as "Hold"
+        if i < token_count and flags[i] & STATUS_FLAG:
+            i += 1
+
+        # Over due amount
+        overdue = None
+        if i < token_count and flags[i] & OVERDUE_FLAG:
+            overdue = i
+            i += 1
+
+        # Insurance ID: the first run of ID characters of what remains
+        insurance_id = None
+        id_token = False
+        if i < token_count:
+            if self.skip_status_before_id:
+                while i < token_count and flags[i] & STATUS_FLAG:
+                    i += 1
+            insurance_id = i
+            id_token = i < token_count and bool(flags[i] & ID_FLAG)
+        return claim_amount, overdue, insurance_id, id_token
+
+    def claim_plan(self, shape, start=0):
+        """Where the fields are in a line of this shape whose data part (from token start on) reads
+        as a claim: (DOS index, insurance name indices, index of the name's last token, claim
+        amount, over due and insurance ID indices, whether the ID is read from its token), None for
+        a field the row lacks. None when the data part reads as no claim, or its dates are glued."""
+        form, complete, dos_index, name_indices, next_index, walk = self.plans[shape[start:]]
+        if form is PARTS_SLICE and name_indices.start < name_indices.stop:
+            name_indices = slice(start + name_indices.start, start + name_indices.stop)
+        elif form is PARTS_PICKED:
+            name_indices = tuple(start + index for index in name_indices)
+        else:
+            return None
+        claim_amount, overdue, insurance_id, id_token = walk
+        if claim_amount is None:
+            return None
+        i = start + next_index
+        return (start + dos_index, name_indices, i - 1, i + claim_amount, None if overdue is None else i + overdue,
+                None if insurance_id is None else i + insurance_id, id_token)
+
+    def parse(self, line_content, account, patient):
+        """Return (success, extracted_data) for the data part of a claim line"""
+        return self.parse_tokens(*self.tokenize(line_content), account, patient)
+
+    def parse_tokens(self, tokens, shape, account, patient):
+        """parse for the tokens and shape of the data part"""
+        form, complete, dos_index, name_indices, next_index, walk = self.plans[shape]
+        if form is PARTS_SLICE:
+            dos = tokens[dos_index]
+            insurance_parts = tokens[name_indices]
+        elif form is PARTS_PICKED:
+            dos = tokens[dos_index]
+            insurance_parts = [tokens[index] for index in name_indices]
+        elif form is GLUED_DATES:
+            dos, insurance_parts = self.glued_dates(tokens)
+        elif form is NO_DATE:
+            return False, self.record(account, patient, '', '', '', '', '')
+        else:
+            return False, {}
+
+        # Drop leading tokens (account numbers, patient names) before the first insurance keyword.
+        # Continue after the last insurance token in the tokens. When that token does not appear
+        # there (it was glued to a date), the position falls back to the keyword's token index,
+        # or the last insurance token's index, as in the token-by-token parser.
+        i = 0
+        company = ''
+        if insurance_parts:
+            company, keyword_index = self.companies[' '.join(insurance_parts)]
+            try:
+                i = tokens.index(insurance_parts[-1]) + 1
+            except ValueError:
+                i = len(insurance_parts) - 1 if keyword_index is None else keyword_index
+        if i != next_index:
+            # A token of the insurance name came earlier as well, or the dates were glued
+            walk = self.walks[shape[i:]]
+
+        claim_amount, overdue, insurance_id, id_token = walk
+        token_values = self.token_values
+        claim_amount = '' if claim_amount is None else token_values[tokens[i + claim_amount]][0]
+        overdue = '' if overdue is None else token_values[tokens[i + overdue]][1]
+        if insurance_id is None:
+            insurance_id = ''
+        elif id_token:
+            insurance_id = token_values[tokens[i + insurance_id]][2]
+        else:
+            insurance_id = ' '.join(tokens[i + insurance_id:])
+
+        # A claim needs the DOS, the insurance company and the claim amount
+        success = bool(company) and claim_amount != ''
+        return success, self.record(account, patient, dos, company, claim_amount, overdue, insurance_id)
+
+    @staticmethod
+    def record(account, patient, dos, company, claim_amount, overdue, insurance_id):
+        return {
+            'Account': account,
+            'Patient Name': patient,
+            'DOS': dos,
+            'Insurance Company': company,
+            'Claim Amount': claim_amount,
+            'Over Due': overdue,
+            'Insurance ID': insurance_id
+        }
+
+    @staticmethod
+    def glued_dates(tokens):
+        """(DOS, insurance name tokens) of a line with dates run into other text, both read from
+        the text with every date taken out, as the original parse does"""
+        line_content = ' '.join(tokens)
+        all_dates = DATE_PATTERN.findall(line_content)
+        date_count = len(all_dates)
+        dos = all_dates[0] if date_count <= 2 else all_dates[1] if date_count == 3 else all_dates[2]
+        clean_content = line_content
+        for date in all_dates:
+            clean_content = clean_content.replace(date, ' ')
+        insurance_parts = []
+        for token in clean_content.split():
+            if token in INDICATORS:
+                break
+            insurance_parts.append(token)
+        return dos, insurance_parts
+
+    def has_complete_row(self, line_content):
+        """Whether the line has the structure of a complete data row (all 7 columns): a date,
+        two amounts, and the insurance company indicators or an insurance ID"""
+        return self.has_complete_shape(self.tokenize(line_content)[1])
+
+    def has_complete_shape(self, shape):
+        """has_complete_row for the shape of a line"""
+        return self.plans[shape][1]
@@ -0,0 +1,798 @@
+import contextlib
+import os
+import re
+
+import numpy as np
+
+import claim_lines
+import keyword_match
+import pdf_extract
+import xlsx_writer
+import output_formats
+
+# A claims report format is a profile: plain data (strings, lists, numbers and flags) that
+# ClaimsReport compiles into its matchers once, when the format's module is loaded. The formats
+# differ only in their profiles; the parsing below is the same for all of them.
+
+# Column x ranges of the layout parser, based on typical positions of the Murphy PDF layout
+LAYOUT_COLUMNS = {
+    'Account': (0, 60),
+    'Patient Name': (60, 180),
+    'DOS': (180, 280),
+    'Insurance Company': (280, 450),
+    'Claim Amount': (450, 520),
+    'Over Due': (520, 580),
+    'Insurance ID': (580, 800)
+}
+
+# Profile entries every format must give:
+# - name: the format's name in BILXY_KEYWORDS_FILE (see keyword_match)
+# - account_pattern: a line's first word, as a whole, when it is an account (in the layout parser,
+#   such a word starts a new record)
+# - insurance_keywords, status_words: see claim_lines.ClaimLineParser
+REQUIRED_PROFILE_KEYS = ('name', 'account_pattern', 'insurance_keywords', 'status_words')
+
+# Optional entries and their defaults. The claim_lines.ClaimLineParser options are passed on as
+# they are; the others are:
+# - split_glued_account: a space is inserted where a digit or X runs into a capital letter
+#   (an account number run into the patient name)
+# - account_suffix: a letter that belongs to the account when it starts the patient name
+# - patient_tokens: the patient name is read token by token up to the first date or Pri/Sec/Oth;
+#   otherwise it is the run of letters, '.', ''' and spaces after the account, starting with a
+#   capital (see read_account)
+# - patient_digits: patient name tokens may contain digits (any letter makes a name token)
+# - layout_columns: column x ranges of the layout parser
+# - layout_line_tolerance: words whose tops are at most this many points apart are one line
+# - fallback_mode, missed_ratio_threshold: see parse_insurance_claims_with_fallback
+PROFILE_DEFAULTS = {
+    'extraction_backend': 'pypdf2',
+    'header_words': [],
+    'money_pattern': r'\$?[\d,]+\.?\d*',
+    'strip_currency': False,
+    'scan_claim_amount': False,
+    'overdue_digits': False,
+    'skip_status_before_id': False,
+    'split_glued_account': False,
+    'account_suffix': '',
+    'patient_tokens': False,
+    'patient_digits': False,
+    'layout_columns': LAYOUT_COLUMNS,
+    'layout_line_tolerance': 2.0,
+    'fallback_mode': 'page',
+    'missed_ratio_threshold': 0.1,
+}
+
+# What a line of a data row holds, unlike cover, header and totals lines: a date or an amount
+DATA_ROW_PATTERN = re.compile(r'\d{2}/\d{2}/\d{2}|\d\.\d{2}(?!\d)')
+TOTAL_PATTERN = re.compile(r'\btotals?\b', re.IGNORECASE)
+
+# Characters of a patient name without patient_tokens (the name may also hold spaces)
+PATIENT_NAME_CHARS = re.compile(r"[A-Za-z.']*")
+
+# Columns of the 'Insurance Claims' sheet, in order
+CLAIM_COLUMNS = ['Account', 'Patient Name', 'DOS', 'Insurance Company', 'Claim Amount', 'Over Due', 'Insurance ID']
+# Columns of the 'Pattern Missed Data' sheet: the missed line plus whatever fields were extracted from it
+MISSED_COLUMNS = ['line_number', 'account', 'patient', 'reason', 'content',
+                  'DOS', 'Insurance Company', 'Claim Amount', 'Over Due', 'Insurance ID']
+
+
+def column_finder(column_ranges):
+    """Function giving the columns of a sequence of x positions: for each, the first of
+    column_ranges (in their order) whose closed range holds it, or None. Every position between
+    two range ends has the same column, so the ends are sorted once and a whole sequence of
+    positions is assigned by one binary search of them."""
+    def first_column(x):
+        for column, (min_x, max_x) in column_ranges.items():
+            if min_x <= x <= max_x:
+                return column
+        return None
+
+    ends = sorted({x for x_range in column_ranges.values() for x in x_range})
+    # A position's slot is the sum of its left and right insertion points: 2i before end i
+    # (and after end i-1), 2i+1 at end i
+    slot_columns = [None]
+    for a, b in zip(ends, ends[1:]):
+        slot_columns += [first_column(a), first_column((a + b) / 2)]
+    if ends:
+        slot_columns += [first_column(ends[-1]), None]
+    ends = np.array(ends, dtype=float)
+    slot_columns = np.array(slot_columns, dtype=object)
+
+    def columns_of(positions):
+        positions = np.asarray(positions, dtype=float)
+        slots = np.searchsorted(ends, positions, 'left') + np.searchsorted(ends, positions, 'right')
+        return slot_columns[slots].tolist()
+    return columns_of
+
+
+def group_lines(words, tolerance):
+    """Cluster words into lines: [(y, indices of the line's words ordered by x)] by increasing y.
+    The words are swept in order of their top; a word joins the current line when its top is
+    within tolerance of the top of the line's first word (y), so baseline jitter does not split
+    a row and rows do not chain into each other."""
+    lines = []
+    line_top = None
+    for i in sorted(range(len(words)), key=lambda i: words[i]['top']):
+        top = words[i]['top']
+        if line_top is None or top - line_top > tolerance:
+            line_top = top
+            line = []
+            lines.append((top, line))
+        line.append(i)
+    for top, line in lines:
+        line.sort(key=lambda i: words[i]['x0'])
+    return lines
+
+
+class ClaimsReport:
+    """Parser of one claims report format, compiled from its profile (see PROFILE_DEFAULTS)"""
+
+    def __init__(self, profile):
+        unknown = set(profile) - set(REQUIRED_PROFILE_KEYS) - set(PROFILE_DEFAULTS)
+        missing = [key for key in REQUIRED_PROFILE_KEYS if key not in profile]
+        if unknown or missing:
+            raise ValueError(f"Invalid claims report profile: unknown {sorted(unknown)}, missing {missing}")
+        profile = dict(PROFILE_DEFAULTS, **profile)
+        self.profile = profile
+        self.name = profile['name']
+        self.extraction_backend = profile['extraction_backend']
+        self.fallback_mode = profile['fallback_mode']
+        self.missed_ratio_threshold = profile['missed_ratio_threshold']
+
+        # Keyword lists with the client's own words from BILXY_KEYWORDS_FILE
+        self.insurance_keywords = keyword_match.configured_keywords(
+            self.name, 'insurance_keywords', profile['insurance_keywords'])
+        self.status_words = keyword_match.configured_keywords(self.name, 'status_words', profile['status_words'])
+        self.header_words = keyword_match.configured_keywords(self.name, 'header_words', profile['header_words'])
+
+        self.account_match = re.compile(profile['account_pattern']).fullmatch
+        self.account_words = claim_lines.TokenTable(self.is_account)
+        self.suffixed_accounts = claim_lines.TokenTable(self.is_suffixed_account)
+        # Length of the patient name characters each word starts with (without patient_tokens)
+        self.patient_char_ends = claim_lines.TokenTable(self.patient_chars_end)
+        self.account_gap_pattern = claim_lines.ACCOUNT_GAP_PATTERN if profile['split_glued_account'] else None
+        self.account_suffix = profile['account_suffix']
+        self.patient_tokens = profile['patient_tokens']
+        self.patient_digits = profile['patient_digits']
+        # Shapes of the tokens a patient name runs over (see read_account)
+        if self.patient_tokens:
+            self.name_shapes = claim_lines.shape_chars(
+                claim_lines.NAME_KIND + claim_lines.SUB_INDICATOR_KIND + claim_lines.DATE_IN_NAME_KIND)
+        else:
+            self.name_shapes = claim_lines.shape_chars(
+                claim_lines.NAME_KIND + claim_lines.SUB_INDICATOR_KIND + claim_lines.INDICATOR_KIND)
+        self.layout_columns = {column: tuple(x_range) for column, x_range in profile['layout_columns'].items()}
+        self.layout_columns_of = column_finder(self.layout_columns)
+        self.layout_line_tolerance = profile['layout_line_tolerance']
+
+        self.line_parser = claim_lines.ClaimLineParser(
+            insurance_keywords=self.insurance_keywords,
+            status_words=self.status_words,
+            money_pattern=profile['money_pattern'],
+            header_words=self.header_words,
+            strip_currency=profile['strip_currency'],
+            scan_claim_amount=profile['scan_claim_amount'],
+            overdue_digits=profile['overdue_digits'],
+            skip_status_before_id=profile['skip_status_before_id'],
+            name_word=self.is_name_token if self.patient_tokens else self.is_patient_chars,
+            split_glued_account=profile['split_glued_account'],
+        )
+        self.line_plans = claim_lines.TokenTable(self.line_plan)
+
+    def open_pdf_document(self, pdf_path, backend=None, workers=None):
+        """Open the PDF once for both the pattern and the layout parser"""
+        return pdf_extract.PDFDocument(pdf_path, backend or self.extraction_backend, fallback='pdfplumber',
+                                       workers=workers)
+
+    def extract_pages_from_pdf(self, pdf_path, backend=None, workers=None):
+        """Return (page_texts, page_engines); empty pages are retried with pdfplumber (slower but better)"""
+        return pdf_extract.extract_pages(pdf_path, backend or self.extraction_backend, fallback='pdfplumber',
+                                         workers=workers)
+
+    def extract_text_from_pdf(self, pdf_path, backend=None, workers=None):
+        page_texts, page_engines = self.extract_pages_from_pdf(pdf_path, backend, workers)
+        return pdf_extract.join_pages(page_texts)
+
+    def is_name_token(self, text):
+        """Whether a token can be part of a patient name"""
+        cleaned = text.replace('.', '').replace("'", '').replace('-', '').replace(' ', '')
+        if self.patient_digits:
+            # Accept tokens with at least one alphabetic character (may include digits)
+            return any(ch.isalpha() for ch in cleaned)
+        return cleaned.isalpha()
+
+    def is_account(self, word):
+        return self.account_match(word) is not None
+
+    def is_suffixed_account(self, word):
+        """Whether the first space split_glued_account inserts in a line starting with word goes
+        before the account suffix, word and the part before the suffix both being accounts. The
+        suffix then moves back from the patient name, and the line reads as if the space was not
+        inserted."""
+        suffix = self.account_suffix
+        if not suffix or not word.endswith(suffix):
+            return False
+        account = word[:-len(suffix)]
+        gap = self.account_gap_pattern.search(word)
+        return (gap is not None and gap.start() == len(account) and not account.endswith(suffix) and self.account_words[word] and
+                self.account_words[account])
+
+    @staticmethod
+    def patient_chars_end(word):
+        return PATIENT_NAME_CHARS.match(word).end()
+
+    @staticmethod
+    def is_patient_chars(word):
+        """Whether a word is all patient name characters (without patient_tokens)"""
+        return PATIENT_NAME_CHARS.match(word).end() == len(word)
+
+    def line_plan(self, shape):
+        """(account plan, claim plan) of the lines of this shape that read as a claim with the
+        fields where the shape puts them, None for other lines (such as possible headers). The
+        account plan is (name end, claim plan) for when the line starts with an account, the claim
+        plan for when it is a continuation line (see claim_lines.ClaimLineParser.claim_plan)."""
+        token_count = len(shape)
+        if token_count < 2 or claim_lines.HEADER_KIND in shape or claim_lines.GAP_KIND in shape:
+            return None
+        account_plan = None
+        name_end = token_count - len(shape[1:].lstrip(self.name_shapes))
+        # Without patient_tokens, only whole name words followed by another word (see
+        # iter_insurance_claims)
+        if self.patient_tokens or 2 <= name_end < token_count:
+            claim_plan = self.line_parser.claim_plan(shape, name_end)
+            if claim_plan is not None:
+                account_plan = name_end, claim_plan
+        return account_plan, self.line_parser.claim_plans[shape]
+
+    def move_suffix(self, account, patient):
+        """(account, patient) with the account suffix moved back from the start of the patient name"""
+        # Handle cases where the suffix (Biloxi's 'X') is incorrectly attached to the patient name
+        suffix = self.account_suffix
+        if suffix and patient.startswith(suffix) and not account.endswith(suffix):
+            return account + suffix, patient[len(suffix):].lstrip()
+        return account, patient
+
+    def read_account(self, line, tokens, shape):
+        """(account, patient, tokens, shape) of a line that starts with an account and a patient
+        name, the tokens and shape being those of the rest of the line; None for other lines.
+        tokens and shape are the line's (see claim_lines)."""
+        token_count = len(tokens)
+        if token_count < 2 or not self.account_words[tokens[0]]:
+            return None
+        account = tokens[0]
+        # The name runs over the name words (see name_shapes) from the second token on
+        name_end = token_count - len(shape[1:].lstrip(self.name_shapes))
+
+        if self.patient_tokens:
+            # Collect tokens until a date, Pri/Sec/Oth or a token without letters
+            return account, ' '.join(tokens[1:name_end]), tokens[name_end:], shape[name_end:]
+
+        # The name starts with a capital and is followed by at least one more name character or
+        # space; it may end inside the word after it ('SMITH JOHN5' gives 'SMITH JOHN')
+        first = tokens[1]
+        if not 'A' <= first[0] <= 'Z':
+            return None
+        if name_end == 1:
+            end = self.patient_char_ends[first]
+            if end < 2:
+                return None
+            patient = first[:end]
+            rest = first[end:]
+            tokens = [rest] + tokens[2:]
+            shape = self.line_parser.token_shapes[rest] + shape[2:]
+        elif len(first) == 1 and token_count == 2:
+            return None
+        else:
+            start = line.find(first, len(account))
+            if name_end == token_count:
+                patient = line[start:]
+                tokens, shape = [], ''
+            else:
+                # The first word after the name has a character no name word has, so it is found
+                # after the name
+                word = tokens[name_end]
+                word_start = line.find(word, start)
+                end = self.patient_char_ends[word]
+                if end:
+                    patient = line[start:word_start + end]
+                    rest = word[end:]
+                    tokens = [rest] + tokens[name_end + 1:]
+                    shape = self.line_parser.token_shapes[rest] + shape[name_end + 1:]
+                else:
+                    patient = line[start:word_start].rstrip()
+                    tokens = tokens[name_end:]
+                    shape = shape[name_end:]
+
+        account, patient = self.move_suffix(account, patient)
+        return account, patient, tokens, shape
+
+    def parse_insurance_claims(self, text_content, progress=None):
+        """Parse the document text (or a list of page texts) into (claims_data, pattern_missed_lines).
+        progress(pages_parsed, lines_parsed) is called after each page."""
+        claims_data = []
+        pattern_missed_lines = []  # Only track lines that matched complete pattern but couldn't be parsed
+        for record_type, record in self.iter_insurance_claims(pdf_extract.iter_lines(text_content, progress)):
+            if record_type == 'claim':
+                claims_data.append(record)
+            else:
+                pattern_missed_lines.append(record)
+        return claims_data, pattern_missed_lines
+
+    def iter_insurance_claims(self, lines):
+        """Yield ('claim', data) and ('pattern_missed', line info) records from a stream of stripped lines.
+
+        The current account and patient carry over from line to line, so the lines of
+        consecutive pages can be fed in as they are extracted.
+        """
+        line_parser = self.line_parser
+        line_shape = line_parser.line_shapes.__getitem__
+        token_shape = line_parser.token_shapes.__getitem__
+        is_header = line_parser.is_header
+        parse_tokens = line_parser.parse_tokens
+        has_complete_shape = line_parser.has_complete_shape
+        read_account = self.read_account
+        line_plans = self.line_plans
+        account_words = self.account_words
+        suffixed_accounts = self.suffixed_accounts
+        patient_tokens = self.patient_tokens
+        patient_char_ends = self.patient_char_ends
+        suffix = self.account_suffix
+        token_values = line_parser.token_values
+        companies = line_parser.companies
+        account_gap_pattern = self.account_gap_pattern
+        header_kind = claim_lines.HEADER_KIND
+        gap_kind = claim_lines.GAP_KIND
+        current_account = ""
+        current_patient = ""
+
+        for line_num, line in enumerate(lines, 1):
+            # The shape of every token, one character each (see claim_lines)
+            tokens = line.split()
+            shape = ''.join(map(line_shape, tokens))
+
+            # Most lines read as a claim with the fields where their shape puts them (see line_plan)
+            plan_shape = shape
+            if shape[:1] == gap_kind and suffixed_accounts[tokens[0]]:
+                plan_shape = token_shape(tokens[0]) + shape[1:]
+            line_plan = line_plans[plan_shape]
+            if line_plan is not None:
+                account_plan, claim_plan = line_plan
+                account = tokens[0]
+                if account_words[account]:
+                    claim_plan = None
+                    if account_plan is not None:
+                        start, claim_plan = account_plan
+                        if patient_tokens:
+                            patient = ' '.join(tokens[1:start])
+                        else:
+                            # As read_account reads a name of whole words followed by a word
+                            # without name characters
+                            first = tokens[1]
+                            word = tokens[start]
+                            if 'A' <= first[0] <= 'Z' and not patient_char_ends[word]:
+                                name_start = line.find(first, len(account))
+                                patient = line[name_start:line.find(word, name_start)].rstrip()
+                                if suffix and patient.startswith(suffix) and not account.endswith(suffix):
+                                    account += suffix
+                                    patient = patient[len(suffix):].lstrip()
+                            else:
+                                claim_plan = None
+                else:
+                    start = 0
+                    account = current_account
+                    patient = current_patient
+                    if not (account and patient):
+                        claim_plan = None
+                # Parse continues after the first occurrence of the insurance name's last token
+                if claim_plan is not None and tokens.index(tokens[claim_plan[2]], start) == claim_plan[2]:
+                    dos_index, name_indices, last_index, claim_index, overdue_index, id_index, id_token = claim_plan
+                    if type(name_indices) is slice:
+                        insurance_parts = tokens[name_indices]
+                    else:
+                        insurance_parts = [tokens[index] for index in name_indices]
+                    if id_index is None:
+                        insurance_id = ''
+                    elif id_token:
+                        insurance_id = token_values[tokens[id_index]][2]
+                    else:
+                        insurance_id = ' '.join(tokens[id_index:])
+                    current_account = account
+                    current_patient = patient
+                    yield 'claim', {
+                        'Account': account,
+                        'Patient Name': patient,
+                        'DOS': tokens[dos_index],
+                        'Insurance Company': companies[' '.join(insurance_parts)][0],
+                        'Claim Amount': token_values[tokens[claim_index]][0],
+                        'Over Due': '' if overdue_index is None else token_values[tokens[overdue_index]][1],
+                        'Insurance ID': insurance_id
+                    }
+                    continue
+
+            if header_kind in shape or gap_kind in shape:
+                # Skip header/footer lines
+                if header_kind in shape and is_header(line):
+                    continue
+
+                # Insert a space between account number and patient name if it's missing
+                if account_gap_pattern is not None:
+                    line = account_gap_pattern.sub(' ', line, 1)
+                    tokens = line.split()
+                shape = ''.join(map(token_shape, tokens))
+
+            # Check if line starts with account and patient name
+            account_line = read_account(line, tokens, shape)
+            if account_line:
+                current_account, current_patient, rest_tokens, rest_shape = account_line
+
+                # Try to parse this line with the complete pattern
+                parsed_successfully, extracted_data = parse_tokens(rest_tokens, rest_shape, current_account,
+                                                                   current_patient)
+
+                if parsed_successfully:
+                    yield 'claim', extracted_data
+                else:
+                    # Only track if this line has the structure of a complete data row
+                    if has_complete_shape(rest_shape):
+                        yield 'pattern_missed', {
+                            'line_number': line_num,
+                            'account': current_account,
+                            'patient': current_patient,
+                            'content': line,
+                            'reason': 'Complete pattern matched but parsing failed',
+                            'extracted_data': extracted_data
+                        }
+            else:
+                # For continuation lines with existing context, also try complete pattern parsing
+                if current_account and current_patient:
+                    parsed_successfully, extracted_data = parse_tokens(tokens, shape, current_account, current_patient)
+
+                    if parsed_successfully:
+                        yield 'claim', extracted_data
+                    else:
+                        # Only track if this continuation line has the structure of a complete data row
+                        if has_complete_shape(shape):
+                            yield 'pattern_missed', {
+                                'line_number': line_num,
+                                'account': current_account,
+                                'patient': current_patient,
+                                'content': line,
+                                'reason': 'Continuation line - complete pattern parsing failed',
+                                'extracted_data': extracted_data
+                            }
+
+    def iter_insurance_claims_from_pdf(self, pdf_path, backend=None):
+        """Stream claim records straight from the PDF, extracting one page at a time"""
+        page_texts = (page_text for page_text, engine in
+                      pdf_extract.iter_pages(pdf_path, backend or self.extraction_backend, fallback='pdfplumber'))
+        return self.iter_insurance_claims(pdf_extract.iter_lines(page_texts))
+
+    def parse_insurance_claims_layout(self, pdf_path):
+        """Parse insurance claims using layout/position-based approach with pdfplumber.
+        pdf_path may also be an open pdf_extract.PDFDocument, whose cached words are reused."""
+        claims_data = []
+        pattern_missed_lines = []
+
+        try:
+            with pdf_extract.open_document(pdf_path) as document:
+                for page_num in range(document.page_count):
+                    # Extract words with positions
+                    page_claims, page_missed = self.parse_layout_page(document.page_words(page_num), page_num)
+                    claims_data.extend(page_claims)
+                    for missed_line in page_missed:
+                        missed_line['line_number'] = len(pattern_missed_lines) + 1
+                        pattern_missed_lines.append(missed_line)
+
+        except Exception as e:
+            print(f"Layout parsing error: {e}")
+            import traceback
+            traceback.print_exc()
+
+        return claims_data, pattern_missed_lines
+
+    def parse_layout_page(self, words, page_num):
+        """Layout-parse one page from its pdfplumber words. Account and patient context
+        starts fresh on every page, so pages can be parsed independently. Missed lines are
+        numbered by their line on the page."""
+        claims_data = []
+        pattern_missed_lines = []
+
+        if not words:
+            return claims_data, pattern_missed_lines
+
+        print(f"Page {page_num+1} has {len(words)} words")
+
+        # Column of every word by the x-position of its center, for the whole page at once
+        word_columns = self.layout_columns_of([(word['x0'] + word['x1']) / 2 for word in words])
+
+        # Group words into lines by y-coordinate, each ordered by x
+        sorted_lines = [(y, [words[i] for i in line], [word_columns[i] for i in line])
+                        for y, line in group_lines(words, self.layout_line_tolerance)]
+        print(f"Found {len(sorted_lines)} lines")
+
+        # Find header line (contains "Account" and "Patient")
+        header_line = None
+        header_index = None
+        for line_index, (y, line_words, line_columns) in enumerate(sorted_lines):
+            line_text = ' '.join(w['text'] for w in line_words).lower()
+            if 'account' in line_text and ('patient' in line_text or 'patient name' in line_text):
+                header_line = line_words
+                header_index = line_index
+                print(f"Found header at y={y}: {line_text}")
+                break
+
+        if not header_line:
+            print("No header found, skipping page")
+            return claims_data, pattern_missed_lines
+
+        header_texts = [w['text'].lower() for w in header_line]
+        print(f"Header words: {header_texts}")
+
+        # Fixed column positions of the format; they avoid overlaps
+        column_ranges = self.layout_columns
+
+        for col_name, (min_x, max_x) in column_ranges.items():
+            print(f"Column {col_name}: x={min_x:.1f}-{max_x:.1f}")
+        date_match = claim_lines.DATE_PATTERN.match
+        id_match = claim_lines.ID_TOKEN_PATTERN.match
+
+        # Process data lines (skip header)
+        current_account = ""
+        current_patient = ""
+        data_lines_processed = 0
+
+        for line_index, (y, line_words, line_columns) in enumerate(sorted_lines):
+            # Skip header line
+            if line_index == header_index:
+                continue
+
+            # Skip empty lines
+            if not line_words:
+                continue
+
+            line_text = ' '.join(w['text'] for w in line_words)
+            data_lines_processed += 1
+
+            # Check if this line starts a new record (has account-like pattern)
+            first_word = line_words[0]['text']
+            if self.account_words[first_word]:
+                # New record
+                current_account = first_word
+                current_patient = ""
+
+                # Try to extract patient name from subsequent words
+                if len(line_words) > 1:
+                    patient_parts = []
+                    for word in line_words[1:]:
+                        text = word['text']
+                        # Stop if we hit a date or other non-name token
+                        if claim_lines.DATE_PATTERN.match(text) or text in claim_lines.INDICATORS:
+                            break
+                        if self.is_name_token(text):
+                            patient_parts.append(text)
+                        else:
+                            break
+                    current_patient = ' '.join(patient_parts)
+
+            # Extract data by column position
+            row_data = {
+                'Account': current_account,
+                'Patient Name': current_patient,
+                'DOS': '',
+                'Insurance Company': '',
+                'Claim Amount': '',
+                'Over Due': '',
+                'Insurance ID': ''
+            }
+
+            # Assign words to the fields of their columns
+            for word, col_name in zip(line_words, line_columns):
+                word_text = word['text']
+                if col_name == 'DOS':
+                    if not row_data['DOS'] and date_match(word_text):
+                        row_data['DOS'] = word_text
+                elif col_name == 'Insurance Company':
+                    if not row_data['Insurance Company']:
+                        row_data['Insurance Company'] = word_text
+                    else:
+                        row_data['Insurance Company'] += ' ' + word_text
+                elif col_name == 'Claim Amount':
+                    try:
+                        amount = float(word_text.replace(',', '').replace('$', ''))
+                        row_data['Claim Amount'] = amount
+                    except:
+                        pass
+                elif col_name == 'Over Due':
+                    try:
+                        overdue = float(word_text.replace(',', '').replace('$', ''))
+                        row_data['Over Due'] = overdue
+                    except:
+                        pass
+                elif col_name == 'Insurance ID':
+                    if id_match(word_text):
+                        row_data['Insurance ID'] = word_text
+
+            # Validate and add row
+            if (row_data['DOS'] and row_data['Insurance Company'] and
+                row_data['Claim Amount'] != ''):
+                claims_data.append(row_data)
+                if len(claims_data) <= 5:  # Debug first few claims
+                    print(f"  Claim: {row_data}")
+            elif (row_data['DOS'] or row_data['Insurance Company'] or
+                  row_data['Claim Amount'] != ''):
+                # Partial data - track as missed
+                pattern_missed_lines.append({
+                    'line_number': line_index + 1,
+                    'account': current_account,
+                    'patient': current_patient,
+                    'content': line_text,
+                    'reason': 'Layout parsing partial data',
+                    'extracted_data': row_data
+                })
+
+        print(f"  Processed {data_lines_processed} data lines")
+
+        return claims_data, pattern_missed_lines
+
+    def iter_claims_by_page(self, page_texts, pdf_path=None, progress=None):
+        """Pattern-parse the pages in order and yield (page_num, claims, missed lines, parser)
+        as soon as each page is complete. page_texts may be a list or a generator.
+
+        Account and patient context still carries across page boundaries. When the PDF is
+        given, a page that needs_layout() is layout-parsed and the better of the two results is
+        kept; parser says which one ('pattern' or 'layout').
+        progress(pages_parsed, lines_parsed) is called after each page.
+        """
+        # Records belong to the page being read when they are produced
+        state = {'page': 0, 'pages_read': 0}
+        finished_pages = []
+        pending = {}
+        # Pages without a claim that have data rows (see needs_layout)
+        row_pages = set()
+        # Text lines before each page, so layout-missed lines get document line numbers as well
+        lines_before = {}
+
+        def lines():
+            lines_parsed = 0
+            for page_num, page_text in enumerate(page_texts):
+                if page_num:
+                    # No record can be attributed to the previous page any more
+                    finished_pages.append(page_num - 1)
+                state['page'] = page_num
+                state['pages_read'] = page_num + 1
+                lines_before[page_num] = lines_parsed
+                for line in pdf_extract.iter_lines(page_text):
+                    lines_parsed += 1
+                    yield line
+                # The page's records are all in by now
+                if not pending.get(page_num, ([], []))[0] and self.has_data_rows(page_text):
+                    row_pages.add(page_num)
+                if progress:
+                    progress(page_num + 1, lines_parsed)
+
+        def finish_page(document, page_num, page_claims, page_missed):
+            if document and self.needs_layout(page_claims, page_missed, page_num in row_pages):
+                try:
+                    layout_claims, layout_missed = self.parse_layout_page(document.page_words(page_num), page_num)
+                except Exception as e:
+                    print(f"Layout parsing error on page {page_num+1}: {e}")
+                    layout_claims, layout_missed = None, None
+
+                # Use layout results for this page if they're better (more claims or fewer missed)
+                if layout_claims is not None and (len(layout_claims) > len(page_claims) or
+                                                  len(layout_missed) < len(page_missed)):
+                    for missed_line in layout_missed:
+                        missed_line['line_number'] += lines_before.get(page_num, 0)
+                    return page_num, layout_claims, layout_missed, 'layout'
+            return page_num, page_claims, page_missed, 'pattern'
+
+        with (pdf_extract.open_document(pdf_path) if pdf_path else contextlib.nullcontext()) as document:
+            for record_type, record in self.iter_insurance_claims(lines()):
+                while finished_pages:
+                    page_num = finished_pages.pop(0)
+                    yield finish_page(document, page_num, *pending.pop(page_num, ([], [])))
+                page_claims, page_missed = pending.setdefault(state['page'], ([], []))
+                if record_type == 'claim':
+                    page_claims.append(record)
+                else:
+                    page_missed.append(record)
+
+            # Every page that was read is complete now
+            if state['pages_read']:
+                finished_pages.append(state['pages_read'] - 1)
+            for page_num in finished_pages:
+                yield finish_page(document, page_num, *pending.pop(page_num, ([], [])))
+
+    def has_data_rows(self, text):
+        """Whether text has a line with a date or an amount that is not a header or totals line"""
+        return any(DATA_ROW_PATTERN.search(line) and not TOTAL_PATTERN.search(line) and
+                   not self.line_parser.is_header(line) for line in text.split('\n'))
+
+    def needs_layout(self, claims_data, pattern_missed_lines, has_rows):
+        """Whether pattern results call for the layout parser: a high missed ratio, or data rows
+        (see has_data_rows) without a single claim, e.g. table cells extracted one per line.
+        Cover, header and totals pages are left to the ratio."""
+        if has_rows and not claims_data:
+            return True
+        return len(pattern_missed_lines) > len(claims_data) * self.missed_ratio_threshold
+
+    def parse_insurance_claims_hybrid(self, page_texts, pdf_path, progress=None):
+        """Pattern-parse every page and layout-parse only the pages that need_layout(),
+        keeping the better of the two results for each page"""
+        claims_data = []
+        pattern_missed_lines = []
+        layout_pages = []
+        page_count = 0
+
+        for page_num, page_claims, page_missed, parser in self.iter_claims_by_page(page_texts, pdf_path, progress):
+            if parser == 'layout':
+                layout_pages.append(page_num + 1)
+            claims_data.extend(page_claims)
+            pattern_missed_lines.extend(page_missed)
+            page_count += 1
+
+        print(f"Layout parsing used on {len(layout_pages)} of {page_count} pages: {layout_pages}")
+        return claims_data, pattern_missed_lines
+
+    def parse_insurance_claims_with_fallback(self, text_content, pdf_path=None, mode=None, progress=None):
+        """Parse insurance claims with automatic fallback to layout-based parsing.
+        text_content is the document text or a list of page texts; pdf_path may be a
+        path or the open pdf_extract.PDFDocument the text came from.
+        In 'page' mode (the default, needs a list of page texts) the fallback is decided
+        and applied page by page, see parse_insurance_claims_hybrid.
+        progress(pages_parsed, lines_parsed) reports the pattern pass."""
+        mode = mode or self.fallback_mode
+        has_pdf = isinstance(pdf_path, pdf_extract.PDFDocument) or (pdf_path and os.path.exists(pdf_path))
+        if mode == 'page' and has_pdf and not isinstance(text_content, str):
+            return self.parse_insurance_claims_hybrid(text_content, pdf_path, progress)
+
+        # Try pattern-based parsing first
+        page_texts = [text_content] if isinstance(text_content, str) else list(text_content)
+        claims_data, pattern_missed_lines = self.parse_insurance_claims(
+            text_content if isinstance(text_content, str) else page_texts, progress)
+        has_rows = not claims_data and any(self.has_data_rows(page_text) for page_text in page_texts)
+
+        # If we have a high ratio of missed lines (or data rows but no claims) and the PDF, try layout parsing
+        if self.needs_layout(claims_data, pattern_missed_lines, has_rows) and has_pdf:
+
+            print("Pattern parsing missed too much, trying layout-based parsing...")
+            layout_claims, layout_missed = self.parse_insurance_claims_layout(pdf_path)
+
+            # Use layout results if they're better (more claims or fewer missed)
+            if len(layout_claims) > len(claims_data) or len(layout_missed) < len(pattern_missed_lines):
+                print(f"Using layout parsing: {len(layout_claims)} claims, {len(layout_missed)} missed")
+                return layout_claims, layout_missed
+            else:
+                print(f"Keeping pattern parsing: {len(claims_data)} claims, {len(pattern_missed_lines)} missed")
+
+        return claims_data, pattern_missed_lines
+
+
+def missed_line_rows(pattern_missed_data):
+    """Flatten the extracted data of the missed lines into rows of MISSED_COLUMNS"""
+    for missed_line in pattern_missed_data:
+        row = [missed_line['line_number'], missed_line['account'], missed_line['patient'],
+               missed_line['reason'], missed_line['content']]
+        # Add all extracted data fields
+        for field in ['DOS', 'Insurance Company', 'Claim Amount', 'Over Due', 'Insurance ID']:
+            row.append(missed_line['extracted_data'].get(field, ''))
+        yield row
+
+
+def output_sheets(claims_data, pattern_missed_data):
+    """(title, columns, rows) for the claims and pattern-missed sheets, rows generated lazily"""
+    return [
+        ('Insurance Claims', CLAIM_COLUMNS, xlsx_writer.record_rows(claims_data, CLAIM_COLUMNS)),
+        ('Pattern Missed Data', MISSED_COLUMNS, missed_line_rows(pattern_missed_data)),
+    ]
+
+
+def create_xlsx_file(claims_data, pattern_missed_data, output_path):
+    """Write the claims and pattern-missed sheets. Rows are streamed through a write-only
+    workbook, so claims_data and pattern_missed_data may also be generators."""
+    xlsx_writer.write_xlsx(output_path, output_sheets(claims_data, pattern_missed_data))
+
+
+def create_output_file(claims_data, pattern_missed_data, output_path, output_format='xlsx'):
+    """Write the claims in any of output_formats.OUTPUT_FORMATS (xlsx, csv, jsonl, parquet)"""
+    output_formats.write_output(output_path, output_format, output_sheets(claims_data, pattern_missed_data))
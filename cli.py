@@ -0,0 +1,288 @@
+import argparse
+import glob
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import converter
+import output_formats
+import parse_cache
+import pdf_extract
+
+# Record of converted inputs, used to skip files that have not changed since their last conversion
+MANIFEST_PATH = os.environ.get('BILXY_MANIFEST', 'bilxy_manifest.json')
+
+# --parser choices: 'auto' routes each file by report_kind, the others force one parser
+PARSER_CHOICES = {
+    'auto': (None, None),
+    'biloxi': ('claims', 'biloxi'),
+    'paul': ('claims', 'paul'),
+    'unpaid': ('unpaid', None),
+}
+
+USAGE_EXAMPLES = """examples:
+  python main.py "Biloxi 08202025.pdf"                 convert one file next to the PDF
+  python main.py "Biloxi 08202025.pdf" out.xlsx        convert one file to out.xlsx
+  python main.py reports/ -o converted/ -j 4           convert every PDF under reports/ with 4 workers
+  python main.py "archive/**/*.pdf" -o converted/      globs are expanded (quote them)
+  python main.py web                                   start the web interface
+"""
+
+
+def expand_inputs(patterns):
+    """PDF paths for a list of files, directories (searched recursively) and glob patterns,
+    without duplicates and in the order given"""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(glob.escape(pattern), '**', '*.[pP][dD][fF]'), recursive=True))
+        elif os.path.exists(pattern):
+            matches = [pattern]
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                print(f"No files match {pattern}")
+        paths.extend(path for path in matches if os.path.isfile(path))
+
+    seen = set()
+    unique_paths = []
+    for path in paths:
+        real_path = os.path.realpath(path)
+        if real_path not in seen:
+            seen.add(real_path)
+            unique_paths.append(path)
+    return unique_paths
+
+
+def load_manifest(manifest_path):
+    try:
+        with open(manifest_path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+
+
+def save_manifest(manifest_path, manifest):
+    """Write the manifest atomically, so an interrupted run never leaves it half written"""
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temp_path, manifest_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def content_hash(path, entry):
+    """SHA-256 of a file. The hash in its manifest entry is reused while the size and
+    modification time are unchanged, so unchanged archives are not read again."""
+    stat = os.stat(path)
+    if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return entry['sha256'], stat
+    return parse_cache.file_sha256(path), stat
+
+
+def run_settings(args):
+    """Options that change the output; a manifest entry made with other settings is not reused"""
+    return {'parser_choice': args.parser, 'format': args.format, 'backend': args.backend or ''}
+
+
+def file_settings(settings, output_location):
+    """run_settings plus where the file's output goes (the output file, or the directory it is
+    written to), so a run into another location converts the file again"""
+    return dict(settings, output=os.path.abspath(output_location))
+
+
+def is_unchanged(entry, sha256, settings):
+    """Whether a manifest entry shows this content was already converted the same way by
+    the current parser version, and its output is still there"""
+    if not entry or entry.get('sha256') != sha256 or entry.get('settings') != settings:
+        return False
+    if not entry.get('output') or not os.path.exists(entry['output']):
+        return False
+    try:
+        return importlib.import_module(entry['parser']).PARSER_VERSION == entry['parser_version']
+    except Exception:
+        return False
+
+
+def convert_file(pdf_path, output_dir, backend=None, output_format='xlsx', kind=None, file_type=None):
+    """Convert one PDF into a temporary file in output_dir. Runs in a worker process.
+
+    Returns the batch summary (see converter.convert_batch_file) with the temporary file in
+    'temp_path'; the caller gives it its final name.
+    """
+    result = converter.convert_batch_file(pdf_path, os.path.basename(pdf_path), backend, output_format,
+                                          kind=kind, file_type=file_type)
+    summary = result['summary']
+    if result['conversion']:
+        fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in converter.iter_output_chunks(result['conversion']):
+                file.write(chunk)
+        summary['temp_path'] = temp_path
+    return summary
+
+
+def place_output(summary, output_path=None, used_outputs=None):
+    """Move a converted file from its temporary path to output_path, or to its own output
+    name next to the temporary file, and return where it went. Names in used_outputs are
+    not overwritten; a number is added instead."""
+    target = output_path
+    if target:
+        # Several csv/parquet sheets come as a zip, whatever the requested name says
+        extension = os.path.splitext(summary['output_filename'])[1]
+        if not target.lower().endswith(extension):
+            target = os.path.splitext(target)[0] + extension
+    else:
+        output_dir = os.path.dirname(summary['temp_path'])
+        target = os.path.join(output_dir, summary['output_filename'])
+        base_name, extension = os.path.splitext(target)
+        number = 1
+        while used_outputs and os.path.abspath(target) in used_outputs:
+            number += 1
+            target = f"{base_name} ({number}){extension}"
+    if used_outputs is not None:
+        used_outputs.add(os.path.abspath(target))
+    os.replace(summary['temp_path'], target)
+    return target
+
+
+def manifest_entry(file_info, settings, summary, target):
+    return dict(file_info, settings=settings, output=os.path.abspath(target),
+                parser=summary['parser'], parser_version=summary['parser_version'],
+                converted_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def describe_counts(summary):
+    counts = [f"{summary[f'{key}_count']} {key.replace('_', ' ')}"
+              for key in converter.RECORD_TYPES if f"{key}_count" in summary]
+    return ', '.join(counts)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python main.py',
+        description="Convert Biloxi, Paul and unpaid charges PDF reports. "
+                    "Files whose content was already converted with the same settings are skipped.",
+        epilog=USAGE_EXAMPLES,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('inputs', nargs='+', help="PDF files, directories or glob patterns. With a single "
+                        "PDF, a second argument ending in an output extension is the output file")
+    parser.add_argument('-o', '--output-dir', help="where outputs are written (default: next to each PDF)")
+    parser.add_argument('-j', '--workers', type=int, default=converter.CONVERSION_WORKERS,
+                        help=f"worker processes (default: {converter.CONVERSION_WORKERS})")
+    parser.add_argument('-p', '--parser', choices=sorted(PARSER_CHOICES), default='auto',
+                        help="parser for every file; 'auto' picks one per file (default)")
+    parser.add_argument('-f', '--format', choices=sorted(output_formats.OUTPUT_FORMATS),
+                        help="output format (default: from the output file's extension, else xlsx)")
+    parser.add_argument('-b', '--backend', choices=sorted(pdf_extract.EXTRACTION_BACKENDS),
+                        help="text extraction backend (default: the parser's own)")
+    parser.add_argument('--manifest', default=MANIFEST_PATH,
+                        help=f"manifest of converted inputs (default: {MANIFEST_PATH})")
+    parser.add_argument('--force', action='store_true', help="convert files even if they are unchanged")
+    return parser
+
+
+def main(argv=None):
+    """Command line entry point; returns the exit status (1 if any file failed)"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # Old form: python main.py input.pdf output.xlsx
+    output_path = None
+    output_extension = os.path.splitext(args.inputs[-1])[1].lower().lstrip('.')
+    if (len(args.inputs) == 2 and args.inputs[0].lower().endswith('.pdf')
+            and (output_extension in output_formats.OUTPUT_FORMATS or output_extension == 'zip')):
+        output_path = args.inputs.pop()
+        if not args.format and output_extension in output_formats.OUTPUT_FORMATS:
+            args.format = output_extension
+    args.format = args.format or output_formats.DEFAULT_FORMAT
+    try:
+        output_formats.validate_format(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    pdf_paths = expand_inputs(args.inputs)
+    if not pdf_paths:
+        print("No PDF files to convert")
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    manifest = load_manifest(args.manifest)
+    settings = run_settings(args)
+    kind, file_type = PARSER_CHOICES[args.parser]
+    started = time.perf_counter()
+
+    pending = []
+    skipped = 0
+    for pdf_path in pdf_paths:
+        key = os.path.realpath(pdf_path)
+        entry = manifest.get(key)
+        sha256, stat = content_hash(pdf_path, entry)
+        output_dir = args.output_dir or os.path.dirname(os.path.abspath(output_path or pdf_path))
+        pdf_settings = file_settings(settings, output_path or output_dir)
+        if not args.force and is_unchanged(entry, sha256, pdf_settings):
+            skipped += 1
+            print(f"skip   {pdf_path} (unchanged)")
+            continue
+        pending.append((pdf_path, key, output_dir, {'sha256': sha256, 'size': stat.st_size,
+                                                    'mtime_ns': stat.st_mtime_ns}, pdf_settings))
+
+    failed = 0
+    used_outputs = set()
+
+    def finish(pdf_path, key, file_info, pdf_settings, summary):
+        nonlocal failed
+        if summary['status'] != 'ok':
+            failed += 1
+            print(f"error  {pdf_path}: {summary['detail']}")
+            return
+        # Two inputs with the same output name in one run must not overwrite each other
+        target = place_output(summary, output_path, used_outputs)
+        print(f"ok     {pdf_path} -> {target} ({describe_counts(summary)}, {summary['seconds']}s)")
+        manifest[key] = manifest_entry(file_info, pdf_settings, summary, target)
+
+    try:
+        if args.workers <= 1 or len(pending) <= 1:
+            for pdf_path, key, output_dir, file_info, pdf_settings in pending:
+                summary = convert_file(pdf_path, output_dir, args.backend, args.format, kind, file_type)
+                finish(pdf_path, key, file_info, pdf_settings, summary)
+        else:
+            with ProcessPoolExecutor(max_workers=args.workers) as executor:
+                futures = {
+                    executor.submit(convert_file, pdf_path, output_dir, args.backend, args.format, kind, file_type):
+                        (pdf_path, key, file_info, pdf_settings)
+                    for pdf_path, key, output_dir, file_info, pdf_settings in pending
+                }
+                for future in as_completed(futures):
+                    pdf_path, key, file_info, pdf_settings = futures[future]
+                    try:
+                        summary = future.result()
+                    except Exception as e:
+                        summary = {'status': 'error', 'detail': str(e)}
+                    finish(pdf_path, key, file_info, pdf_settings, summary)
+    finally:
+        # Whatever finished is recorded, even when the run is interrupted
+        if pending:
+            save_manifest(args.manifest, manifest)
+
+    print(f"{len(pending) - failed} converted, {skipped} unchanged, {failed} failed "
+          f"in {time.perf_counter() - started:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,597 @@
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+import biloxy_parse
+import paul_parse
+import unpaid_charges_parse
+import pdf_extract
+import parse_cache
+import output_formats
+import report_detect
+
+# Parser module for each claims file type returned by claims_file_type
+CLAIMS_PARSERS = {
+    'biloxi': biloxy_parse,
+    'paul': paul_parse,
+}
+
+# Worker processes for the conversion pool owned by the web app
+CONVERSION_WORKERS = int(os.environ.get('CONVERSION_WORKERS', str(os.cpu_count() or 1)))
+
+
+# Minimum seconds between two progress events of the same stage
+PROGRESS_INTERVAL = 0.2
+
+# Bytes per chunk when streaming an output file built in memory
+OUTPUT_CHUNK_SIZE = 64 * 1024
+
+
+class ConversionError(Exception):
+    """A conversion failure that should reach the client with an HTTP status code.
+    Raised inside worker processes, so it only carries picklable arguments."""
+
+    def __init__(self, status_code, detail):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StageTimer:
+    """Reports conversion progress to a callback and records how long each stage took.
+
+    progress receives dicts such as {'stage': 'extracting', 'pages_done': 3, 'page_count': 40}.
+    Every stage change carries the 'timings' (seconds per finished stage) so far.
+    """
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.timings = {}
+        self.current = None
+        self._started = None
+        self._last_report = 0.0
+
+    def stage(self, name, **info):
+        self._close_stage()
+        self.current = name
+        self._started = time.perf_counter()
+        self._send(dict(info, timings=dict(self.timings)))
+
+    def report(self, **info):
+        """Progress within the current stage, throttled to one event per PROGRESS_INTERVAL"""
+        if time.perf_counter() - self._last_report >= PROGRESS_INTERVAL:
+            self._send(info)
+
+    def finish(self):
+        self._close_stage()
+        self.current = 'done'
+        self._send({'timings': dict(self.timings)})
+        return dict(self.timings)
+
+    def _close_stage(self):
+        if self.current and self._started is not None:
+            self.timings[self.current] = round(time.perf_counter() - self._started, 3)
+
+    def _send(self, info):
+        self._last_report = time.perf_counter()
+        if self.progress:
+            try:
+                self.progress(dict(info, stage=self.current))
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+
+    def pages_extracted(self, pages_done, page_count):
+        self.report(pages_done=pages_done, page_count=page_count)
+
+    def lines_parsed(self, pages_parsed, lines_parsed):
+        self.report(pages_parsed=pages_parsed, lines_parsed=lines_parsed)
+
+
+def open_report(pdf_path, backend=None):
+    """The PDF opened once for detecting the report and parsing it (see parse_claims_pdf). Files
+    are opened on first read, so a cached parse of a report of known type reads nothing."""
+    return pdf_extract.PDFDocument(pdf_path, backend or pdf_extract.DEFAULT_BACKEND, fallback='pdfplumber')
+
+
+def parser_document(pdf_path, parser, backend=None, document=None):
+    """document when it reads the PDF with the parser's backend, otherwise the PDF opened the
+    parser's way"""
+    if document is not None and document.primary.name == (backend or parser.EXTRACTION_BACKEND):
+        return pdf_extract.open_document(document)
+    return parser.open_pdf_document(pdf_path, backend)
+
+
+def read_pages(document, progress=None, pages=None):
+    """The document's page texts, streamed (see PDFDocument.iter_pages) so that only the page
+    being parsed is in memory. pages['with_text'] counts the pages that had any text."""
+    for page_text, engine in document.iter_pages(progress):
+        if pages is not None and page_text.strip():
+            pages['with_text'] += 1
+        yield page_text
+
+
+def parse_claims_pdf(pdf_path, parser, backend=None, timer=None, document=None):
+    """Extract and parse a Biloxi/Paul claims PDF with the given parser module.
+    Pages are parsed as they are extracted, and only the records are kept. document is the
+    open_report the report was detected from, if any.
+    Results are cached by PDF content hash, so a repeated upload skips straight to the workbook.
+    timer is an optional StageTimer that receives extraction and parsing progress."""
+    timer = timer or StageTimer()
+    timer.stage('hashing')
+    key = parse_cache.key_for_pdf(pdf_path, parser, backend)
+    cached = parse_cache.get(key)
+    if cached:
+        print(f"Parse cache hit for {parser.__name__}")
+        cached['cache_hit'] = True
+        return cached
+
+    # Open the PDF once; the layout fallback reuses the same document
+    pages = {'with_text': 0}
+    with parser_document(pdf_path, parser, backend, document) as document:
+        timer.stage('extracting', pages_done=0, lines_parsed=0, page_count=document.page_count)
+        claims_data, pattern_missed_data = parser.parse_insurance_claims_with_fallback(
+            read_pages(document, timer.pages_extracted, pages), document, progress=timer.lines_parsed
+        )
+        page_engines = document.page_engines()
+    if not pages['with_text']:
+        raise ConversionError(400, "No text extracted from PDF")
+
+    result = {
+        'page_engines': page_engines,
+        'claims': claims_data,
+        'pattern_missed': pattern_missed_data
+    }
+    if claims_data or pattern_missed_data:
+        parse_cache.put(key, result)
+    return dict(result, cache_hit=False)
+
+
+def parse_unpaid_pdf(pdf_path, backend=None, timer=None, document=None):
+    """Extract and parse an unpaid charges PDF page by page, cached by PDF content hash like
+    parse_claims_pdf"""
+    parser = unpaid_charges_parse
+    timer = timer or StageTimer()
+    timer.stage('hashing')
+    key = parse_cache.key_for_pdf(pdf_path, parser, backend)
+    cached = parse_cache.get(key)
+    if cached:
+        print(f"Parse cache hit for {parser.__name__}")
+        cached['cache_hit'] = True
+        return cached
+
+    pages = {'with_text': 0}
+    with parser_document(pdf_path, parser, backend, document) as document:
+        timer.stage('extracting', pages_done=0, lines_parsed=0, page_count=document.page_count)
+        charges_data = parser.parse_unpaid_charges(read_pages(document, timer.pages_extracted, pages),
+                                                   progress=timer.lines_parsed)
+        page_engines = document.page_engines()
+    if not pages['with_text']:
+        raise ConversionError(400, "No text extracted from PDF")
+
+    result = {
+        'page_engines': page_engines,
+        'charges': charges_data
+    }
+    if result['charges']:
+        parse_cache.put(key, result)
+    return dict(result, cache_hit=False)
+
+
+def detect_report(pdf_path):
+    """Content-based detection of the report in pdf_path, a path or an open_report (see
+    report_detect), or None when it is not confident enough"""
+    detection = report_detect.detect_report(pdf_path)
+    print(f"Detected report type {detection['report_type']} (confidence {detection['confidence']}, "
+          f"{detection['seconds'] * 1000:.1f} ms)")
+    if detection['confidence'] < report_detect.MIN_CONFIDENCE:
+        return None
+    return detection
+
+
+def claims_file_type(filename, pdf_path=None):
+    """Claims file type ('biloxi' or 'paul'), from the PDF's first page when pdf_path (a path or
+    an open_report) is given and the detection is confident, otherwise from the file name;
+    Biloxi when unclear"""
+    if pdf_path:
+        detection = detect_report(pdf_path)
+        if detection and detection['kind'] == 'claims':
+            return detection['file_type']
+    filename_lower = filename.lower()
+    if 'paul' in filename_lower:
+        return 'paul'
+    return 'biloxi'
+
+
+def report_kind(filename, pdf_path=None):
+    """(kind, file_type) of a report: ('unpaid', None) for unpaid charges reports, otherwise
+    ('claims', 'biloxi' or 'paul'). Detected from the PDF's first page when pdf_path (a path or
+    an open_report) is given, falling back to the file name when the detection is not confident."""
+    if pdf_path:
+        detection = detect_report(pdf_path)
+        if detection:
+            return detection['kind'], detection['file_type']
+    if 'unpaid' in filename.lower():
+        return 'unpaid', None
+    return 'claims', claims_file_type(filename)
+
+
+def claims_output_filename(input_name, extension='xlsx'):
+    """Output name for a claims upload: 'Biloxi ... MMDDYYYY' becomes 'Bilxy <next day>.xlsx'"""
+    print(f"Input filename: '{input_name}'")
+    if input_name.startswith('Biloxi'):
+        date_match = re.search(r'(\d{8})', input_name)
+        if date_match:
+            date_str = date_match.group(1)
+            try:
+                date_obj = datetime.strptime(date_str, '%m%d%Y')
+                next_date = date_obj + timedelta(days=1)
+                new_date_str = next_date.strftime('%m%d%Y')
+                output_filename = f"Bilxy {new_date_str}.{extension}"
+                print(f"Generated filename: '{output_filename}'")
+            except Exception as e:
+                print(f"Date parsing error: {e}")
+                output_filename = f"Bilxy_output.{extension}"
+        else:
+            print("No date found in filename")
+            output_filename = f"Bilxy_output.{extension}"
+    else:
+        base_name = input_name.rsplit('.', 1)[0]
+        output_filename = f"{base_name}_processed.{extension}"
+
+    print(f"Final output filename: '{output_filename}'")
+    return output_filename
+
+
+def unpaid_output_filename(input_name, extension='xlsx'):
+    base_name = input_name.rsplit('.', 1)[0]
+    return f"{base_name}_unpaid_charges.{extension}"
+
+
+def build_output(sheets, output_format):
+    """Output of a conversion in output_format. xlsx and parquet are built here, in the worker;
+    csv and jsonl rows are handed back as 'sheets' so the server can stream them as they are
+    serialised (see output_formats.iter_output)."""
+    output = {
+        'output_format': output_format,
+        'media_type': output_formats.media_type(output_format, sheets),
+    }
+    if output_format in output_formats.STREAMED_FORMATS:
+        output['sheets'] = [(title, columns, list(rows)) for title, columns, rows in sheets]
+    else:
+        output['content'] = b''.join(output_formats.iter_output(output_format, sheets))
+    return output
+
+
+def iter_output_chunks(conversion):
+    """Bytes chunks of a conversion's output: built in the worker, or serialised row by row
+    by the caller for streamed formats"""
+    if 'content' in conversion:
+        content = memoryview(conversion['content'])
+        return (content[start:start + OUTPUT_CHUNK_SIZE] for start in range(0, len(content), OUTPUT_CHUNK_SIZE))
+    return output_formats.iter_output(conversion['output_format'], conversion['sheets'])
+
+
+def convert_claims_pdf(pdf_path, input_name, file_type=None, backend=None, output_format='xlsx', progress=None,
+                       document=None):
+    """Parse a Biloxi/Paul PDF and write the output file. Runs in a worker process.
+    Without a file_type, the report is detected from its first page (see claims_file_type).
+    The detection and the parse share one open_report, or document when given.
+
+    Returns a dict with the output (see build_output), the download name
+    ('output_filename'), the per-page extraction engines, the cache-hit flag, the
+    number of records of each kind ('record_counts') and the seconds spent in each
+    stage ('timings'). progress, if given, is called
+    with StageTimer events.
+    """
+    try:
+        output_formats.validate_format(output_format)
+    except ValueError as e:
+        raise ConversionError(400, str(e))
+    timer = StageTimer(progress)
+    with pdf_extract.open_document(document) if document else open_report(pdf_path, backend) as document:
+        file_type = file_type or claims_file_type(input_name, document)
+        parser = CLAIMS_PARSERS.get(file_type, biloxy_parse)
+        result = parse_claims_pdf(pdf_path, parser, backend, timer, document)
+    claims_data = result['claims']
+    pattern_missed_data = result['pattern_missed']
+
+    if not claims_data and not pattern_missed_data:
+        # Save debug file; the text was not kept, so it is extracted again
+        with open('debug_text.txt', 'w', encoding='utf-8') as f:
+            f.write(parser.extract_text_from_pdf(pdf_path, backend))
+        raise ConversionError(400, "No data found in PDF")
+
+    print(f"Pages extracted by engine: {pdf_extract.summarize_engines(result['page_engines'])}")
+
+    # Create the output with both sheets using appropriate parser.
+    # It is built in memory; nothing is left behind in the temp directory
+    timer.stage('writing', records=len(claims_data) + len(pattern_missed_data))
+    sheets = parser.output_sheets(claims_data, pattern_missed_data)
+    output = build_output(sheets, output_format)
+    output_filename = claims_output_filename(input_name, output_formats.output_extension(output_format, sheets))
+
+    return {
+        **output,
+        'output_filename': output_filename,
+        'page_engines': result['page_engines'],
+        'cache_hit': result['cache_hit'],
+        'record_counts': {'claims': len(claims_data), 'pattern_missed': len(pattern_missed_data)},
+        'timings': timer.finish()
+    }
+
+
+def convert_unpaid_pdf(pdf_path, input_name, backend=None, output_format='xlsx', progress=None, document=None):
+    """Parse an unpaid charges PDF and write the output file. Runs in a worker process.
+    document is the open_report to parse, if there is one. Returns the same dict as convert_claims_pdf."""
+    try:
+        output_formats.validate_format(output_format)
+    except ValueError as e:
+        raise ConversionError(400, str(e))
+    timer = StageTimer(progress)
+    result = parse_unpaid_pdf(pdf_path, backend, timer, document)
+    charges_data = result['charges']
+
+    if not charges_data:
+        raise ConversionError(400, "No unpaid charges data found in PDF")
+
+    timer.stage('writing', records=len(charges_data))
+    sheets = unpaid_charges_parse.output_sheets(charges_data)
+    output = build_output(sheets, output_format)
+
+    return {
+        **output,
+        'output_filename': unpaid_output_filename(input_name, output_formats.output_extension(output_format, sheets)),
+        'page_engines': result['page_engines'],
+        'cache_hit': result['cache_hit'],
+        'record_counts': {'charges': len(charges_data)},
+        'timings': timer.finish()
+    }
+
+
+# NDJSON record_type of each record list returned by parse_pdf_records
+RECORD_TYPES = {
+    'claims': 'claim',
+    'pattern_missed': 'pattern_missed',
+    'charges': 'charge',
+}
+
+
+def parse_pdf_records(pdf_path, kind, file_type=None, backend=None, input_name=''):
+    """Parse a PDF into JSON-ready records without building any output file. Runs in a worker process.
+
+    kind is 'claims' (file_type picks the Biloxi or Paul parser, detected from the PDF and
+    input_name when not given) or 'unpaid'. Returns the record lists ('claims' and
+    'pattern_missed', or 'charges') plus a few facts about the parse.
+    """
+    with open_report(pdf_path, backend) as document:
+        if kind == 'unpaid':
+            result = parse_unpaid_pdf(pdf_path, backend, document=document)
+            records = {'charges': result['charges']}
+        else:
+            file_type = file_type or claims_file_type(input_name, document)
+            parser = CLAIMS_PARSERS.get(file_type, biloxy_parse)
+            result = parse_claims_pdf(pdf_path, parser, backend, document=document)
+            records = {'claims': result['claims'], 'pattern_missed': result['pattern_missed']}
+
+    return {
+        'kind': kind,
+        'file_type': file_type if kind != 'unpaid' else 'unpaid',
+        'page_count': len(result['page_engines']),
+        'extraction_engines': pdf_extract.summarize_engines(result['page_engines']),
+        'cache_hit': result['cache_hit'],
+        **records
+    }
+
+
+def iter_typed_records(parsed):
+    """(record_type, record) pairs of a parse_pdf_records result, followed by a
+    'summary' record with the record counts and the facts about the parse"""
+    summary = {key: value for key, value in parsed.items() if key not in RECORD_TYPES}
+    for key, record_type in RECORD_TYPES.items():
+        if key in parsed:
+            summary[f"{key}_count"] = len(parsed[key])
+            for record in parsed[key]:
+                yield record_type, record
+    yield 'summary', summary
+
+
+# Charge records per NDJSON batch when streaming an unpaid charges PDF
+STREAM_BATCH_SIZE = 200
+
+
+def _stream_summary(kind, file_type, page_engines, cache_hit, records):
+    summary = {
+        'kind': kind,
+        'file_type': file_type if kind != 'unpaid' else 'unpaid',
+        'page_count': len(page_engines),
+        'extraction_engines': pdf_extract.summarize_engines(page_engines),
+        'cache_hit': cache_hit,
+    }
+    for key, key_records in records.items():
+        summary[f"{key}_count"] = len(key_records)
+    return 'summary', summary
+
+
+def stream_pdf_records(pdf_path, kind, queue, file_type=None, backend=None, input_name=''):
+    """Parse a PDF and put its records on queue while the rest of the PDF is still being read.
+    Runs in a worker process; queue is a multiprocessing.Manager queue there.
+
+    Each queue item is a list of (record_type, record) pairs: one per page for claims, up to
+    STREAM_BATCH_SIZE charges for unpaid charges. The last batch holds the 'summary' record
+    that iter_typed_records would end with. A failure is put on the queue as a ConversionError,
+    and None always marks the end. A cached parse is streamed from the cache.
+    """
+    try:
+        # The detection and the parse share the report's one open document
+        with open_report(pdf_path, backend) as report:
+            if kind != 'unpaid':
+                file_type = file_type or claims_file_type(input_name, report)
+            records = {'charges': []} if kind == 'unpaid' else {'claims': [], 'pattern_missed': []}
+            parser = unpaid_charges_parse if kind == 'unpaid' else CLAIMS_PARSERS.get(file_type, biloxy_parse)
+            key = parse_cache.key_for_pdf(pdf_path, parser, backend)
+            cached = parse_cache.get(key)
+            if cached:
+                print(f"Parse cache hit for {parser.__name__}")
+                for records_key, record_type in RECORD_TYPES.items():
+                    if records_key in records:
+                        records[records_key] = cached[records_key]
+                        for start in range(0, len(cached[records_key]), STREAM_BATCH_SIZE):
+                            queue.put([(record_type, record)
+                                       for record in cached[records_key][start:start + STREAM_BATCH_SIZE]])
+                queue.put([_stream_summary(kind, file_type, cached['page_engines'], True, records)])
+                return
+
+            pages = {'with_text': 0}
+            with parser_document(pdf_path, parser, backend, report) as document:
+                page_texts = read_pages(document, pages=pages)
+                if kind == 'unpaid':
+                    batch = []
+                    for record in parser.iter_unpaid_charges(pdf_extract.iter_lines(page_texts)):
+                        records['charges'].append(record)
+                        batch.append(('charge', record))
+                        if len(batch) >= STREAM_BATCH_SIZE:
+                            queue.put(batch)
+                            batch = []
+                    if batch:
+                        queue.put(batch)
+                else:
+                    for page_num, page_claims, page_missed, page_parser in parser.iter_claims_by_page(page_texts,
+                                                                                                      document):
+                        records['claims'].extend(page_claims)
+                        records['pattern_missed'].extend(page_missed)
+                        batch = [('claim', record) for record in page_claims]
+                        batch.extend(('pattern_missed', record) for record in page_missed)
+                        if batch:
+                            queue.put(batch)
+                page_engines = document.page_engines()
+
+            if not pages['with_text']:
+                raise ConversionError(400, "No text extracted from PDF")
+            # The streamed claims match a regular parse only with the per-page fallback
+            if any(records.values()) and (kind == 'unpaid' or parser.FALLBACK_MODE == 'page'):
+                parse_cache.put(key, {'page_engines': page_engines, **records})
+            queue.put([_stream_summary(kind, file_type, page_engines, False, records)])
+
+    except ConversionError as e:
+        queue.put(e)
+    except Exception as e:
+        print(f"Streaming parse error: {e}")
+        queue.put(ConversionError(500, str(e)))
+    finally:
+        queue.put(None)
+
+
+def convert_batch_file(pdf_path, input_name, backend=None, output_format='xlsx', combine=False, kind=None,
+                       file_type=None):
+    """Convert one file of a batch, routed to its parser by report_kind unless kind (and, for
+    claims, file_type) is given. Runs in a worker process.
+
+    Returns {'summary': ..., 'conversion': ...}. A file that fails does not fail the batch: its
+    summary has status 'error' and the detail, and there is no conversion. With combine, the
+    conversion keeps its rows as 'sheets' for combine_batch_sheets instead of building a file.
+    """
+    started = time.perf_counter()
+    # The detection and the conversion share the report's one open document
+    with open_report(pdf_path, backend) as report:
+        if not kind:
+            kind, file_type = report_kind(input_name, report)
+        elif kind == 'claims' and not file_type:
+            file_type = claims_file_type(input_name, report)
+        parser = unpaid_charges_parse if kind == 'unpaid' else CLAIMS_PARSERS.get(file_type, biloxy_parse)
+        summary = {'file': input_name, 'kind': kind, 'file_type': file_type or kind,
+                   'parser': parser.__name__, 'parser_version': parser.PARSER_VERSION}
+        try:
+            # jsonl conversions hand their rows back unserialised (see build_output)
+            conversion_format = 'jsonl' if combine else output_format
+            if kind == 'unpaid':
+                conversion = convert_unpaid_pdf(pdf_path, input_name, backend, conversion_format, document=report)
+            else:
+                conversion = convert_claims_pdf(pdf_path, input_name, file_type, backend, conversion_format,
+                                                document=report)
+        except ConversionError as e:
+            summary.update(status='error', detail=e.detail)
+            conversion = None
+        except Exception as e:
+            print(f"Batch conversion error for {input_name}: {e}")
+            summary.update(status='error', detail=str(e))
+            conversion = None
+        else:
+            summary.update(
+                status='ok',
+                output_filename=conversion['output_filename'],
+                page_count=len(conversion['page_engines']),
+                cache_hit=conversion['cache_hit'],
+                **{f"{key}_count": count for key, count in conversion['record_counts'].items()},
+                timings=conversion['timings'],
+            )
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    return {'summary': summary, 'conversion': conversion}
+
+
+# Columns of the batch summary sheet, and the summary field each one shows
+BATCH_SUMMARY_COLUMNS = {
+    'File': 'file',
+    'Report': 'file_type',
+    'Status': 'status',
+    'Detail': 'detail',
+    'Output': 'output_filename',
+    'Pages': 'page_count',
+    'Claims': 'claims_count',
+    'Pattern Missed': 'pattern_missed_count',
+    'Charges': 'charges_count',
+    'Cache Hit': 'cache_hit',
+    'Seconds': 'seconds',
+}
+
+
+def batch_summary_sheet(summaries):
+    rows = [[summary.get(field) for field in BATCH_SUMMARY_COLUMNS.values()] for summary in summaries]
+    return ('Batch Summary', list(BATCH_SUMMARY_COLUMNS), rows)
+
+
+def combine_batch_sheets(results):
+    """Merge the sheets of combined batch conversions by title into one set of sheets, each row
+    prefixed with the file it came from, followed by the batch summary sheet"""
+    combined = {}
+    for result in results:
+        conversion = result['conversion']
+        if not conversion:
+            continue
+        source = result['summary']['file']
+        for title, columns, rows in conversion['sheets']:
+            if title not in combined:
+                combined[title] = (['Source File'] + list(columns), [])
+            combined_columns, combined_rows = combined[title]
+            for column in columns:
+                if column not in combined_columns:
+                    combined_columns.append(column)
+            positions = [combined_columns.index(column) for column in columns]
+            for row in rows:
+                combined_row = [None] * len(combined_columns)
+                combined_row[0] = source
+                for position, value in zip(positions, row):
+                    combined_row[position] = value
+                combined_rows.append(combined_row)
+    sheets = [(title, columns, rows) for title, (columns, rows) in combined.items()]
+    sheets.append(batch_summary_sheet([result['summary'] for result in results]))
+    return sheets
+
+
+class QueueProgress:
+    """Picklable progress callback that forwards events for one job to a queue
+    (a multiprocessing.Manager queue when the conversion runs in a worker process)"""
+
+    def __init__(self, job_id, queue):
+        self.job_id = job_id
+        self.queue = queue
+
+    def __call__(self, event):
+        self.queue.put((self.job_id, event))
+
+
+# Converter functions that can be run as jobs, by job kind
+JOB_CONVERTERS = {
+    'claims': convert_claims_pdf,
+    'unpaid': convert_unpaid_pdf,
+}
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import re
+
+# Per-client keyword lists: a JSON file with the extra words of each report format, e.g.
+# {"biloxi": {"insurance_keywords": ["ALLSTATE"]}, "unpaid": {"header_words": ["RUN BY:"]}}
+KEYWORDS_FILE = os.environ.get('BILXY_KEYWORDS_FILE', '')
+
+_configured = None
+
+
+def keyword_regex(keywords):
+    """Regex for any of the keywords as a substring, with the keywords merged into a trie, so at
+    each position of the text the match follows one branch per character instead of trying every
+    keyword in turn"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    if not trie:
+        return '(?!)'
+    return _trie_regex(trie)
+
+
+def _trie_regex(node):
+    branches = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if '' in node:
+        return '(?:' + '|'.join(branches) + ')?'
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+
+def compile_keywords(keywords):
+    """Compiled keyword_regex: search(text) finds the leftmost keyword, like
+    min(text.find(keyword) ...) over the keywords that occur, in one pass over the text"""
+    return re.compile(keyword_regex(keywords))
+
+
+def load_keywords_file(path):
+    """Keyword lists by format from a KEYWORDS_FILE; an unreadable file counts as empty"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            configured = json.load(f)
+        if not isinstance(configured, dict):
+            raise ValueError('expected an object of formats')
+        return configured
+    except (OSError, ValueError) as e:
+        print(f"Keywords file {path} ignored: {e}")
+        return {}
+
+
+def format_keywords(report_format):
+    """The keyword lists KEYWORDS_FILE has for the format, read once"""
+    global _configured
+    if _configured is None:
+        _configured = load_keywords_file(KEYWORDS_FILE) if KEYWORDS_FILE else {}
+    lists = _configured.get(report_format)
+    return lists if isinstance(lists, dict) else {}
+
+
+def configured_keywords(report_format, name, defaults):
+    """The default keywords plus those KEYWORDS_FILE lists for the format under name"""
+    extra = format_keywords(report_format).get(name)
+    if not isinstance(extra, list):
+        extra = []
+    return list(defaults) + [word for word in extra if isinstance(word, str) and word not in defaults]
+
+
+def keywords_version(report_format):
+    """Suffix for the format's PARSER_VERSION when KEYWORDS_FILE has lists for it, so results
+    parsed with other keywords are not taken from the parse cache"""
+    lists = format_keywords(report_format)
+    if not lists:
+        return ''
+    digest = hashlib.sha256(json.dumps(lists, sort_keys=True).encode('utf-8')).hexdigest()
+    return '+kw' + digest[:8]
@@ -1,36 +1,188 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
 import os
-import tempfile
-import pandas as pd
-import re
 from datetime import datetime
-import PyPDF2
-import pdfplumber
-import openpyxl
-from openpyxl.styles import Font, Alignment
-from typing import List, Dict, Tuple
-
-# Import parsing functions from separate modules
-import biloxy_parse
-import paul_parse
-import unpaid_charges_parse
-
-app = FastAPI()
-
-def determine_file_type(filename):
-    """Determine file type based on filename"""
-    filename_lower = filename.lower()
-    if 'paul' in filename_lower:
-        return 'paul'
-    elif 'biloxi' in filename_lower or 'bilxy' in filename_lower:
-        return 'biloxi'
-    else:
-        # Default to biloxi if unclear
-        return 'biloxi'
-
+from typing import Optional
+import asyncio
+import functools
+import json
+import multiprocessing
+import queue
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
+
+import pdf_extract
+import converter
+import uploads
+import artifacts
+import output_formats
+from converter import ConversionError
+
+@asynccontextmanager
+async def lifespan(app):
+    """Own the worker pool that runs PDF conversion for the lifetime of the app,
+    plus the queue that carries job progress back from the workers"""
+    app.state.executor = ProcessPoolExecutor(max_workers=converter.CONVERSION_WORKERS)
+    app.state.manager = multiprocessing.Manager()
+    app.state.progress_queue = app.state.manager.Queue()
+    drain_task = asyncio.create_task(drain_job_events(app.state.progress_queue))
+    print(f"Conversion pool started with {converter.CONVERSION_WORKERS} workers")
+    try:
+        yield
+    finally:
+        app.state.executor.shutdown(wait=True, cancel_futures=True)
+        app.state.progress_queue.put(None)
+        await drain_task
+        app.state.manager.shutdown()
+        app.state.executor = None
+        app.state.manager = None
+        app.state.progress_queue = None
+
+app = FastAPI(lifespan=lifespan)
+
+def validate_backend(backend):
+    """Reject unknown extraction backends before the upload is processed"""
+    if backend and backend not in pdf_extract.EXTRACTION_BACKENDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown extraction backend '{backend}'. Available: {', '.join(sorted(pdf_extract.EXTRACTION_BACKENDS))}"
+        )
 
+def validate_format(output_format):
+    """Reject unknown output formats before the upload is processed"""
+    try:
+        output_formats.validate_format(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def run_conversion(func, *args, **kwargs):
+    """Run a CPU-bound converter function in the worker pool so the event loop stays responsive.
+    Falls back to a thread when the app was started without its lifespan (e.g. a bare TestClient)."""
+    executor = getattr(app.state, 'executor', None)
+    if executor is None:
+        return await run_in_threadpool(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def output_response(conversion):
+    """Stream the output file produced by a converter function, from memory or, for jobs,
+    from the artifact store"""
+    output_filename = conversion['output_filename']
+    if 'artifact_id' in conversion:
+        artifact_path = artifacts.path(conversion['artifact_id'])
+        if not artifact_path:
+            raise HTTPException(status_code=410, detail="The converted file has expired")
+        response = FileResponse(artifact_path, media_type=conversion['media_type'], filename=output_filename)
+    else:
+        response = StreamingResponse(converter.iter_output_chunks(conversion), media_type=conversion['media_type'])
+        if 'content' in conversion:
+            response.headers["Content-Length"] = str(len(conversion['content']))
+    response.headers["Content-Disposition"] = f'attachment; filename="{output_filename}"'
+    response.headers["X-Extraction-Engines"] = pdf_extract.summarize_engines(conversion['page_engines'])
+    response.headers["X-Cache"] = "HIT" if conversion['cache_hit'] else "MISS"
+    return response
+
+# Conversion jobs started through /jobs/, by job id. Finished jobs are dropped
+# JOB_TTL_SECONDS after they finish; their output files live in the artifact store.
+JOBS = {}
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', str(artifacts.ARTIFACT_TTL_SECONDS)))
+# Seconds between two job status events on /jobs/{job_id}/events
+JOB_EVENT_INTERVAL = 0.5
+# Share of the progress bar covered by each conversion stage
+STAGE_PROGRESS = {
+    'queued': (0, 0),
+    'hashing': (0, 5),
+    # Pages are parsed as they are extracted
+    'extracting': (5, 90),
+    'writing': (90, 99),
+    'done': (100, 100),
+}
+_job_tasks = set()
+
+def job_progress(job):
+    """Overall percentage for a job from its stage and the pages/lines done within it"""
+    start, end = STAGE_PROGRESS.get(job['stage'], (0, 0))
+    fraction = 0
+    if job['stage'] == 'extracting' and job.get('page_count'):
+        fraction = job.get('pages_done', 0) / job['page_count']
+    return round(start + (end - start) * min(fraction, 1))
+
+def job_status(job):
+    """Public view of a job, without the converter result"""
+    return {key: value for key, value in job.items() if key != 'result'}
+
+def apply_job_event(job_id, event):
+    """Record a progress event from a converter (see converter.StageTimer)"""
+    job = JOBS.get(job_id)
+    if not job or job['status'] in ('done', 'error'):
+        return
+    job.update(event)
+    job['progress'] = job_progress(job)
+    job['updated'] = time.time()
+
+async def drain_job_events(queue):
+    """Apply progress events sent by the worker processes until a None arrives"""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(None, queue.get)
+        if item is None:
+            break
+        apply_job_event(*item)
+
+def prune_jobs():
+    """Forget finished jobs older than JOB_TTL_SECONDS and delete their output files"""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id, job in list(JOBS.items()):
+        if job['status'] in ('done', 'error') and job['updated'] < cutoff:
+            del JOBS[job_id]
+            if job.get('result'):
+                artifacts.delete(job['result']['artifact_id'])
+
+async def run_job(job_id, func, pdf_path, *args):
+    """Run a converter function for a job and record its result or error"""
+    job = JOBS[job_id]
+    job['status'] = 'running'
+    progress_queue = getattr(app.state, 'progress_queue', None)
+    if progress_queue is not None:
+        progress = converter.QueueProgress(job_id, progress_queue)
+    else:
+        progress = functools.partial(apply_job_event, job_id)
+    try:
+        result = await run_conversion(func, pdf_path, *args, progress=progress)
+        # Keep the output on disk until it is downloaded or expires
+        extension = '.' + result['output_filename'].rsplit('.', 1)[-1]
+        output = converter.iter_output_chunks(result)
+        result.pop('content', None)
+        result.pop('sheets', None)
+        result['artifact_id'] = await run_in_threadpool(artifacts.put, output, extension)
+        job.update(status='done', stage='done', progress=100, timings=result['timings'], result=result)
+        print(f"Job {job_id} finished: {result['timings']}")
+    except ConversionError as e:
+        job.update(status='error', error=e.detail, error_status=e.status_code)
+    except Exception as e:
+        job.update(status='error', error=str(e), error_status=500)
+    finally:
+        job['updated'] = time.time()
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+
+async def job_events(job_id):
+    """Server-sent events with the job status whenever it changes, until the job finishes"""
+    last_status = None
+    while True:
+        job = JOBS.get(job_id)
+        if job is None:
+            return
+        status = job_status(job)
+        if status != last_status:
+            yield f"data: {json.dumps(status)}\n\n"
+            last_status = status
+        if job['status'] in ('done', 'error'):
+            return
+        await asyncio.sleep(JOB_EVENT_INTERVAL)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
@@ -195,42 +347,71 @@ async def read_root():
             return (bytes/Math.pow(1024,i)).toFixed(2)+' '+sizes[i];
         }
 
-        function simulateProgress(cb) {
-            let p = 0; progressContainer.classList.remove('hidden');
-            const interval = setInterval(() => {
-            p+=Math.random()*15;
-            if(p>=100){p=100; clearInterval(interval); cb();}
-            progressBar.style.width=p+'%';
-            progressText.textContent=`Processing... ${Math.round(p)}%`;
-            },300);
+        const stageLabels = {
+            queued: 'Waiting for a worker',
+            hashing: 'Reading file',
+            extracting: 'Extracting and parsing',
+            writing: 'Writing workbook',
+            done: 'Done'
+        };
+
+        function showProgress(job) {
+            progressContainer.classList.remove('hidden');
+            let detail = '';
+            if (job.stage === 'extracting' && job.page_count) detail = ` (${job.pages_done || 0}/${job.page_count} pages)`;
+            progressBar.style.width = job.progress + '%';
+            progressText.textContent = `${stageLabels[job.stage] || 'Processing'}${detail}... ${job.progress}%`;
         }
 
         function convertFile() {
-            processFile('/upload/', 'insurance_claims.xlsx', 'Insurance Claims');
+            processFile('claims', 'insurance_claims.xlsx', 'Insurance Claims');
         }
         
         function convertUnpaidFile() {
-            processFile('/upload-unpaid/', 'unpaid_charges.xlsx', 'Unpaid Charges');
+            processFile('unpaid', 'unpaid_charges.xlsx', 'Unpaid Charges');
         }
         
-        function processFile(endpoint, defaultFilename, type) {
+        function processFile(kind, defaultFilename, type) {
             if(!selectedFile) return showResult('Please select a file.', 'bg-red-100 text-red-600');
             const formData=new FormData(); formData.append('file',selectedFile);
-            simulateProgress(()=>{
-            fetch(endpoint,{method:'POST',body:formData})
-            .then(r=>r.ok?r.blob():Promise.reject('Conversion failed'))
-            .then(blob=>{
-                const url=URL.createObjectURL(blob);
-                const a=document.createElement('a');
-                a.href=url; a.download=defaultFilename; a.click();
-                URL.revokeObjectURL(url);
-                showResult(`✅ ${selectedFile.name} converted to ${type} successfully.`, 'bg-green-100 text-green-600');
-                progressContainer.classList.add('hidden');
-            })
-            .catch(err=>{
+            const fail = err => {
                 progressContainer.classList.add('hidden');
                 showResult('Error: '+err,'bg-red-100 text-red-600');
-            });
+            };
+            showProgress({stage: 'queued', progress: 0});
+            fetch('/jobs/?kind='+kind,{method:'POST',body:formData})
+            .then(r=>r.ok?r.json():r.json().then(e=>Promise.reject(e.detail||'Conversion failed')))
+            .then(job=>{
+                const events = new EventSource(job.events_url);
+                events.onmessage = e => {
+                    const status = JSON.parse(e.data);
+                    showProgress(status);
+                    if (status.status === 'done') {
+                        events.close();
+                        download(job.download_url, defaultFilename, type).catch(fail);
+                    } else if (status.status === 'error') {
+                        events.close();
+                        fail(status.error);
+                    }
+                };
+                events.onerror = () => { events.close(); fail('Lost connection to the server'); };
+            })
+            .catch(fail);
+        }
+
+        function download(url, defaultFilename, type) {
+            return fetch(url)
+            .then(r=>r.ok?r:Promise.reject('Download failed'))
+            .then(r=>{
+                const match = /filename="([^"]+)"/.exec(r.headers.get('Content-Disposition') || '');
+                return r.blob().then(blob=>{
+                    const link=URL.createObjectURL(blob);
+                    const a=document.createElement('a');
+                    a.href=link; a.download=match ? match[1] : defaultFilename; a.click();
+                    URL.revokeObjectURL(link);
+                    showResult(`✅ ${selectedFile.name} converted to ${type} successfully.`, 'bg-green-100 text-green-600');
+                    progressContainer.classList.add('hidden');
+                });
             });
         }
 
@@ -245,153 +426,304 @@ async def read_root():
     </html>
     """
 
-@app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+@app.post("/upload/", openapi_extra=uploads.openapi_upload())
+async def upload_file(request: Request, backend: Optional[str] = None,
+                      output_format: str = Query(output_formats.DEFAULT_FORMAT, alias='format')):
+    validate_backend(backend)
+    validate_format(output_format)
 
-    temp_pdf_path = None
-    temp_xlsx_path = None
+    # Write the uploaded PDF to disk as it arrives; oversized and non-PDF uploads are rejected here
+    filename, temp_pdf_path = await uploads.receive_pdf(request)
 
     try:
-        # Save uploaded PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-            content = await file.read()
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
-
-        # Determine file type and use appropriate parser
-        file_type = determine_file_type(file.filename)
-        print(f"Detected file type: {file_type} for filename: {file.filename}")
-        
-        if file_type == 'paul':
-            # Use Paul parser
-            text_content = paul_parse.extract_text_from_pdf(temp_pdf_path)
-            if not text_content.strip():
-                raise HTTPException(status_code=400, detail="No text extracted from PDF")
-            claims_data, pattern_missed_data = paul_parse.parse_insurance_claims_with_fallback(text_content, temp_pdf_path)
-        else:
-            # Use Biloxi parser (default)
-            text_content = biloxy_parse.extract_text_from_pdf(temp_pdf_path)
-            if not text_content.strip():
-                raise HTTPException(status_code=400, detail="No text extracted from PDF")
-            claims_data, pattern_missed_data = biloxy_parse.parse_insurance_claims_with_fallback(text_content, temp_pdf_path)
-        
-        if not claims_data and not pattern_missed_data:
-            # Save debug file
-            with open('debug_text.txt', 'w', encoding='utf-8') as f:
-                f.write(text_content)
-            raise HTTPException(status_code=400, detail="No data found in PDF")
-
-        # Generate output filename based on input filename
-        input_name = file.filename
-        print(f"Input filename: '{input_name}'")
-        if input_name.startswith('Biloxi'):
-            import re
-            date_match = re.search(r'(\d{8})', input_name)
-            if date_match:
-                date_str = date_match.group(1)
-                try:
-                    from datetime import datetime, timedelta
-                    date_obj = datetime.strptime(date_str, '%m%d%Y')
-                    next_date = date_obj + timedelta(days=1)
-                    new_date_str = next_date.strftime('%m%d%Y')
-                    output_filename = f"Bilxy {new_date_str}.xlsx"
-                    print(f"Generated filename: '{output_filename}'")
-                except Exception as e:
-                    print(f"Date parsing error: {e}")
-                    output_filename = "Bilxy_output.xlsx"
-            else:
-                print("No date found in filename")
-                output_filename = "Bilxy_output.xlsx"
-        else:
-            base_name = input_name.rsplit('.', 1)[0]
-            output_filename = f"{base_name}_processed.xlsx"
+        # The report type is detected from the PDF's first page, in the worker pool with
+        # parsing and the output file
+        conversion = await run_conversion(
+            converter.convert_claims_pdf, temp_pdf_path, filename, None, backend, output_format
+        )
+        # Stream the output file from memory
+        return output_response(conversion)
 
-        print(f"Final output filename: '{output_filename}'")
+    except ConversionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        # Create Excel file with both sheets using appropriate parser
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_xlsx:
-            temp_xlsx_path = temp_xlsx.name
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    finally:
+        # The output never touches the disk, so only the PDF needs cleaning up
+        if os.path.exists(temp_pdf_path):
+            os.unlink(temp_pdf_path)
 
-        if file_type == 'paul':
-            paul_parse.create_xlsx_file(claims_data, pattern_missed_data, temp_xlsx_path)
-        else:
-            biloxy_parse.create_xlsx_file(claims_data, pattern_missed_data, temp_xlsx_path)
-
-        # Return the Excel file
-        from fastapi.responses import FileResponse
-        response = FileResponse(
-            temp_xlsx_path,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            filename=output_filename
+@app.post("/upload-unpaid/", openapi_extra=uploads.openapi_upload())
+async def upload_unpaid_charges(request: Request, backend: Optional[str] = None,
+                                output_format: str = Query(output_formats.DEFAULT_FORMAT, alias='format')):
+    validate_backend(backend)
+    validate_format(output_format)
+
+    filename, temp_pdf_path = await uploads.receive_pdf(request)
+
+    try:
+        conversion = await run_conversion(
+            converter.convert_unpaid_pdf, temp_pdf_path, filename, backend, output_format
         )
-        response.headers["Content-Disposition"] = f'attachment; filename="{output_filename}"'
-        return response
-    
+        return output_response(conversion)
+
+    except ConversionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
     except Exception as e:
-        # Clean up on error
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.unlink(temp_pdf_path)
-        if temp_xlsx_path and os.path.exists(temp_xlsx_path):
-            os.unlink(temp_xlsx_path)
         raise HTTPException(status_code=500, detail=str(e))
     
     finally:
-        # Only clean up PDF file
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
+        if os.path.exists(temp_pdf_path):
             os.unlink(temp_pdf_path)
 
-@app.post("/upload-unpaid/")
-async def upload_unpaid_charges(file: UploadFile = File(...)):
-    if not file.filename.endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+@app.post("/jobs/", status_code=202, openapi_extra=uploads.openapi_upload())
+async def create_job(request: Request, kind: str = 'claims', backend: Optional[str] = None,
+                     output_format: str = Query(output_formats.DEFAULT_FORMAT, alias='format')):
+    """Start a conversion in the background and return the job id and its URLs"""
+    if kind not in converter.JOB_CONVERTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job kind '{kind}'. Available: {', '.join(sorted(converter.JOB_CONVERTERS))}"
+        )
+    validate_backend(backend)
+    validate_format(output_format)
+    prune_jobs()
+
+    filename, temp_pdf_path = await uploads.receive_pdf(request)
+    if kind == 'claims':
+        args = (filename, None, backend, output_format)
+    else:
+        args = (filename, backend, output_format)
+
+    job_id = uuid.uuid4().hex
+    JOBS[job_id] = {
+        'id': job_id,
+        'kind': kind,
+        'filename': filename,
+        'status': 'queued',
+        'stage': 'queued',
+        'progress': 0,
+        'timings': {},
+        'created': time.time(),
+        'updated': time.time(),
+    }
+    task = asyncio.create_task(run_job(job_id, converter.JOB_CONVERTERS[kind], temp_pdf_path, *args))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+
+    return {
+        'job_id': job_id,
+        'status_url': f"/jobs/{job_id}",
+        'events_url': f"/jobs/{job_id}/events",
+        'download_url': f"/jobs/{job_id}/download",
+    }
+
+def get_job(job_id):
+    job = JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def read_job(job_id: str):
+    return job_status(get_job(job_id))
+
+@app.get("/jobs/{job_id}/events")
+async def read_job_events(job_id: str):
+    get_job(job_id)
+    return StreamingResponse(
+        job_events(job_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+@app.get("/jobs/{job_id}/download")
+async def download_job(job_id: str):
+    job = get_job(job_id)
+    if job['status'] == 'error':
+        raise HTTPException(status_code=job['error_status'], detail=job['error'])
+    if job['status'] != 'done':
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}")
+    return output_response(job['result'])
+
+@app.post("/api/parse", openapi_extra=uploads.openapi_upload())
+async def api_parse(request: Request, kind: str = 'claims', backend: Optional[str] = None,
+                    output_format: str = Query('json', alias='format')):
+    """Parse a PDF and return its records as JSON, or as NDJSON (format=ndjson) for big documents.
+    No workbook is built."""
+    if kind not in converter.JOB_CONVERTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown kind '{kind}'. Available: {', '.join(sorted(converter.JOB_CONVERTERS))}"
+        )
+    if output_format not in ('json', 'ndjson'):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{output_format}'. Available: json, ndjson")
+    validate_backend(backend)
 
-    temp_pdf_path = None
-    temp_xlsx_path = None
+    filename, temp_pdf_path = await uploads.receive_pdf(request)
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
-            content = await file.read()
-            temp_pdf.write(content)
-            temp_pdf_path = temp_pdf.name
+        parsed = await run_conversion(converter.parse_pdf_records, temp_pdf_path, kind, None, backend,
+                                      input_name=filename)
 
-        text_content = unpaid_charges_parse.extract_text_from_pdf(temp_pdf_path)
-        if not text_content.strip():
-            raise HTTPException(status_code=400, detail="No text extracted from PDF")
+    except ConversionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        charges_data = unpaid_charges_parse.parse_unpaid_charges(text_content)
-        
-        if not charges_data:
-            raise HTTPException(status_code=400, detail="No unpaid charges data found in PDF")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        base_name = file.filename.rsplit('.', 1)[0]
-        output_filename = f"{base_name}_unpaid_charges.xlsx"
+    finally:
+        if os.path.exists(temp_pdf_path):
+            os.unlink(temp_pdf_path)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_xlsx:
-            temp_xlsx_path = temp_xlsx.name
+    parsed['filename'] = filename
+    if output_format == 'ndjson':
+        return StreamingResponse(
+            output_formats.iter_ndjson(converter.iter_typed_records(parsed)),
+            media_type=output_formats.NDJSON_MEDIA_TYPE
+        )
+    return parsed
+
+def unique_name(name, used):
+    """name, or 'name (2).ext', 'name (3).ext'... if it is already in used; adds it to used"""
+    base_name, dot, extension = name.rpartition('.')
+    if not dot:
+        base_name, extension = name, ''
+    candidate, number = name, 1
+    while candidate in used:
+        number += 1
+        candidate = f"{base_name} ({number}){dot}{extension}"
+    used.add(candidate)
+    return candidate
+
+@app.post("/batch/", openapi_extra=uploads.openapi_upload('files', many=True))
+async def convert_batch(request: Request, backend: Optional[str] = None,
+                        output_format: str = Query(output_formats.DEFAULT_FORMAT, alias='format'),
+                        combine: bool = False):
+    """Convert several PDFs, uploaded one by one or in zip archives, in parallel in the worker pool.
+    Each file goes to the parser for its report (Biloxi, Paul or unpaid charges).
+
+    Returns a zip with each file's output and summary.json, or with combine=true a single output
+    whose sheets hold the rows of every file plus a 'Batch Summary' sheet. The summary lists, per
+    file, the status, row counts and seconds spent.
+    """
+    validate_backend(backend)
+    validate_format(output_format)
 
-        unpaid_charges_parse.create_xlsx_file(charges_data, temp_xlsx_path)
+    uploaded = await uploads.receive_uploads(request, 'files', ('.pdf', '.zip'), max_files=uploads.MAX_BATCH_FILES)
+    inputs = []
+    try:
+        for filename, upload_path in uploaded:
+            if upload_path.endswith('.zip'):
+                try:
+                    inputs.extend(await run_in_threadpool(uploads.extract_zip_pdfs, upload_path))
+                finally:
+                    os.unlink(upload_path)
+            else:
+                inputs.append((filename, upload_path))
+            if len(inputs) > uploads.MAX_BATCH_FILES:
+                raise HTTPException(status_code=400, detail=f"More than {uploads.MAX_BATCH_FILES} files in one batch")
+
+        # One conversion per file; the worker pool runs as many at once as it has workers
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_conversion(converter.convert_batch_file, pdf_path, name, backend, output_format, combine)
+            for name, pdf_path in inputs
+        ))
+        summaries = [result['summary'] for result in results]
+        converted = sum(1 for summary in summaries if summary['status'] == 'ok')
+        print(f"Batch of {len(inputs)} files converted in {time.perf_counter() - started:.2f}s ({converted} ok)")
+        if not converted:
+            raise HTTPException(status_code=400, detail={'message': "No file in the batch could be converted",
+                                                         'files': summaries})
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if combine:
+            sheets = converter.combine_batch_sheets(results)
+            output = await run_in_threadpool(converter.build_output, sheets, output_format)
+            output_filename = f"batch_{stamp}.{output_formats.output_extension(output_format, sheets)}"
+            response = StreamingResponse(converter.iter_output_chunks(output), media_type=output['media_type'])
+        else:
+            used_names = set()
+            members = [(unique_name(result['conversion']['output_filename'], used_names),
+                        converter.iter_output_chunks(result['conversion']))
+                       for result in results if result['conversion']]
+            members.append(('summary.json', [json.dumps(summaries, indent=2).encode('utf-8')]))
+            output_filename = f"batch_{stamp}.zip"
+            response = StreamingResponse(output_formats.iter_zip(members), media_type=output_formats.ZIP_MEDIA_TYPE)
 
-        response = FileResponse(
-            temp_xlsx_path,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            filename=output_filename
-        )
         response.headers["Content-Disposition"] = f'attachment; filename="{output_filename}"'
+        response.headers["X-Batch-Files"] = f"ok={converted},error={len(summaries) - converted}"
         return response
-    
-    except Exception as e:
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.unlink(temp_pdf_path)
-        if temp_xlsx_path and os.path.exists(temp_xlsx_path):
-            os.unlink(temp_xlsx_path)
-        raise HTTPException(status_code=500, detail=str(e))
-    
+
     finally:
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.unlink(temp_pdf_path)
+        for name, pdf_path in uploaded + inputs:
+            if os.path.exists(pdf_path):
+                os.unlink(pdf_path)
+
+def _remove_upload(pdf_path, record_queue):
+    """Done callback of a streaming parse: drop the uploaded PDF, and end the stream
+    if the worker itself died before it could"""
+    def done(task):
+        if os.path.exists(pdf_path):
+            os.unlink(pdf_path)
+        if task.cancelled() or task.exception() is not None:
+            error = task.exception() if not task.cancelled() else None
+            record_queue.put(ConversionError(500, str(error) if error else "Parse was cancelled"))
+            record_queue.put(None)
+    return done
+
+@app.post("/api/parse/stream", openapi_extra=uploads.openapi_upload())
+async def api_parse_stream(request: Request, kind: str = 'claims', backend: Optional[str] = None):
+    """Parse a PDF and stream its records as NDJSON while the rest of the PDF is still being read:
+    claims page by page, charges in batches. The last line is the summary; a failure after the
+    first records is reported as a 'record_type': 'error' line."""
+    if kind not in converter.JOB_CONVERTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown kind '{kind}'. Available: {', '.join(sorted(converter.JOB_CONVERTERS))}"
+        )
+    validate_backend(backend)
+
+    filename, temp_pdf_path = await uploads.receive_pdf(request)
+
+    # Batches come back from the worker process through a Manager queue
+    manager = getattr(app.state, 'manager', None)
+    record_queue = manager.Queue() if manager else queue.Queue()
+    task = asyncio.ensure_future(run_conversion(
+        converter.stream_pdf_records, temp_pdf_path, kind, record_queue, None, backend, input_name=filename
+    ))
+    task.add_done_callback(_remove_upload(temp_pdf_path, record_queue))
+
+    # Errors before the first record (not a PDF we can read, no text) are still plain HTTP errors
+    batch = await run_in_threadpool(record_queue.get)
+    if isinstance(batch, ConversionError):
+        raise HTTPException(status_code=batch.status_code, detail=batch.detail)
+
+    async def ndjson_lines(batch):
+        while batch is not None:
+            if isinstance(batch, ConversionError):
+                batch = [('error', {'status_code': batch.status_code, 'detail': batch.detail})]
+            for record_type, record in batch:
+                if record_type == 'summary':
+                    record['filename'] = filename
+            yield b''.join(output_formats.iter_ndjson(batch))
+            batch = await run_in_threadpool(record_queue.get)
+
+    return StreamingResponse(ndjson_lines(batch), media_type=output_formats.NDJSON_MEDIA_TYPE)
 
 if __name__ == "__main__":
+    import sys
+    # python main.py [web] starts the server, python main.py watch DIR... the watch-folder
+    # daemon; anything else is the command line converter
+    if len(sys.argv) > 1 and sys.argv[1] == 'watch':
+        import watcher
+        sys.exit(watcher.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] != 'web':
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,184 @@
+import csv
+import io
+import json
+import zipfile
+
+import xlsx_writer
+
+# Parquet output is optional; it needs pyarrow
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Media type of each output format
+OUTPUT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+DEFAULT_FORMAT = 'xlsx'
+ZIP_MEDIA_TYPE = 'application/zip'
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+# Formats written row by row while they are being sent; xlsx and parquet are built in one go
+STREAMED_FORMATS = ('csv', 'jsonl')
+# Single-table formats put each sheet in its own file inside a zip when there are several sheets
+ZIPPED_FORMATS = ('csv', 'parquet')
+
+# Rows serialised per yielded chunk
+CHUNK_ROWS = 500
+
+
+def validate_format(output_format):
+    """Raise ValueError for an unknown output format"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Available: {', '.join(sorted(OUTPUT_FORMATS))}")
+    if output_format == 'parquet' and pyarrow is None:
+        raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+
+
+def is_zipped(output_format, sheets):
+    return output_format in ZIPPED_FORMATS and len(sheets) > 1
+
+
+def output_extension(output_format, sheets):
+    """File extension of the output: the format's own, or 'zip' for several csv/parquet sheets"""
+    return 'zip' if is_zipped(output_format, sheets) else output_format
+
+
+def media_type(output_format, sheets):
+    return ZIP_MEDIA_TYPE if is_zipped(output_format, sheets) else OUTPUT_FORMATS[output_format]
+
+
+def sheet_filename(title, extension):
+    """Name of a sheet's file inside a zip, e.g. 'Pattern Missed Data' -> 'pattern_missed_data.csv'"""
+    return f"{title.lower().replace(' ', '_')}.{extension}"
+
+
+class _ChunkBuffer:
+    """Write-only, unseekable file object that collects bytes until they are taken.
+    zipfile writes streaming archives (with data descriptors) to objects like this."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_csv(columns, rows):
+    """CSV with a header row, yielded CHUNK_ROWS rows at a time; empty cells are written as ''"""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for row_count, row in enumerate(rows, 1):
+        writer.writerow(['' if value is None else value for value in row])
+        if row_count % CHUNK_ROWS == 0:
+            yield text.getvalue().encode('utf-8')
+            text.seek(0)
+            text.truncate()
+    yield text.getvalue().encode('utf-8')
+
+
+def iter_jsonl(sheets):
+    """One JSON object per row; the 'sheet' field names the sheet the row belongs to"""
+    lines = []
+    for title, columns, rows in sheets:
+        for row in rows:
+            record = {'sheet': title}
+            record.update(zip(columns, row))
+            lines.append(json.dumps(record))
+            if len(lines) >= CHUNK_ROWS:
+                yield ('\n'.join(lines) + '\n').encode('utf-8')
+                lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def iter_ndjson(typed_records):
+    """NDJSON lines for (record_type, record) pairs, e.g. ('claim', {...}), with the type
+    in a 'record_type' field. Each line is yielded as soon as its record arrives."""
+    for record_type, record in typed_records:
+        line = {'record_type': record_type}
+        line.update(record)
+        yield (json.dumps(line) + '\n').encode('utf-8')
+
+
+def _parquet_column(values):
+    """Numeric columns stay numeric; anything else becomes strings, with None kept as null"""
+    present = [value for value in values if value is not None and value != '']
+    if present and all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return [None if value == '' else value for value in values]
+    return [None if value is None else str(value) for value in values]
+
+
+def parquet_bytes(columns, rows):
+    rows = list(rows)
+    table = pyarrow.table({
+        column: _parquet_column([row[index] for row in rows]) for index, column in enumerate(columns)
+    })
+    buffer = pyarrow.BufferOutputStream()
+    pyarrow.parquet.write_table(table, buffer)
+    return buffer.getvalue().to_pybytes()
+
+
+def iter_zip(members):
+    """Stream a zip archive of (name, chunk iterator) members without seeking"""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in members:
+            with archive.open(name, 'w') as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    yield buffer.take()
+    yield buffer.take()
+
+
+def iter_output(output_format, sheets):
+    """Serialise sheets, a list of (title, columns, rows), in output_format as a sequence of
+    bytes chunks. csv and jsonl are produced row by row; rows are consumed once."""
+    validate_format(output_format)
+    if output_format == 'xlsx':
+        buffer = io.BytesIO()
+        xlsx_writer.write_xlsx(buffer, sheets)
+        yield buffer.getvalue()
+    elif output_format == 'jsonl':
+        yield from iter_jsonl(sheets)
+    elif is_zipped(output_format, sheets):
+        if output_format == 'csv':
+            members = ((sheet_filename(title, 'csv'), iter_csv(columns, rows)) for title, columns, rows in sheets)
+        else:
+            members = ((sheet_filename(title, 'parquet'), iter([parquet_bytes(columns, rows)]))
+                       for title, columns, rows in sheets)
+        yield from iter_zip(members)
+    elif output_format == 'csv':
+        title, columns, rows = sheets[0]
+        yield from iter_csv(columns, rows)
+    else:
+        title, columns, rows = sheets[0]
+        yield parquet_bytes(columns, rows)
+
+
+def write_output(output_path, output_format, sheets):
+    """Write sheets in output_format to a path or binary file object"""
+    if output_format == 'xlsx':
+        xlsx_writer.write_xlsx(output_path, sheets)
+        return
+    if isinstance(output_path, str):
+        with open(output_path, 'wb') as file:
+            write_output(file, output_format, sheets)
+        return
+    for chunk in iter_output(output_format, sheets):
+        output_path.write(chunk)
@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+# Parsed results are stored under CACHE_DIR as gzipped JSON, one file per key.
+# The least recently used entries are evicted once the directory exceeds CACHE_MAX_BYTES
+# (0 disables the cache).
+CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bilxy_parse_cache'))
+CACHE_MAX_BYTES = int(os.environ.get('PARSE_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(pdf_sha256, parser_module, parser_version, backend=''):
+    """Key for a parsed PDF: content hash plus everything that changes the parser output"""
+    key_source = f"{pdf_sha256}|{parser_module}|{parser_version}|{backend}"
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+
+def key_for_pdf(pdf_path, parser, backend=None):
+    """Cache key for parsing pdf_path with a parser module (biloxy_parse, paul_parse, ...)"""
+    return cache_key(file_sha256(pdf_path), parser.__name__, parser.PARSER_VERSION,
+                     backend or parser.EXTRACTION_BACKEND)
+
+
+def _entry_path(key):
+    return os.path.join(CACHE_DIR, f"{key}.json.gz")
+
+
+def get(key):
+    """Return the cached value for key, or None. A hit marks the entry as recently used."""
+    if CACHE_MAX_BYTES <= 0:
+        return None
+    path = _entry_path(key)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            value = json.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Parse cache read error ({key}): {e}")
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return None
+
+    try:
+        # The modification time doubles as the last-used time for LRU eviction
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+
+def put(key, value):
+    """Store a JSON-serialisable value under key and evict old entries if over budget"""
+    if CACHE_MAX_BYTES <= 0:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as compressed, \
+                    io.TextIOWrapper(compressed, encoding='utf-8') as file:
+                json.dump(value, file)
+            os.replace(temp_path, _entry_path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        evict()
+    except Exception as e:
+        print(f"Parse cache write error ({key}): {e}")
+
+
+def evict(max_bytes=None):
+    """Delete least recently used entries until the cache fits in max_bytes"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total_size = 0
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if not name.endswith('.json.gz'):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total_size += stat.st_size
+
+    for mtime, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def clear():
+    evict(max_bytes=0)
@@ -0,0 +1,463 @@
+import contextlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import PyPDF2
+import pdfplumber
+
+try:
+    import pymupdf
+except ImportError:
+    # Older PyMuPDF releases only provide the fitz module name
+    import fitz as pymupdf
+
+
+class ExtractionBackend:
+    """Base class for a PDF text extraction engine"""
+    name = None
+
+    def open(self, pdf_path):
+        """Open the PDF and return a handle with page_count, page_text(page_num) and close()"""
+        raise NotImplementedError
+
+    def page_count(self, pdf_path):
+        handle = self.open(pdf_path)
+        try:
+            return handle.page_count
+        finally:
+            handle.close()
+
+    def iter_pages(self, pdf_path, page_numbers=None):
+        """Yield the text of each requested page in order (all pages if page_numbers is None)"""
+        handle = self.open(pdf_path)
+        try:
+            if page_numbers is None:
+                page_numbers = range(handle.page_count)
+            for page_num in page_numbers:
+                yield handle.page_text(page_num)
+        finally:
+            handle.close()
+
+    def extract_pages(self, pdf_path, page_numbers=None):
+        """Return the text of each requested page (all pages if page_numbers is None)"""
+        return list(self.iter_pages(pdf_path, page_numbers))
+
+
+EXTRACTION_BACKENDS = {}
+
+# PyMuPDF is several times faster, but splits rows drawn as one text object per cell into one line
+# per cell, which the pattern parsers cannot read. Check a corpus with benchmark_backends() first
+DEFAULT_BACKEND = 'pypdf2'
+FALLBACK_BACKEND = 'pdfplumber'
+
+# Pages where more than this share of characters is unreadable are re-extracted
+SUSPICIOUS_CHARACTER_RATIO = 0.3
+
+# Parallel extraction: worker processes (1 = sequential) and the smallest document worth splitting
+EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', '1'))
+PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', '50'))
+
+
+def register_backend(backend_class):
+    """Class decorator that adds a backend to EXTRACTION_BACKENDS under its name"""
+    EXTRACTION_BACKENDS[backend_class.name] = backend_class()
+    return backend_class
+
+
+def get_backend(name=None):
+    name = name or DEFAULT_BACKEND
+    if name not in EXTRACTION_BACKENDS:
+        raise ValueError(f"Unknown extraction backend '{name}'. Available: {', '.join(sorted(EXTRACTION_BACKENDS))}")
+    return EXTRACTION_BACKENDS[name]
+
+
+class _PyMuPDFHandle:
+    def __init__(self, pdf_path):
+        self.doc = pymupdf.open(pdf_path)
+        self.page_count = self.doc.page_count
+
+    def page_text(self, page_num):
+        return self.doc[page_num].get_text() or ""
+
+    def close(self):
+        self.doc.close()
+
+
+@register_backend
+class PyMuPDFBackend(ExtractionBackend):
+    name = 'pymupdf'
+
+    def open(self, pdf_path):
+        return _PyMuPDFHandle(pdf_path)
+
+
+class _PyPDF2Handle:
+    def __init__(self, pdf_path):
+        self.file = open(pdf_path, 'rb')
+        try:
+            self.pdf_reader = PyPDF2.PdfReader(self.file)
+            self.page_count = len(self.pdf_reader.pages)
+        except Exception:
+            self.file.close()
+            raise
+
+    def page_text(self, page_num):
+        return self.pdf_reader.pages[page_num].extract_text() or ""
+
+    def close(self):
+        self.file.close()
+
+
+@register_backend
+class PyPDF2Backend(ExtractionBackend):
+    name = 'pypdf2'
+
+    def open(self, pdf_path):
+        return _PyPDF2Handle(pdf_path)
+
+
+class _PdfplumberHandle:
+    def __init__(self, pdf_path):
+        self.pdf = pdfplumber.open(pdf_path)
+        self.page_count = len(self.pdf.pages)
+
+    def page_text(self, page_num):
+        page = self.pdf.pages[page_num]
+        text = page.extract_text() or ""
+        # Release the parsed page objects so long documents don't accumulate them
+        page.close()
+        return text
+
+    def page_words(self, page_num, **kwargs):
+        page = self.pdf.pages[page_num]
+        words = page.extract_words(**kwargs)
+        page.close()
+        return words
+
+    def close(self):
+        self.pdf.close()
+
+
+@register_backend
+class PdfplumberBackend(ExtractionBackend):
+    name = 'pdfplumber'
+
+    def open(self, pdf_path):
+        return _PdfplumberHandle(pdf_path)
+
+
+def join_pages(page_texts):
+    """Join page texts the same way the parsers always have: one newline after every page"""
+    return "".join(page_text + "\n" for page_text in page_texts)
+
+
+def iter_lines(page_texts, progress=None):
+    """Yield the stripped, non-empty lines of each page in order.
+
+    page_texts may also be a single string holding the whole document.
+    Only one page is split into lines at a time. progress(pages_done, lines_done)
+    is called once each page has been consumed.
+    """
+    if isinstance(page_texts, str):
+        page_texts = [page_texts]
+    lines_done = 0
+    for page_num, page_text in enumerate(page_texts):
+        for line in page_text.split('\n'):
+            line = line.strip()
+            if line:
+                lines_done += 1
+                yield line
+        if progress:
+            progress(page_num + 1, lines_done)
+
+
+def is_suspicious_page(page_text):
+    """True when a page came back empty or mostly as unreadable characters (e.g. image-like pages)"""
+    characters = [ch for ch in page_text if not ch.isspace()]
+    if not characters:
+        return True
+    unreadable = sum(1 for ch in characters if ch == '\ufffd' or not ch.isprintable())
+    return unreadable / len(characters) > SUSPICIOUS_CHARACTER_RATIO
+
+
+def split_page_ranges(page_count, chunk_count):
+    """Split pages 0..page_count-1 into at most chunk_count contiguous (start, stop) ranges"""
+    chunk_count = max(1, min(chunk_count, page_count))
+    chunk_size, remainder = divmod(page_count, chunk_count)
+    ranges = []
+    start = 0
+    for chunk_num in range(chunk_count):
+        stop = start + chunk_size + (1 if chunk_num < remainder else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def _extract_page_range(backend_name, pdf_path, start, stop):
+    # Runs in a worker process, so the backend is looked up by name
+    return get_backend(backend_name).extract_pages(pdf_path, range(start, stop))
+
+
+def iter_pages_parallel(pdf_path, backend=None, workers=None):
+    """Stream the text of every page with one backend, extracted across a process pool.
+
+    The document is split into contiguous page ranges whose results are yielded in page
+    order as each range comes back, so the output is identical to backend.iter_pages().
+    Small documents, or workers <= 1, are extracted sequentially.
+    """
+    extractor = get_backend(backend)
+    workers = workers or EXTRACTION_WORKERS
+    if workers <= 1:
+        yield from extractor.iter_pages(pdf_path)
+        return
+
+    page_count = extractor.page_count(pdf_path)
+    if page_count < PARALLEL_MIN_PAGES:
+        yield from extractor.iter_pages(pdf_path)
+        return
+
+    # A few ranges per worker keeps the pool busy when some pages are slower than others
+    page_ranges = split_page_ranges(page_count, workers * 4)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_extract_page_range,
+                              [extractor.name] * len(page_ranges),
+                              [pdf_path] * len(page_ranges),
+                              [start for start, stop in page_ranges],
+                              [stop for start, stop in page_ranges])
+        for chunk in chunks:
+            yield from chunk
+
+
+def extract_pages_parallel(pdf_path, backend=None, workers=None):
+    """Extract all pages with one backend across a process pool (see iter_pages_parallel)"""
+    return list(iter_pages_parallel(pdf_path, backend, workers))
+
+
+class PDFDocument:
+    """A PDF opened once per request and shared by the pattern and layout parsers.
+
+    Page text (primary backend, with per-page fallback for empty or suspicious
+    pages) and pdfplumber's positioned words are extracted lazily and cached.
+    Each engine opens the file at most once.
+    """
+
+    # pdfplumber settings used by the layout parsers
+    WORD_SETTINGS = {'use_text_flow': True, 'keep_blank_chars': False}
+
+    def __init__(self, pdf_path, backend=None, fallback=FALLBACK_BACKEND, workers=None):
+        self.pdf_path = pdf_path
+        self.primary = get_backend(backend)
+        self.secondary = get_backend(fallback) if fallback and fallback != self.primary.name else None
+        self.workers = workers
+        self._handles = {}
+        self._failed_backends = set()
+        self._texts = {}
+        self._engines = {}
+        self._words = {}
+        self._page_count = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for handle in self._handles.values():
+            try:
+                handle.close()
+            except Exception:
+                pass
+        self._handles = {}
+
+    def _handle(self, backend):
+        """Open handle for a backend, or None if that backend cannot read the file"""
+        if backend.name in self._failed_backends:
+            return None
+        if backend.name not in self._handles:
+            try:
+                self._handles[backend.name] = backend.open(self.pdf_path)
+            except Exception as e:
+                print(f"Text extraction error ({backend.name}): {e}")
+                self._failed_backends.add(backend.name)
+                return None
+        return self._handles[backend.name]
+
+    @property
+    def page_count(self):
+        if self._page_count is None:
+            self._page_count = 0
+            for backend in (self.primary, self.secondary, get_backend('pdfplumber')):
+                handle = self._handle(backend) if backend else None
+                if handle:
+                    self._page_count = handle.page_count
+                    break
+        return self._page_count
+
+    def _backend_page_text(self, backend, page_num):
+        handle = self._handle(backend)
+        if not handle:
+            return None
+        try:
+            return handle.page_text(page_num)
+        except Exception as e:
+            print(f"Text extraction error ({backend.name}, page {page_num + 1}): {e}")
+            return None
+
+    def _with_fallback(self, page_num, page_text):
+        """Retry an empty, suspicious or failed page with the fallback backend"""
+        engine = self.primary.name
+        if self.secondary and (page_text is None or is_suspicious_page(page_text)):
+            retried_text = self._backend_page_text(self.secondary, page_num)
+            if retried_text is not None and (retried_text.strip() or page_text is None):
+                return retried_text, self.secondary.name
+        return page_text or "", engine
+
+    def read_page(self, page_num):
+        """Extract (page_text, engine) for one page without adding it to the cache"""
+        if page_num in self._texts:
+            return self._texts[page_num], self._engines[page_num]
+        return self._with_fallback(page_num, self._backend_page_text(self.primary, page_num))
+
+    def page_text(self, page_num):
+        if page_num not in self._texts:
+            self._texts[page_num], self._engines[page_num] = self.read_page(page_num)
+        return self._texts[page_num]
+
+    def page_engine(self, page_num):
+        if page_num not in self._engines:
+            self.page_text(page_num)
+        return self._engines[page_num]
+
+    def _parallel_texts(self):
+        """Primary backend text of every page (None where it failed), extracted across a process
+        pool; None when the document is not extracted that way"""
+        workers = self.workers or EXTRACTION_WORKERS
+        if (self._texts or workers <= 1 or self.page_count < PARALLEL_MIN_PAGES
+                or self.primary.name in self._failed_backends):
+            return None
+
+        def primary_texts():
+            pages_done = 0
+            try:
+                for page_text in iter_pages_parallel(self.pdf_path, self.primary.name, workers):
+                    pages_done += 1
+                    yield page_text
+            except Exception as e:
+                print(f"Text extraction error ({self.primary.name}): {e}")
+            for page_num in range(pages_done, self.page_count):
+                yield None
+        return primary_texts()
+
+    def iter_pages(self, progress=None):
+        """Stream (page_text, engine) pairs in page order. Only the engines are kept: pages that are
+        not cached already are not held in memory. Large documents are extracted across a process
+        pool when workers > 1. progress(pages_done, page_count) is called as pages are consumed."""
+        primary_texts = self._parallel_texts()
+        for page_num in range(self.page_count):
+            if primary_texts is None:
+                page_text, engine = self.read_page(page_num)
+            else:
+                page_text, engine = self._with_fallback(page_num, next(primary_texts))
+            self._engines[page_num] = engine
+            yield page_text, engine
+            if progress:
+                progress(page_num + 1, self.page_count)
+
+    def page_texts(self, progress=None):
+        """Text of every page, cached (see iter_pages).
+        progress(pages_done, page_count) is called as pages become available."""
+        page_texts = []
+        for page_num, (page_text, engine) in enumerate(self.iter_pages(progress)):
+            self._texts[page_num] = page_text
+            page_texts.append(page_text)
+        return page_texts
+
+    def page_engines(self):
+        """Engine of every page; pages not read yet are extracted for it"""
+        for page_num in range(self.page_count):
+            self.page_engine(page_num)
+        return [self._engines[page_num] for page_num in range(self.page_count)]
+
+    def page_words(self, page_num):
+        """pdfplumber words with positions for one page, cached"""
+        if page_num not in self._words:
+            handle = self._handle(get_backend('pdfplumber'))
+            self._words[page_num] = handle.page_words(page_num, **self.WORD_SETTINGS) if handle else []
+        return self._words[page_num]
+
+
+def open_document(source, **kwargs):
+    """Context manager for a PDFDocument. An already open document is passed
+    through and left open for its owner; a path is opened and closed on exit."""
+    if isinstance(source, PDFDocument):
+        return contextlib.nullcontext(source)
+    return PDFDocument(source, **kwargs)
+
+
+def extract_pages(pdf_path, backend=None, fallback=FALLBACK_BACKEND, workers=None):
+    """Extract every page with the chosen backend and re-extract only the empty or
+    suspicious pages with the fallback backend.
+
+    Returns (page_texts, page_engines) where page_engines names the backend that
+    produced each page. With workers > 1, large documents are extracted across a
+    process pool (see extract_pages_parallel).
+    """
+    with PDFDocument(pdf_path, backend, fallback, workers) as document:
+        return document.page_texts(), document.page_engines()
+
+
+def iter_pages(pdf_path, backend=None, fallback=FALLBACK_BACKEND):
+    """Stream (page_text, engine) pairs one page at a time.
+
+    This is the streaming counterpart of extract_pages(): suspicious pages are
+    retried with the fallback backend as they are reached, and only the current
+    page is held in memory.
+    """
+    with PDFDocument(pdf_path, backend, fallback) as document:
+        yield from document.iter_pages()
+
+
+def summarize_engines(page_engines):
+    """Compact per-engine page counts, e.g. 'pypdf2=298,pdfplumber=2'"""
+    counts = {}
+    for engine in page_engines:
+        counts[engine] = counts.get(engine, 0) + 1
+    return ','.join(f"{engine}={count}" for engine, count in counts.items())
+
+
+def extract_text(pdf_path, backend=None, fallback=FALLBACK_BACKEND, workers=None):
+    """Extract the whole document as one string, with per-page fallback for empty pages"""
+    page_texts, page_engines = extract_pages(pdf_path, backend, fallback, workers)
+    return join_pages(page_texts)
+
+
+def benchmark_backends(pdf_paths, parse_function, backends=None, reference=None):
+    """Time every backend over a corpus and check the parser output against a reference backend.
+
+    parse_function receives the extracted text and returns the parser output to compare,
+    e.g. biloxy_parse.parse_insurance_claims. Returns one result dict per backend, fastest first.
+    """
+    backends = backends or sorted(EXTRACTION_BACKENDS)
+    reference = reference or 'pypdf2'
+    reference_outputs = {pdf_path: parse_function(extract_text(pdf_path, reference, fallback=None))
+                         for pdf_path in pdf_paths}
+
+    results = []
+    for backend in backends:
+        elapsed = 0.0
+        mismatched_files = []
+        for pdf_path in pdf_paths:
+            start = time.perf_counter()
+            text_content = extract_text(pdf_path, backend, fallback=None)
+            elapsed += time.perf_counter() - start
+            if parse_function(text_content) != reference_outputs[pdf_path]:
+                mismatched_files.append(pdf_path)
+        results.append({
+            'backend': backend,
+            'seconds': round(elapsed, 3),
+            'same_output': not mismatched_files,
+            'mismatched_files': mismatched_files
+        })
+
+    return sorted(results, key=lambda result: result['seconds'])
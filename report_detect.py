@@ -0,0 +1,93 @@
+import re
+import time
+
+import pdf_extract
+
+# Report types and the (kind, file_type) each one is converted as
+REPORT_TYPES = {
+    'biloxi': ('claims', 'biloxi'),
+    'paul': ('claims', 'paul'),
+    'unpaid': ('unpaid', None),
+}
+
+# Detections below this confidence are not trusted; callers fall back to the file name
+MIN_CONFIDENCE = 0.6
+# Number of matching lines after which the evidence on a page counts in full
+FULL_EVIDENCE_LINES = 5
+
+# Header and footer text of each report kind, matched on the upper-cased page; the claims
+# markers are the header words the claims parsers skip
+HEADER_MARKERS = {
+    'unpaid': ('UNPAID CHARGES', 'PRINTED ON:', 'PAGE #:', 'FILTER:'),
+    'claims': ('OVERDUE', 'REPORT DATE', 'SYSTEM:', 'RUN:'),
+}
+# Data lines: claims start with the account (letters for Biloxi, digits for Paul, as in the
+# parsers' account patterns), unpaid charges with a four-digit-year date and a 5-digit code.
+# A Paul patient name may start with digits or be glued to the account ('1029 458Jose Vasquez')
+BILOXI_ACCOUNT_LINE = re.compile(r'^[A-Z]{3,}\d*X?\s+[A-Z]')
+PAUL_ACCOUNT_LINE = re.compile(r'^\d{3,}\s*\S*[A-Za-z]')
+CHARGE_LINE = re.compile(r'^\d{2}/\d{2}/\d{4}\s+\S+\s+\d{5}\b')
+PAYOR_LINE = re.compile(r'^Payor:')
+
+
+def fingerprint(page_text):
+    """Report type of a page from its header markers and the shape of its data lines.
+
+    Returns {'report_type': 'biloxi', 'paul', 'unpaid' or None, 'confidence': 0..1, 'scores': {...}}.
+    The confidence is the winner's share of the evidence, lowered when there is little of it.
+    A tie (including a claims page without account lines) is None: the page does not say.
+    """
+    upper_text = page_text.upper()
+    scores = {'biloxi': 0, 'paul': 0, 'unpaid': 0}
+    header_scores = {kind: sum(2 for marker in markers if marker in upper_text)
+                     for kind, markers in HEADER_MARKERS.items()}
+    evidence_lines = 0
+    for line in pdf_extract.iter_lines(page_text):
+        if BILOXI_ACCOUNT_LINE.match(line):
+            scores['biloxi'] += 1
+        elif PAUL_ACCOUNT_LINE.match(line):
+            scores['paul'] += 1
+        elif CHARGE_LINE.match(line) or PAYOR_LINE.match(line):
+            scores['unpaid'] += 1
+        else:
+            continue
+        evidence_lines += 1
+
+    # First claims or unpaid charges, then Biloxi or Paul
+    claims_score = header_scores['claims'] + scores['biloxi'] + scores['paul']
+    unpaid_score = header_scores['unpaid'] + scores['unpaid']
+    scores['unpaid'] = unpaid_score
+    if claims_score == unpaid_score or (claims_score > unpaid_score and scores['biloxi'] == scores['paul']):
+        return {'report_type': None, 'confidence': 0.0, 'scores': scores}
+
+    if unpaid_score > claims_score:
+        report_type = 'unpaid'
+        confidence = unpaid_score / (unpaid_score + claims_score)
+    else:
+        report_type = 'paul' if scores['paul'] > scores['biloxi'] else 'biloxi'
+        confidence = claims_score / (unpaid_score + claims_score)
+        confidence *= max(scores['biloxi'], scores['paul']) / (scores['biloxi'] + scores['paul'])
+    confidence *= min(evidence_lines / FULL_EVIDENCE_LINES, 1.0) if evidence_lines else 0.5
+    return {'report_type': report_type, 'confidence': round(confidence, 2), 'scores': scores}
+
+
+def detect_report(pdf_path, backend=None):
+    """Fingerprint a PDF from its first page only. pdf_path may also be an open
+    pdf_extract.PDFDocument, e.g. the one the report is then parsed from; the page is read
+    without being kept in it.
+
+    Returns the fingerprint plus 'kind' and 'file_type' (see REPORT_TYPES) and 'seconds'.
+    A PDF that cannot be read has report_type None and confidence 0.
+    """
+    started = time.perf_counter()
+    page_text = ''
+    try:
+        with pdf_extract.open_document(pdf_path, backend=backend or pdf_extract.DEFAULT_BACKEND) as document:
+            if document.page_count:
+                page_text, engine = document.read_page(0)
+    except Exception as e:
+        print(f"Report detection error: {e}")
+    detection = fingerprint(page_text)
+    detection['kind'], detection['file_type'] = REPORT_TYPES.get(detection['report_type'], (None, None))
+    detection['seconds'] = round(time.perf_counter() - started, 4)
+    return detection
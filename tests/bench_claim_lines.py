@@ -0,0 +1,74 @@
+"""Per-line parse time of the claims parsers against the original ones in tests/legacy.
+
+    python tests/bench_claim_lines.py [rounds]
+
+Times parse_insurance_claims over the lines of generated reports (regular rows, headers and continuation
+lines), over the regular rows alone (account lines that read as a claim) and over mutations of the
+report lines that are not regular rows, and prints the best of the rounds in microseconds per line
+for each.
+"""
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(TESTS_DIR), TESTS_DIR]
+
+import biloxy_parse  # noqa: E402
+import paul_parse  # noqa: E402
+import report_fixtures  # noqa: E402
+from claim_line_cases import mutated_lines, report_lines  # noqa: E402
+from legacy import biloxy_parse as legacy_biloxy_parse  # noqa: E402
+from legacy import paul_parse as legacy_paul_parse  # noqa: E402
+
+MIN_LINES = 5000
+
+
+def best_times(parsers, text_content, rounds):
+    """Best time of each parser over the rounds; the parsers take turns, so a slow spell of the
+    machine does not fall on one of them only"""
+    best = [float('inf')] * len(parsers)
+    for _ in range(rounds):
+        for index, parse in enumerate(parsers):
+            # The parsers' progress prints are not part of the time
+            with contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                parse(text_content)
+                best[index] = min(best[index], time.perf_counter() - started)
+    return best
+
+
+def is_regular_row(parser, line):
+    with contextlib.redirect_stdout(io.StringIO()):
+        claims_data, pattern_missed_lines = parser.parse_insurance_claims(line)
+    return len(claims_data) == 1 and claims_data[0]['Account'] == line.split()[0]
+
+
+def main(rounds=9):
+    folder = tempfile.mkdtemp()
+    reports = {
+        'biloxi': (biloxy_parse, legacy_biloxy_parse, report_fixtures.claims_report(
+            os.path.join(folder, 'biloxi.pdf'), pages=20)),
+        'paul': (paul_parse, legacy_paul_parse, report_fixtures.claims_report(
+            os.path.join(folder, 'paul.pdf'), pages=20, numeric=True, digit_patients=True)),
+    }
+    for report_format, (parser, legacy_parser, pdf_path) in reports.items():
+        lines = report_lines([pdf_path])
+        row_lines = [line for line in lines if is_regular_row(legacy_parser, line)]
+        other_lines = [line for line in mutated_lines(lines, random.Random(21), MIN_LINES)
+                       if not is_regular_row(legacy_parser, line)]
+        for label, sample in (('report lines', lines), ('regular rows', row_lines), ('mutated lines', other_lines)):
+            sample = sample * (MIN_LINES // len(sample) + 1)
+            text_content = '\n'.join(sample)
+            old, new = (best / len(sample) * 1e6 for best in best_times(
+                [legacy_parser.parse_insurance_claims, parser.parse_insurance_claims], text_content, rounds))
+            print(f"{report_format} {label}: {len(sample)} lines, legacy {old:.1f} us/line, "
+                  f"current {new:.1f} us/line, {old / new:.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 9)
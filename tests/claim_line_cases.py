@@ -0,0 +1,85 @@
+"""Claim lines for the differential test and benchmark of claim_lines: the lines of the fixture
+reports, seeded mutations of them, and synthetic rows built from the tokens that steer the parsers"""
+import random
+
+import pdf_extract
+
+VOCABULARY = ['Pri', 'Sec', 'Oth', 'E', 'W', 'Hold', 'Replc', '$1,234.00', '12', '1234', '01/02/03',
+              '01/02/0304/05/06', 'BLUE', 'XBLUEX', 'ADMINISTRATIVMISSISSIPP', '\x1c', '\xa0', '$', '-_', '1e5',
+              'nan', 'inf', 'ALEXANDER', 'MAX', 'X', 'XAVIER', '1EG4TE5', 'ABC12X', 'ABCX', 'ABXC1', 'Insurance',
+              'Page:', 'Paid', 'Unpaid', 'PART', 'B', '$12', '1,2', '12.', '٣٤', 'ID9X', 'ABC1785X',
+              '1029', 'SMITH', 'JOHN', "O'BRIEN", 'Murphy', 'Report', 'Date', 'WAITING', 'X.', '-', 'HUMANA',
+              '458Jose', 'Vasquez', 'Run:', 'System:', 'Time:']
+# Account lines at the edges of the patient name rules, each followed by a continuation row that
+# shows which account and patient the parsers kept
+EDGE_LINES = ['ABC J', 'ABC JO', 'ABC J5', 'ABC J SMITH5', 'ABC X', 'ABC X.', 'ABCX Xavier 01/02/24', 'ABC .J',
+              'ABC1X SMITH', '1029 J', '1029 Pri', '1029 01/02/24', 'Report Dated', 'Report  Date', 'Report Date',
+              'ABC SMITH Run: 01/02/24 MEDICARE Pri 100 5 ID1', '01/02/24 100 MEDICARE 7 CAREX01/02/24',
+              'ABCXX SMITH 01/02/24 MEDICARE Pri 100 5 ID1', 'ABC1X XAVIER 01/02/24 MEDICARE Pri 100 5 ID1',
+              'ABC1X smith 01/02/24 MEDICARE Pri 100 5 ID1', 'ABC1X SMITH X 01/02/24 MEDICARE Pri 100 5 ID1',
+              'ABXCX SMITH 01/02/24 MEDICARE Pri 100 5 ID1', 'ABC1 smith 01/02/24 MEDICARE Pri 100 5 ID1']
+CONTINUATION_ROW = '01/02/24 MEDICARE Pri E 100.00 5 ID1'
+
+
+def report_lines(pdf_paths):
+    """The stripped lines of the reports, as the parsers read them"""
+    lines = []
+    for pdf_path in pdf_paths:
+        page_texts, page_engines = pdf_extract.extract_pages(pdf_path)
+        lines.extend(pdf_extract.iter_lines(page_texts))
+    return lines
+
+
+def mutated_lines(lines, rng, count):
+    """Lines with tokens dropped, inserted or glued on"""
+    vocabulary = sorted({token for line in lines for token in line.split()}) + VOCABULARY
+    cases = []
+    for _ in range(count):
+        tokens = rng.choice(lines).split()
+        for _ in range(rng.randint(0, 4)):
+            operation = rng.random()
+            if operation < 0.3 and tokens:
+                tokens.pop(rng.randrange(len(tokens)))
+            elif operation < 0.6:
+                tokens.insert(rng.randint(0, len(tokens)), rng.choice(vocabulary))
+            elif tokens:
+                index = rng.randrange(len(tokens))
+                tokens[index] += rng.choice(vocabulary)
+        cases.append(rng.choice([' ', '  ', '\t']).join(tokens))
+    return cases
+
+
+def synthetic_row(rng):
+    account = rng.choice(['ABC123', 'ABC12X', 'ABCX', 'ABXC1', 'ABC', 'XYZ9', '1029', '103', '12', 'ABC1785X'])
+    patient = ' '.join(rng.choice(['SMITH', 'JOHN', 'XAVIER', 'MAX', 'ALEX', 'DOE', "O'BRIEN", 'Jane', 'J', 'X.',
+                                   'A-B', '458Jose']) for _ in range(rng.randint(0, 3)))
+    dates = ' '.join(rng.choice(['01/02/24', '03/04/24', '1/02/24', '01/02/2403/04/24'])
+                     for _ in range(rng.randint(0, 4)))
+    insurance = ' '.join(rng.choice(['BLUE', 'CROSS', 'PART', 'B', 'MEDICARE', 'TEXAS', 'AXA', 'Insurance', 'WHITE',
+                                     'SCOTT', 'CARE', 'PLAN', 'E', 'Hold', 'B2B', 'X1', 'ADMINISTRATIVMISSISSIPP',
+                                     'ADMINISTRATIVE']) for _ in range(rng.randint(0, 4)))
+    indicator = rng.choice(['Pri', 'Sec', 'Oth', '', 'PRI'])
+    subtype = rng.choice(['E', 'W', '', 'H', 'Q'])
+    amount = rng.choice(['1885.85', '1,234.00', '$12.50', '12', 'abc', '1.', '.5', ''])
+    status = rng.choice(['', 'Hold', 'Replc', 'Paid', 'Hold Hold'])
+    overdue = rng.choice(['105', '12', '1234', '1,2', '$5', '', '7.5'])
+    insurance_id = rng.choice(['ID01785', '1EG4TE5MK72', 'Hold', 'ID9X', 'abc', 'ID-1_2', '', 'ID1 extra', 'X',
+                               'MCD999', 'A/B'])
+    rest = [dates, insurance, indicator, subtype, amount, status, overdue, insurance_id]
+    separator = rng.choice([' ', '   ', '\t', ''])
+    if not separator:
+        # Account glued to the patient name
+        return ' '.join(token for token in [account + patient] + rest if token)
+    return separator.join(token for token in [account, patient] + rest if token)
+
+
+def claim_line_cases(pdf_paths, seed=21, mutations=5000, synthetic=10000, random_lines=2000):
+    rng = random.Random(seed)
+    lines = report_lines(pdf_paths)
+    vocabulary = sorted({token for line in lines for token in line.split()}) + VOCABULARY
+    cases = list(lines)
+    cases += [line for edge_line in EDGE_LINES for line in (edge_line, CONTINUATION_ROW)]
+    cases += mutated_lines(lines, rng, mutations)
+    cases += [synthetic_row(rng) for _ in range(synthetic)]
+    cases += [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 14))) for _ in range(random_lines)]
+    return cases
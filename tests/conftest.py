@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+
+import artifacts  # noqa: E402
+import main  # noqa: E402
+import parse_cache  # noqa: E402
+import report_fixtures  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def report_pdfs(tmp_path_factory):
+    """The fixture corpus: PDF path by name"""
+    folder = tmp_path_factory.mktemp('reports')
+    return {
+        'biloxi': report_fixtures.claims_report(str(folder / 'Biloxi 08202025.pdf')),
+        'biloxi_blank_pages': report_fixtures.claims_report(str(folder / 'mixed Biloxi.pdf'), pages=5,
+                                                            blank_pages=(1, 3)),
+        'biloxi_missed': report_fixtures.claims_report(str(folder / 'weird Biloxi.pdf'), odd_lines_every=3),
+        'biloxi_cells': report_fixtures.claims_report(str(folder / 'cells Biloxi.pdf'), pages=2, per_cell=True),
+        'paul': report_fixtures.claims_report(str(folder / 'paul report.pdf'), numeric=True, digit_patients=True),
+        'paul_missed': report_fixtures.claims_report(str(folder / 'weird paul.pdf'), numeric=True,
+                                                     odd_lines_every=3),
+        'unpaid': report_fixtures.unpaid_report(str(folder / 'unpaid charges.pdf')),
+        'blank': report_fixtures.claims_report(str(folder / 'blank Biloxi.pdf'), pages=2, blank_pages=(0, 1)),
+    }
+
+
+@pytest.fixture(scope='module')
+def app_client(tmp_path_factory):
+    """A TestClient for main's app that runs its lifespan: conversions go through the worker pool and job
+    progress through the Manager queue. The parse cache and the job outputs are kept in a temporary
+    directory; the workers are started after the change, so they see it too."""
+    folder = tmp_path_factory.mktemp('app')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(parse_cache, 'CACHE_DIR', str(folder / 'parse_cache'))
+        patch.setattr(artifacts, 'ARTIFACT_DIR', str(folder / 'artifacts'))
+        with TestClient(main.app) as client:
+            yield client
+
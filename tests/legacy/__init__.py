@@ -0,0 +1,2 @@
+"""The parsers as they were before the extraction backends and the profile engine, kept unchanged
+as the reference for the old-vs-new output tests. Do not edit."""
@@ -0,0 +1,89 @@
+"""Synthetic report PDFs for the tests, laid out like the Murphy billing reports (Courier 7pt, one
+report row per text line unless per_cell is set)"""
+import pymupdf
+
+INSURANCES = ["BLUE CROSS BLUE SHIELD", "MEDICARE PART B", "AETNA HEALTH PLAN", "UNITED HEALTH CARE",
+              "HUMANA GOLD PLUS"]
+PATIENTS = ["SMITH JOHN", "DOE JANE", "O'BRIEN PAT", "LEE ANN", "GARCIA MARIA"]
+# Characters per column of a claims report row: Account, Patient Name, DOS, Insurance, Claim, Due, ID
+COLUMN_WIDTHS = [14, 29, 24, 41, 17, 15]
+CHAR_WIDTH = 4.2
+LINE_SPACING = 10
+
+
+def claim_cells(account, patient, dates, insurance, amount, status, overdue, insurance_id):
+    return [account, patient, dates, insurance, amount + (" " + status if status else ""), overdue, insurance_id]
+
+
+def put(page, y, text, x=2):
+    page.insert_text((x, y), text, fontsize=7, fontname="cour")
+
+
+def put_row(page, y, cells, per_cell=False):
+    if not per_cell:
+        put(page, y, ''.join(cell.ljust(width) for cell, width in zip(cells, COLUMN_WIDTHS + [0])))
+        return
+    x = 2
+    for cell, width in zip(cells, COLUMN_WIDTHS + [0]):
+        if cell:
+            put(page, y, cell, x)
+        x += width * CHAR_WIDTH
+
+
+def claims_report(path, pages=3, rows=30, numeric=False, blank_pages=(), odd_lines_every=13,
+                  per_cell=False, digit_patients=False):
+    """A Biloxi report (letter accounts), or a Paul report with numeric=True. Every tenth row is
+    followed by a secondary-insurance line, every odd_lines_every-th by a line the parsers miss.
+    digit_patients starts some Paul patient names with digits ('458Jose Vasquez')"""
+    doc = pymupdf.open()
+    n = 0
+    for page_index in range(pages):
+        page = doc.new_page(width=800, height=612)
+        if page_index in blank_pages:
+            continue
+        put(page, 20, f"Murphy Billing Overdue Report Date: 08/20/25 Page: {page_index + 1}")
+        put_row(page, 40, claim_cells("Account", "Patient Name", "DOS", "Insurance", "Claim", "", "Due", "ID"),
+                per_cell)
+        y = 40 + LINE_SPACING
+        for row in range(rows):
+            n += 1
+            account = f"{1000 + n}" if numeric else f"ABC{n}" + ("X" if n % 7 == 0 else "")
+            patient = PATIENTS[n % 5]
+            if digit_patients and n % 6 == 0:
+                patient = f"{n % 900 + 100}Jose Vasquez"
+            cells = claim_cells(account, patient, f"0{1 + n % 9}/1{n % 9}/24 0{1 + n % 9}/2{n % 9}/24",
+                                INSURANCES[n % 5] + (" Pri" if n % 3 else " Sec") + " E",
+                                f"{100 + n}.{n % 100:02d}", "Hold" if n % 4 == 0 else "", str(n % 120), f"ID{n:05d}")
+            put_row(page, y, cells, per_cell)
+            y += LINE_SPACING
+            if row % 10 == 9:
+                put_row(page, y, claim_cells("", "", "02/01/24", "MEDICAID PLAN Sec W", "55.00", "", "12", "MCD999"),
+                        per_cell)
+                y += LINE_SPACING
+            if row % odd_lines_every == odd_lines_every - 1:
+                put_row(page, y, claim_cells("", "", "03/01/24", "WEIRD STUFF", "abc", "", "1 2", "Q1"), per_cell)
+                y += LINE_SPACING
+    doc.save(path)
+    return path
+
+
+def unpaid_report(path, pages=3, rows=25):
+    doc = pymupdf.open()
+    n = 0
+    for page_index in range(pages):
+        page = doc.new_page(width=800, height=612)
+        put(page, 20, f"Unpaid Charges  Printed On: 08/20/2025  Page #: {page_index + 1}")
+        put(page, 32, "Filter: All")
+        put(page, 44, "Date Patient # Code Description Amount Balance Clinician Patient Units Account")
+        y = 58
+        for row in range(rows):
+            if row % 8 == 0:
+                put(page, y, f"Payor: Primary:BLUE CROSS {row} Secondary:MEDICAID Office:Main")
+                y += LINE_SPACING
+            n += 1
+            put(page, y, f"08/{1 + n % 28:02d}/2025 {2000 + n} 9083{n % 10} Psych Eval {150 + n}.00 {90 + n}.00 "
+                         f"Dr Jones A Smith, John {1 + n % 4} Commercial")
+            y += LINE_SPACING
+        put(page, y, "Total Units: 99 Total Charges: 1000.00")
+    doc.save(path)
+    return path
@@ -0,0 +1,109 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import converter
+import main
+import parse_cache
+import paul_parse
+
+
+def upload(client, url, pdf_path):
+    with open(pdf_path, 'rb') as file:
+        return client.post(url, files={'file': (os.path.basename(pdf_path), file, 'application/pdf')})
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def parsed_records(pdf_path, kind, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    return converter.parse_pdf_records(pdf_path, kind, input_name=os.path.basename(pdf_path))
+
+
+def test_parse_returns_the_records_as_json(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/api/parse', report_pdfs['paul_missed'])
+    assert response.status_code == 200
+    parsed = response.json()
+    expected = parsed_records(report_pdfs['paul_missed'], 'claims', monkeypatch)
+    assert parsed['claims'] == expected['claims']
+    assert parsed['pattern_missed'] == expected['pattern_missed']
+    assert parsed['filename'] == 'weird paul.pdf'
+    assert (parsed['kind'], parsed['file_type'], parsed['page_count']) == ('claims', 'paul', 3)
+
+    response = upload(app_client, '/api/parse?kind=unpaid', report_pdfs['unpaid'])
+    assert response.json()['charges'] == parsed_records(report_pdfs['unpaid'], 'unpaid', monkeypatch)['charges']
+
+
+def test_parse_as_ndjson_ends_with_the_summary(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/api/parse?format=ndjson', report_pdfs['biloxi_missed'])
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = ndjson(response)
+    expected = parsed_records(report_pdfs['biloxi_missed'], 'claims', monkeypatch)
+
+    record_types = [line.pop('record_type') for line in lines]
+    claim_count, missed_count = len(expected['claims']), len(expected['pattern_missed'])
+    assert record_types == ['claim'] * claim_count + ['pattern_missed'] * missed_count + ['summary']
+    assert lines[:claim_count] == expected['claims']
+    summary = lines[-1]
+    assert summary['claims_count'] == claim_count
+    assert summary['pattern_missed_count'] == missed_count
+    assert summary['filename'] == 'weird Biloxi.pdf'
+
+
+def test_parse_rejects_bad_requests(app_client, report_pdfs):
+    assert upload(app_client, '/api/parse?kind=bogus', report_pdfs['biloxi']).status_code == 400
+    assert upload(app_client, '/api/parse?format=xlsx', report_pdfs['biloxi']).status_code == 400
+    assert upload(app_client, '/api/parse?backend=bogus', report_pdfs['biloxi']).status_code == 400
+    response = upload(app_client, '/api/parse', report_pdfs['blank'])
+    assert response.status_code == 400
+    assert response.json()['detail'] == "No text extracted from PDF"
+
+
+def test_stream_sends_each_page_as_it_is_parsed(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/api/parse/stream', report_pdfs['biloxi_blank_pages'])
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = ndjson(response)
+    expected = parsed_records(report_pdfs['biloxi_blank_pages'], 'claims', monkeypatch)
+
+    record_types = [line.pop('record_type') for line in lines]
+    assert [line for line, record_type in zip(lines, record_types) if record_type == 'claim'] == expected['claims']
+    assert ([line for line, record_type in zip(lines, record_types) if record_type == 'pattern_missed']
+            == expected['pattern_missed'])
+    # Each page's missed lines come before the claims of the next page
+    first_missed = record_types.index('pattern_missed')
+    assert 'claim' in record_types[first_missed:]
+    assert record_types[-1] == 'summary'
+    assert lines[-1]['cache_hit'] is False
+    assert lines[-1]['claims_count'] == len(expected['claims'])
+    assert lines[-1]['filename'] == 'mixed Biloxi.pdf'
+
+
+def test_stream_reports_a_failure_after_the_first_page_as_an_error_line(app_client, report_pdfs, monkeypatch):
+    iter_claims_by_page = paul_parse.iter_claims_by_page
+
+    def first_page_only(page_texts, document):
+        pages = iter_claims_by_page(page_texts, document)
+        yield next(pages)
+        raise RuntimeError("Page 2 could not be parsed")
+
+    monkeypatch.setattr(paul_parse, 'iter_claims_by_page', first_page_only)
+    # A pool started after the change, so that its worker parses with it
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        monkeypatch.setattr(main.app.state, 'executor', executor)
+        response = upload(app_client, '/api/parse/stream', report_pdfs['paul'])
+    assert response.status_code == 200
+    lines = ndjson(response)
+    assert lines[0]['record_type'] == 'claim'
+    assert lines[-1] == {'record_type': 'error', 'status_code': 500, 'detail': "Page 2 could not be parsed"}
+    assert 'summary' not in [line['record_type'] for line in lines]
+
+
+def test_stream_errors_before_the_first_record_are_http_errors(app_client, report_pdfs):
+    response = upload(app_client, '/api/parse/stream', report_pdfs['blank'])
+    assert response.status_code == 400
+    assert response.json()['detail'] == "No text extracted from PDF"
+    assert upload(app_client, '/api/parse/stream?kind=bogus', report_pdfs['biloxi']).status_code == 400
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pytest
+
+import artifacts
+
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(artifacts, 'ARTIFACT_DIR', str(tmp_path))
+    monkeypatch.setattr(artifacts, 'ARTIFACT_TTL_SECONDS', 3600)
+    monkeypatch.setattr(artifacts, 'ARTIFACT_MAX_BYTES', 10 * 1024 * 1024)
+    return tmp_path
+
+
+def age(artifact_id, seconds):
+    mtime = time.time() - seconds
+    os.utime(os.path.join(artifacts.ARTIFACT_DIR, artifact_id), (mtime, mtime))
+
+
+def test_put_stores_bytes_and_chunks(artifact_dir):
+    artifact_id = artifacts.put(b'output', '.xlsx')
+    assert artifact_id.endswith('.xlsx')
+    with open(artifacts.path(artifact_id), 'rb') as file:
+        assert file.read() == b'output'
+    chunked_id = artifacts.put(iter([b'out', b'put']), '.csv')
+    with open(artifacts.path(chunked_id), 'rb') as file:
+        assert file.read() == b'output'
+    # Nothing but the artifacts is left behind
+    assert sorted(os.listdir(artifact_dir)) == sorted([artifact_id, chunked_id])
+
+    artifacts.delete(artifact_id)
+    assert artifacts.path(artifact_id) is None
+    assert artifacts.path('../outside') is None
+
+
+def test_expired_artifacts_are_gone(artifact_dir):
+    expired_id = artifacts.put(b'old')
+    fresh_id = artifacts.put(b'new')
+    age(expired_id, 3601)
+    assert artifacts.path(expired_id) is None
+    assert os.listdir(artifact_dir) == [fresh_id]
+
+    # Expired artifacts and leftover temporary files are removed by the next put
+    age(fresh_id, 3601)
+    with open(artifact_dir / 'interrupted.tmp', 'wb') as file:
+        file.write(b'partial')
+    os.utime(artifact_dir / 'interrupted.tmp', (time.time() - 3601,) * 2)
+    newest_id = artifacts.put(b'newest')
+    assert os.listdir(artifact_dir) == [newest_id]
+
+
+def test_oldest_artifacts_are_evicted_over_the_size_limit(artifact_dir, monkeypatch):
+    artifact_ids = []
+    for index in range(3):
+        artifact_ids.append(artifacts.put(b'x' * 1000))
+        age(artifact_ids[-1], 300 - index * 100)
+    monkeypatch.setattr(artifacts, 'ARTIFACT_MAX_BYTES', 2500)
+
+    # Room is made for the new artifact before it is written
+    newest_id = artifacts.put(b'x' * 1000)
+    assert sorted(os.listdir(artifact_dir)) == sorted(artifact_ids[2:] + [newest_id])
+    artifacts.evict(max_bytes=1000)
+    assert os.listdir(artifact_dir) == [newest_id]
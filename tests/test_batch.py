@@ -0,0 +1,68 @@
+import io
+import json
+import os
+import zipfile
+
+import openpyxl
+
+BROKEN_PDF = b'%PDF-1.4\n' + b'0' * 5000
+
+
+def post_batch(client, files, query=''):
+    """POST files, a list of (name, path or bytes), to /batch/"""
+    opened = []
+    try:
+        fields = []
+        for name, content in files:
+            if isinstance(content, str):
+                content = open(content, 'rb')
+                opened.append(content)
+            fields.append(('files', (name, content, 'application/pdf')))
+        return client.post(f'/batch/{query}', files=fields)
+    finally:
+        for file in opened:
+            file.close()
+
+
+def batch_files(report_pdfs):
+    return [(os.path.basename(report_pdfs[name]), report_pdfs[name]) for name in ('biloxi', 'paul', 'unpaid')] + [
+        ('broken.pdf', BROKEN_PDF)]
+
+
+def test_batch_zip_has_each_output_and_the_summary(app_client, report_pdfs):
+    response = post_batch(app_client, batch_files(report_pdfs))
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/zip'
+    assert response.headers['x-batch-files'] == 'ok=3,error=1'
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ['Bilxy 08212025.xlsx', 'paul report_processed.xlsx',
+                                      'unpaid charges_unpaid_charges.xlsx', 'summary.json']
+        summaries = json.loads(archive.read('summary.json'))
+    assert [(summary['file'], summary['file_type'], summary['status']) for summary in summaries] == [
+        ('Biloxi 08202025.pdf', 'biloxi', 'ok'), ('paul report.pdf', 'paul', 'ok'),
+        ('unpaid charges.pdf', 'unpaid', 'ok'), ('broken.pdf', 'biloxi', 'error')]
+    assert summaries[3]['detail'] == "No text extracted from PDF"
+    assert summaries[2]['charges_count'] == 75
+
+
+def test_combined_batch_is_one_workbook(app_client, report_pdfs):
+    response = post_batch(app_client, batch_files(report_pdfs), '?combine=true')
+    assert response.status_code == 200
+    assert response.headers['x-batch-files'] == 'ok=3,error=1'
+    workbook = openpyxl.load_workbook(io.BytesIO(response.content), read_only=True)
+    assert workbook.sheetnames == ['Insurance Claims', 'Pattern Missed Data', 'Unpaid Charges', 'Batch Summary']
+
+    claim_rows = list(workbook['Insurance Claims'].iter_rows(values_only=True))
+    assert claim_rows[0][0] == 'Source File'
+    assert {row[0] for row in claim_rows[1:]} == {'Biloxi 08202025.pdf', 'paul report.pdf'}
+    summary_rows = list(workbook['Batch Summary'].iter_rows(values_only=True))
+    assert [(row[0], row[2]) for row in summary_rows[1:]] == [
+        ('Biloxi 08202025.pdf', 'ok'), ('paul report.pdf', 'ok'), ('unpaid charges.pdf', 'ok'), ('broken.pdf', 'error')]
+
+
+def test_batch_without_any_converted_file_is_rejected(app_client):
+    response = post_batch(app_client, [('broken.pdf', BROKEN_PDF), ('broken.pdf', BROKEN_PDF)])
+    assert response.status_code == 400
+    detail = response.json()['detail']
+    assert detail['message'] == "No file in the batch could be converted"
+    assert [summary['status'] for summary in detail['files']] == ['error', 'error']
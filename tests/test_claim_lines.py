@@ -0,0 +1,85 @@
+import collections
+
+import pytest
+
+import biloxy_parse
+import claim_lines
+import paul_parse
+from claim_line_cases import claim_line_cases
+from legacy import biloxy_parse as legacy_biloxy_parse
+from legacy import paul_parse as legacy_paul_parse
+
+PARSERS = {
+    'biloxi': (biloxy_parse, legacy_biloxy_parse),
+    'paul': (paul_parse, legacy_paul_parse),
+}
+
+
+@pytest.fixture(scope='module')
+def cases(report_pdfs):
+    return claim_line_cases([report_pdfs['biloxi'], report_pdfs['biloxi_missed'], report_pdfs['paul'],
+                             report_pdfs['paul_missed']])
+
+
+@pytest.mark.parametrize('report_format', sorted(PARSERS))
+def test_lines_parse_like_legacy(cases, report_format):
+    """Line by line, the parsers give the original parser's output"""
+    parser, legacy_parser = PARSERS[report_format]
+    mismatches = []
+    for line in cases:
+        if (repr(parser.parse_complete_pattern(line, 'A', 'P')) !=
+                repr(legacy_parser.parse_complete_pattern(line, 'A', 'P')) or
+                parser.has_complete_data_row_structure(line) != legacy_parser.has_complete_data_row_structure(line)):
+            mismatches.append(line)
+    assert len(mismatches) == 0, mismatches[:5]
+
+
+def first_difference(records, expected):
+    """(index, record, expected record) of the first record that differs, None when all match"""
+    for index in range(max(len(records), len(expected))):
+        record = records[index] if index < len(records) else None
+        expected_record = expected[index] if index < len(expected) else None
+        if repr(record) != repr(expected_record):
+            return index, record, expected_record
+    return None
+
+
+@pytest.mark.parametrize('report_format', sorted(PARSERS))
+def test_documents_parse_like_legacy(cases, report_format):
+    parser, legacy_parser = PARSERS[report_format]
+    text_content = '\n'.join(cases)
+    claims_data, pattern_missed_lines = parser.parse_insurance_claims(text_content)
+    legacy_claims, legacy_missed = legacy_parser.parse_insurance_claims(text_content)
+    assert first_difference(claims_data, legacy_claims) is None
+    assert first_difference(pattern_missed_lines, legacy_missed) is None
+
+
+@pytest.mark.parametrize('report_format', sorted(PARSERS))
+def test_cases_reach_every_token_kind(cases, report_format):
+    """The cases must hold every kind of token the parse tells apart, header and gap tokens included"""
+    line_parser = PARSERS[report_format][0].LINE_PARSER
+    kind_lines = collections.Counter()
+    for line in cases:
+        tokens = line.split()
+        kind_lines.update(set(''.join(map(line_parser.line_shapes.__getitem__, tokens)).translate(
+            claim_lines.SHAPE_KINDS)))
+        kind_lines.update(set(''.join(map(line_parser.token_shapes.__getitem__, tokens)).translate(
+            claim_lines.SHAPE_KINDS)))
+    kinds = [claim_lines.DATE_KIND, claim_lines.DATE_FIRST_KIND, claim_lines.DATE_IN_NAME_KIND,
+             claim_lines.DATE_INSIDE_KIND, claim_lines.INDICATOR_KIND, claim_lines.SUB_INDICATOR_KIND,
+             claim_lines.NAME_KIND, claim_lines.MONEY_KIND, claim_lines.OTHER_KIND]
+    if report_format == 'biloxi':
+        # Its name words are all name characters, which no date is
+        kinds.remove(claim_lines.DATE_IN_NAME_KIND)
+        kinds += [claim_lines.HEADER_KIND, claim_lines.GAP_KIND]
+    assert {kind: kind_lines[kind] for kind in kinds if kind_lines[kind] < 50} == {}
+
+
+def test_digits_in_status_words_are_told_apart():
+    line_parser = claim_lines.ClaimLineParser(['CARE'], ['Rej2'], r'\$?[\d,]+\.?\d*')
+    assert not line_parser.digit_blind
+    assert claim_lines.shape_flags(line_parser.tokenize('Rej2 Rej3')[1]) == [claim_lines.STATUS_FLAG | claim_lines.ID_FLAG
+                                                                            | claim_lines.ID_TOKEN_FLAG,
+                                                                            claim_lines.ID_FLAG | claim_lines.ID_TOKEN_FLAG]
+    assert claim_lines.ClaimLineParser(['CARE'], ['Rej'], r'\$?[\d,]{1,3}\.?\d*').digit_blind
+    assert not claim_lines.ClaimLineParser(['CARE'], ['Rej'], r'[1-9][\d,]*').digit_blind
@@ -0,0 +1,34 @@
+import os
+
+import cli
+import parse_cache
+
+
+def convert(inputs, manifest_path, *options):
+    return cli.main([*inputs, '--manifest', str(manifest_path), '-j', '1', *options])
+
+
+def test_manifest_skips_only_outputs_that_are_still_in_place(report_pdfs, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    report_pdf = report_pdfs['biloxi']
+    manifest_path = tmp_path / 'manifest.json'
+    first_dir, other_dir = tmp_path / 'first', tmp_path / 'other'
+
+    assert convert([report_pdf], manifest_path, '-o', str(first_dir)) == 0
+    [output_name] = os.listdir(first_dir)
+    assert convert([report_pdf], manifest_path, '-o', str(first_dir)) == 0
+    assert '0 converted, 1 unchanged' in capsys.readouterr().out
+
+    # Another output directory gets its own output
+    assert convert([report_pdf], manifest_path, '-o', str(other_dir)) == 0
+    assert '1 converted, 0 unchanged' in capsys.readouterr().out
+    assert os.listdir(other_dir) == [output_name]
+
+    # So does a removed output, and an explicit output file
+    os.unlink(other_dir / output_name)
+    assert convert([report_pdf], manifest_path, '-o', str(other_dir)) == 0
+    assert os.listdir(other_dir) == [output_name]
+    output_path = tmp_path / 'named.xlsx'
+    assert convert([report_pdf, str(output_path)], manifest_path) == 0
+    assert '1 converted, 0 unchanged' in capsys.readouterr().out
+    assert output_path.exists()
@@ -0,0 +1,74 @@
+import biloxy_parse
+import paul_parse
+import pdf_extract
+import unpaid_charges_parse
+from legacy import biloxy_parse as legacy_biloxy_parse
+from legacy import paul_parse as legacy_paul_parse
+from legacy import unpaid_charges_parse as legacy_unpaid_charges_parse
+
+CLAIMS_PARSERS = {
+    'biloxi': (biloxy_parse, legacy_biloxy_parse),
+    'biloxi_blank_pages': (biloxy_parse, legacy_biloxy_parse),
+    'biloxi_missed': (biloxy_parse, legacy_biloxy_parse),
+    'biloxi_cells': (biloxy_parse, legacy_biloxy_parse),
+    'paul': (paul_parse, legacy_paul_parse),
+    'paul_missed': (paul_parse, legacy_paul_parse),
+}
+
+
+def test_formats_default_to_pypdf2():
+    assert pdf_extract.DEFAULT_BACKEND == 'pypdf2'
+    for parser in (biloxy_parse, paul_parse, unpaid_charges_parse):
+        assert parser.EXTRACTION_BACKEND == pdf_extract.DEFAULT_BACKEND
+
+
+def test_default_backend_parses_like_legacy_pypdf2(report_pdfs):
+    for name, (parser, legacy_parser) in CLAIMS_PARSERS.items():
+        text_content = pdf_extract.extract_text(report_pdfs[name], parser.EXTRACTION_BACKEND)
+        expected = legacy_parser.parse_insurance_claims(legacy_parser.extract_text_from_pdf(report_pdfs[name]))
+        assert parser.parse_insurance_claims(text_content) == expected, name
+
+    text_content = pdf_extract.extract_text(report_pdfs['unpaid'], unpaid_charges_parse.EXTRACTION_BACKEND)
+    expected = legacy_unpaid_charges_parse.parse_unpaid_charges(
+        legacy_unpaid_charges_parse.extract_text_from_pdf(report_pdfs['unpaid']))
+    assert unpaid_charges_parse.parse_unpaid_charges(text_content) == expected
+
+
+def test_benchmark_flags_pymupdf_on_per_cell_rows(report_pdfs):
+    """PyMuPDF reads row-per-line reports like PyPDF2, but puts every cell of a report drawn one
+    cell at a time on its own line, where the pattern parser finds no claims"""
+    def claim_count(text_content):
+        return len(biloxy_parse.parse_insurance_claims(text_content)[0])
+
+    results = pdf_extract.benchmark_backends([report_pdfs['biloxi'], report_pdfs['biloxi_missed']], claim_count,
+                                             backends=['pymupdf'])
+    assert results[0]['same_output']
+
+    results = pdf_extract.benchmark_backends([report_pdfs['biloxi_cells']], claim_count, backends=['pymupdf'])
+    assert results[0]['mismatched_files'] == [report_pdfs['biloxi_cells']]
+    assert claim_count(pdf_extract.extract_text(report_pdfs['biloxi_cells'], 'pymupdf')) == 0
+
+
+def test_streamed_pages_are_not_kept(report_pdfs, monkeypatch):
+    page_texts, page_engines = pdf_extract.extract_pages(report_pdfs['biloxi_blank_pages'])
+    with pdf_extract.PDFDocument(report_pdfs['biloxi_blank_pages']) as document:
+        assert list(document.iter_pages()) == list(zip(page_texts, page_engines))
+        assert document._texts == {}
+        # The engines of the streamed pages are known without extracting them again
+        monkeypatch.setattr(document, 'read_page', None)
+        assert document.page_engines() == page_engines
+
+
+def test_parallel_page_ranges_match_sequential_extraction(report_pdfs, monkeypatch):
+    monkeypatch.setattr(pdf_extract, 'PARALLEL_MIN_PAGES', 1)
+    assert pdf_extract.split_page_ranges(5, 8) == [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5)]
+    assert pdf_extract.split_page_ranges(7, 3) == [(0, 3), (3, 5), (5, 7)]
+
+    pdf_path = report_pdfs['biloxi_blank_pages']
+    for backend in ('pypdf2', 'pymupdf', 'pdfplumber'):
+        sequential = pdf_extract.get_backend(backend).extract_pages(pdf_path)
+        for workers in (2, 3):
+            assert pdf_extract.extract_pages_parallel(pdf_path, backend, workers) == sequential, (backend, workers)
+        # The blank pages fall back to the other engine the same way either way
+        assert (pdf_extract.extract_pages(pdf_path, backend, workers=2)
+                == pdf_extract.extract_pages(pdf_path, backend, workers=1)), backend
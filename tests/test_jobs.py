@@ -0,0 +1,87 @@
+import io
+import json
+import os
+
+import openpyxl
+
+import converter
+import main
+import parse_cache
+
+
+def upload(client, pdf_path, query=''):
+    with open(pdf_path, 'rb') as file:
+        return client.post(f'/jobs/{query}', files={'file': (os.path.basename(pdf_path), file, 'application/pdf')})
+
+
+def read_events(client, events_url):
+    """The statuses sent on a job's event stream, until it ends"""
+    statuses = []
+    with client.stream('GET', events_url) as response:
+        assert response.headers['content-type'].startswith('text/event-stream')
+        for line in response.iter_lines():
+            if line.startswith('data: '):
+                statuses.append(json.loads(line[len('data: '):]))
+    return statuses
+
+
+def test_converter_reports_each_stage_with_page_counts(report_pdfs, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    events = []
+    converter.convert_claims_pdf(report_pdfs['biloxi'], 'Biloxi 08202025.pdf', progress=events.append)
+    assert [event['stage'] for event in events] == ['hashing', 'extracting', 'writing', 'done']
+    extracting = [event for event in events if 'page_count' in event]
+    assert extracting and all(event['page_count'] == 3 for event in extracting)
+    assert set(events[-1]['timings']) == {'hashing', 'extracting', 'writing'}
+
+
+def test_progress_follows_the_stages():
+    assert main.job_progress({'stage': 'queued'}) == 0
+    assert main.job_progress({'stage': 'extracting', 'page_count': 4, 'pages_done': 0}) == 5
+    assert main.job_progress({'stage': 'extracting', 'page_count': 4, 'pages_done': 2}) == 48
+    assert main.job_progress({'stage': 'extracting', 'page_count': 4, 'pages_done': 9}) == 90
+    assert main.job_progress({'stage': 'writing'}) == 90
+    assert main.job_progress({'stage': 'done'}) == 100
+
+
+def test_job_runs_in_the_background_and_is_downloaded(app_client, report_pdfs):
+    response = upload(app_client, report_pdfs['biloxi'])
+    assert response.status_code == 202
+    job = response.json()
+    assert job['status_url'] == f"/jobs/{job['job_id']}"
+
+    statuses = read_events(app_client, job['events_url'])
+    assert statuses[-1]['status'] == 'done'
+    assert statuses[-1]['progress'] == 100
+    progress = [status['progress'] for status in statuses]
+    assert progress == sorted(progress)
+    assert all('result' not in status for status in statuses)
+
+    status = app_client.get(job['status_url']).json()
+    assert status['status'] == 'done'
+    assert set(status['timings']) == {'hashing', 'extracting', 'writing'}
+
+    download = app_client.get(job['download_url'])
+    assert download.status_code == 200
+    assert 'Bilxy 08212025.xlsx' in download.headers['content-disposition']
+    assert download.headers['x-cache'] == 'MISS'
+    workbook = openpyxl.load_workbook(io.BytesIO(download.content), read_only=True)
+    assert workbook.sheetnames == ['Insurance Claims', 'Pattern Missed Data']
+
+
+def test_failed_job_reports_its_error(app_client, report_pdfs):
+    job = upload(app_client, report_pdfs['blank']).json()
+    statuses = read_events(app_client, job['events_url'])
+    assert statuses[-1]['status'] == 'error'
+    assert statuses[-1]['error'] == "No text extracted from PDF"
+
+    download = app_client.get(job['download_url'])
+    assert download.status_code == 400
+    assert download.json()['detail'] == "No text extracted from PDF"
+
+
+def test_unknown_jobs_and_kinds_are_rejected(app_client, report_pdfs):
+    assert app_client.get('/jobs/nosuchjob').status_code == 404
+    assert app_client.get('/jobs/nosuchjob/events').status_code == 404
+    assert upload(app_client, report_pdfs['biloxi'], '?kind=bogus').status_code == 400
+    assert upload(app_client, report_pdfs['biloxi'], '?format=bogus').status_code == 400
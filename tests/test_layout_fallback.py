@@ -0,0 +1,48 @@
+import biloxy_parse
+
+
+def test_pages_with_text_but_no_claims_are_layout_parsed(report_pdfs):
+    """PyMuPDF puts each cell of this report on its own line: every page has text, but the pattern
+    parser finds neither claims nor missed lines there"""
+    pdf_path = report_pdfs['biloxi_cells']
+    layout_claims, layout_missed = biloxy_parse.parse_insurance_claims_layout(pdf_path)
+    assert layout_claims
+
+    with biloxy_parse.open_pdf_document(pdf_path, 'pymupdf') as document:
+        page_texts = document.page_texts()
+        assert all(page_text.strip() for page_text in page_texts)
+        assert biloxy_parse.parse_insurance_claims(page_texts) == ([], [])
+
+        pages = list(biloxy_parse.iter_claims_by_page(page_texts, document))
+        assert [parser for page_num, claims, missed, parser in pages] == ['layout'] * len(page_texts)
+        # Page by page the missed lines are numbered by their place in the document, so only their
+        # content is compared
+        claims_data, pattern_missed_data = biloxy_parse.parse_insurance_claims_with_fallback(page_texts, document)
+        assert claims_data == layout_claims
+        assert [line['content'] for line in pattern_missed_data] == [line['content'] for line in layout_missed]
+        line_numbers = [line['line_number'] for line in pattern_missed_data]
+        assert line_numbers == sorted(set(line_numbers))
+        assert line_numbers[-1] > len(page_texts[0].splitlines())
+        assert biloxy_parse.parse_insurance_claims_with_fallback(page_texts, document, mode='document') == (
+            layout_claims, layout_missed)
+
+
+def test_pages_without_text_are_not_layout_parsed(report_pdfs):
+    with biloxy_parse.open_pdf_document(report_pdfs['biloxi_blank_pages']) as document:
+        page_texts = document.page_texts()
+        parsers = [parser for page_num, claims, missed, parser in
+                   biloxy_parse.iter_claims_by_page(page_texts, document)]
+    assert parsers == ['pattern'] * 5
+
+
+def test_pages_without_data_rows_are_not_layout_parsed(report_pdfs):
+    """A cover page, a header-only page and a totals page have text but no claim, and are left alone"""
+    page_texts = ['Unpaid Claims Report\nPrepared for Biloxi',
+                  'Murphy Medical Report Date: 08/20/25\nRun: 08/20/25 Time: 10:15',
+                  'Total Claims: 120\nGrand Total 12,345.67']
+    with biloxy_parse.open_pdf_document(report_pdfs['biloxi']) as document:
+        parsers = [parser for page_num, claims, missed, parser in
+                   biloxy_parse.iter_claims_by_page(page_texts, document)]
+    assert parsers == ['pattern'] * 3
+    assert not any(map(biloxy_parse.REPORT.has_data_rows, page_texts))
+    assert biloxy_parse.REPORT.has_data_rows('01/02/24\nMEDICARE')
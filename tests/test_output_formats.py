@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+import converter
+import parse_cache
+
+
+def upload(client, url, pdf_path, output_format):
+    with open(pdf_path, 'rb') as file:
+        return client.post(f'{url}?format={output_format}',
+                           files={'file': (os.path.basename(pdf_path), file, 'application/pdf')})
+
+
+def parsed_records(pdf_path, kind, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    return converter.parse_pdf_records(pdf_path, kind, input_name=os.path.basename(pdf_path))
+
+
+def test_unpaid_charges_as_csv(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/upload-unpaid/', report_pdfs['unpaid'], 'csv')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'unpaid charges_unpaid_charges.csv' in response.headers['content-disposition']
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    charges = parsed_records(report_pdfs['unpaid'], 'unpaid', monkeypatch)['charges']
+    assert len(rows) == len(charges) == 75
+    assert list(rows[0]) == list(charges[0])
+    assert rows[0]['Patient #'] == str(charges[0]['Patient #'])
+
+
+def test_claims_as_csv_zip_with_a_file_per_sheet(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/upload/', report_pdfs['biloxi_missed'], 'csv')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/zip'
+    assert 'weird Biloxi_processed.zip' in response.headers['content-disposition']
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ['insurance_claims.csv', 'pattern_missed_data.csv']
+        claims = list(csv.DictReader(io.StringIO(archive.read('insurance_claims.csv').decode('utf-8'))))
+        missed = list(csv.DictReader(io.StringIO(archive.read('pattern_missed_data.csv').decode('utf-8'))))
+    parsed = parsed_records(report_pdfs['biloxi_missed'], 'claims', monkeypatch)
+    assert [row['Account'] for row in claims] == [claim['Account'] for claim in parsed['claims']]
+    assert len(missed) == len(parsed['pattern_missed']) > 0
+
+
+def test_claims_as_json_lines(app_client, report_pdfs, monkeypatch):
+    response = upload(app_client, '/upload/', report_pdfs['biloxi'], 'jsonl')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    assert 'Bilxy 08212025.jsonl' in response.headers['content-disposition']
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    parsed = parsed_records(report_pdfs['biloxi'], 'claims', monkeypatch)
+    claims = [line for line in lines if line['sheet'] == 'Insurance Claims']
+    assert len(claims) == len(parsed['claims'])
+    assert {key: value for key, value in claims[0].items() if key != 'sheet'} == parsed['claims'][0]
+    assert len(lines) - len(claims) == len(parsed['pattern_missed'])
+
+
+def test_unpaid_charges_as_parquet(app_client, report_pdfs, monkeypatch):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    response = upload(app_client, '/upload-unpaid/', report_pdfs['unpaid'], 'parquet')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/vnd.apache.parquet'
+    table = parquet.read_table(io.BytesIO(response.content))
+    charges = parsed_records(report_pdfs['unpaid'], 'unpaid', monkeypatch)['charges']
+    assert table.num_rows == len(charges)
+    assert table.column_names == list(charges[0])
+    # Amounts stay numeric
+    assert table.column('Amount').to_pylist() == [charge['Amount'] for charge in charges]
+
+
+def test_unknown_format_is_rejected(app_client, report_pdfs):
+    response = upload(app_client, '/upload/', report_pdfs['biloxi'], 'bogus')
+    assert response.status_code == 400
+    assert 'Unknown output format' in response.json()['detail']
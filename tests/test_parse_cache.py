@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+import biloxy_parse
+import parse_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 10 * 1024 * 1024)
+    return tmp_path
+
+
+def test_put_and_get_round_trip(cache_dir):
+    value = [[{'Account': 'ABC1', 'Claim Amount': 101.01, 'Over Due': 1}], []]
+    parse_cache.put('key', value)
+    assert parse_cache.get('key') == value
+    assert parse_cache.get('other key') is None
+    # Nothing but the entry is left behind
+    assert os.listdir(cache_dir) == ['key.json.gz']
+
+
+def test_parser_version_changes_the_key(cache_dir, report_pdfs, monkeypatch):
+    key = parse_cache.key_for_pdf(report_pdfs['biloxi'], biloxy_parse)
+    parse_cache.put(key, [[], []])
+    monkeypatch.setattr(biloxy_parse, 'PARSER_VERSION', f'{biloxy_parse.PARSER_VERSION}-changed')
+    new_key = parse_cache.key_for_pdf(report_pdfs['biloxi'], biloxy_parse)
+    assert new_key != key
+    assert parse_cache.get(new_key) is None
+    assert parse_cache.key_for_pdf(report_pdfs['biloxi'], biloxy_parse, backend='pdfplumber') != new_key
+
+
+def test_least_recently_used_entries_are_evicted(cache_dir):
+    for age, key in enumerate(['newest', 'used', 'oldest']):
+        parse_cache.put(key, ['x' * 1000])
+        mtime = 1000000 - age * 100
+        os.utime(parse_cache._entry_path(key), (mtime, mtime))
+    # A hit makes 'used' the most recently used entry
+    assert parse_cache.get('used') == ['x' * 1000]
+
+    entry_size = os.path.getsize(parse_cache._entry_path('newest'))
+    parse_cache.evict(max_bytes=entry_size * 2)
+    assert sorted(os.listdir(cache_dir)) == ['newest.json.gz', 'used.json.gz']
+    parse_cache.evict(max_bytes=entry_size)
+    assert os.listdir(cache_dir) == ['used.json.gz']
+    parse_cache.clear()
+    assert os.listdir(cache_dir) == []
@@ -0,0 +1,69 @@
+"""The profile-driven parsers against the original ones in tests/legacy, on the fixture reports"""
+import pytest
+
+import biloxy_parse
+import paul_parse
+import pdf_extract
+import unpaid_charges_parse
+from legacy import biloxy_parse as legacy_biloxy_parse
+from legacy import paul_parse as legacy_paul_parse
+from legacy import unpaid_charges_parse as legacy_unpaid_charges_parse
+
+CLAIMS_REPORTS = {
+    'biloxi': (biloxy_parse, legacy_biloxy_parse),
+    'biloxi_blank_pages': (biloxy_parse, legacy_biloxy_parse),
+    'biloxi_missed': (biloxy_parse, legacy_biloxy_parse),
+    'paul': (paul_parse, legacy_paul_parse),
+    'paul_missed': (paul_parse, legacy_paul_parse),
+}
+BACKENDS = ['pypdf2', 'pymupdf']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(CLAIMS_REPORTS) + ['biloxi_cells'])
+def test_pattern_parsing(report_pdfs, name, backend):
+    parser, legacy_parser = CLAIMS_REPORTS.get(name, (biloxy_parse, legacy_biloxy_parse))
+    page_texts, page_engines = pdf_extract.extract_pages(report_pdfs[name], backend)
+    text_content = pdf_extract.join_pages(page_texts)
+    expected = legacy_parser.parse_insurance_claims(text_content)
+    assert parser.parse_insurance_claims(text_content) == expected
+    assert parser.parse_insurance_claims(page_texts) == expected
+    records = list(parser.iter_insurance_claims_from_pdf(report_pdfs[name], backend))
+    assert ([record for record_type, record in records if record_type == 'claim'],
+            [record for record_type, record in records if record_type != 'claim']) == expected
+
+
+@pytest.mark.parametrize('name', sorted(CLAIMS_REPORTS) + ['biloxi_cells'])
+def test_layout_parsing(report_pdfs, name):
+    parser, legacy_parser = CLAIMS_REPORTS.get(name, (biloxy_parse, legacy_biloxy_parse))
+    assert (parser.parse_insurance_claims_layout(report_pdfs[name]) ==
+            legacy_parser.parse_insurance_claims_layout(report_pdfs[name]))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name', sorted(CLAIMS_REPORTS))
+def test_document_fallback(report_pdfs, name, backend):
+    parser, legacy_parser = CLAIMS_REPORTS[name]
+    text_content = pdf_extract.extract_text(report_pdfs[name], backend)
+    assert (parser.parse_insurance_claims_with_fallback(text_content, report_pdfs[name], mode='document') ==
+            legacy_parser.parse_insurance_claims_with_fallback(text_content, report_pdfs[name]))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_unpaid_charges(report_pdfs, backend):
+    text_content = pdf_extract.extract_text(report_pdfs['unpaid'], backend)
+    assert (unpaid_charges_parse.parse_unpaid_charges(text_content) ==
+            legacy_unpaid_charges_parse.parse_unpaid_charges(text_content))
+
+
+@pytest.mark.parametrize('name', ['biloxi', 'biloxi_blank_pages', 'paul'])
+def test_page_fallback_without_layout_pages(report_pdfs, name):
+    """Page by page, a report that needs no layout parsing comes out as the legacy fallback gives it"""
+    parser, legacy_parser = CLAIMS_REPORTS[name]
+    with parser.open_pdf_document(report_pdfs[name]) as document:
+        page_texts = document.page_texts()
+        assert all(page_parser == 'pattern' for page_num, claims, missed, page_parser in
+                   parser.iter_claims_by_page(page_texts, document))
+        assert (parser.parse_insurance_claims_with_fallback(page_texts, document) ==
+                legacy_parser.parse_insurance_claims_with_fallback(legacy_parser.extract_text_from_pdf(report_pdfs[name]),
+                                                                   report_pdfs[name]))
@@ -0,0 +1,79 @@
+import converter
+import parse_cache
+import pdf_extract
+import report_detect
+
+CLAIMS_HEADER = ("Murphy Billing Overdue Report Date: 08/20/25 Page: 1\n"
+                 "Account Patient Name DOS Insurance Claim Due ID\n")
+PAUL_DIGIT_NAMES = CLAIMS_HEADER + (
+    "1029 458Jose Vasquez 09/15/22 09/15/22 MEDICARE PART B Pri E 1885.85 105 1EG4TE5MK72\n"
+    "1030 12Ana Ruiz 01/02/24 01/02/24 HUMANA GOLD PLUS Sec E 120.00 Hold 12 ID00002\n"
+    "1031458Jose Vasquez 03/04/24 03/04/24 AETNA HEALTH PLAN Pri E 99.10 7 ID00003\n"
+    "1032 7Lee Ann 05/06/24 05/06/24 UNITED HEALTH CARE Pri E 10.00 30 ID00004\n"
+    "1033 99Mary Doe 07/08/24 07/08/24 MEDICAID PLAN Pri E 55.00 12 MCD999\n"
+)
+
+
+def first_page(pdf_path):
+    with pdf_extract.PDFDocument(pdf_path) as document:
+        return document.page_text(0)
+
+
+def test_first_pages_of_each_report(report_pdfs):
+    for name, report_type in [('biloxi', 'biloxi'), ('paul', 'paul'), ('biloxi_missed', 'biloxi'),
+                              ('paul_missed', 'paul'), ('unpaid', 'unpaid')]:
+        detection = report_detect.detect_report(report_pdfs[name])
+        assert detection['report_type'] == report_type, name
+        assert detection['confidence'] >= report_detect.MIN_CONFIDENCE, name
+        assert (detection['kind'], detection['file_type']) == report_detect.REPORT_TYPES[report_type]
+
+
+def test_paul_names_starting_with_digits():
+    assert report_detect.PAUL_ACCOUNT_LINE.match("1029 458Jose Vasquez 09/15/22")
+    assert report_detect.PAUL_ACCOUNT_LINE.match("1029458Jose Vasquez 09/15/22")
+    assert not report_detect.PAUL_ACCOUNT_LINE.match("1885.85 105 1234")
+    assert not report_detect.PAUL_ACCOUNT_LINE.match("08/01/2025 2001 90831 Psych Eval")
+
+    detection = report_detect.fingerprint(PAUL_DIGIT_NAMES)
+    assert detection['report_type'] == 'paul'
+    assert detection['confidence'] >= report_detect.MIN_CONFIDENCE
+
+
+def test_paul_page_with_digit_names(report_pdfs):
+    page_text = first_page(report_pdfs['paul'])
+    assert any(line.split()[1][0].isdigit() for line in page_text.splitlines()[2:] if line.strip())
+    assert report_detect.fingerprint(page_text)['report_type'] == 'paul'
+
+
+def test_ties_are_unknown():
+    # A claims header without account lines does not say which claims report it is
+    assert report_detect.fingerprint(CLAIMS_HEADER)['report_type'] is None
+    even = CLAIMS_HEADER + "ABC1 SMITH JOHN 01/02/24 BLUE CROSS Pri E 1.00 1 ID1\n" \
+                           "1029 SMITH JOHN 01/02/24 BLUE CROSS Pri E 1.00 1 ID1\n"
+    detection = report_detect.fingerprint(even)
+    assert detection['report_type'] is None
+    assert detection['confidence'] == 0.0
+    assert report_detect.fingerprint('')['report_type'] is None
+
+
+def test_detection_reads_the_shared_document(report_pdfs):
+    with pdf_extract.PDFDocument(report_pdfs['paul']) as document:
+        assert report_detect.detect_report(document)['report_type'] == 'paul'
+        assert document._texts == {}
+        assert document.page_text(0)
+
+
+def test_batch_file_opens_the_pdf_once(report_pdfs, monkeypatch):
+    opened = []
+
+    class CountedDocument(pdf_extract.PDFDocument):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(pdf_extract, 'PDFDocument', CountedDocument)
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    result = converter.convert_batch_file(report_pdfs['paul'], 'report.pdf')
+    assert result['summary']['status'] == 'ok'
+    assert result['summary']['file_type'] == 'paul'
+    assert len(opened) == 1
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import output_formats
+import parse_cache
+import unpaid_charges_server
+
+
+@pytest.fixture(scope='module')
+def client():
+    with TestClient(unpaid_charges_server.app) as client:
+        yield client
+
+
+def upload(client, pdf_path, query=''):
+    with open(pdf_path, 'rb') as file:
+        return client.post(f'/upload-unpaid/{query}', files={'file': ('unpaid charges.pdf', file, 'application/pdf')})
+
+
+def test_upload_is_converted_like_main(client, report_pdfs, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    response = upload(client, report_pdfs['unpaid'], '?format=csv')
+    assert response.status_code == 200
+    assert response.headers['x-cache'] == 'MISS'
+    assert response.headers['x-extraction-engines']
+    assert 'unpaid charges_unpaid_charges.csv' in response.headers['content-disposition']
+
+
+def test_unavailable_format_is_rejected_before_converting(client, report_pdfs, monkeypatch):
+    assert upload(client, report_pdfs['unpaid'], '?format=bogus').status_code == 400
+
+    def unavailable(output_format):
+        raise ValueError(f"Output format '{output_format}' needs pyarrow")
+
+    monkeypatch.setattr(output_formats, 'validate_format', unavailable)
+    response = upload(client, report_pdfs['unpaid'], '?format=parquet')
+    assert response.status_code == 400
+    assert 'pyarrow' in response.json()['detail']
@@ -0,0 +1,90 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import uploads
+
+BOUNDARY = 'testboundary'
+PDF_BYTES = b'%PDF-1.4\n' + b'0' * 5000
+
+
+def multipart_body(files, field='file'):
+    body = b''
+    for filename, content in files:
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode() + content + b'\r\n'
+    return body + f'--{BOUNDARY}--\r\n'.encode()
+
+
+class StreamedRequest:
+    """A request whose body arrives in chunk_size pieces, counting the pieces the app received"""
+
+    def __init__(self, body, chunk_size=1024, content_length=True):
+        self.chunks = [body[start:start + chunk_size] for start in range(0, len(body), chunk_size)]
+        self.received = 0
+        headers = [(b'content-type', f'multipart/form-data; boundary={BOUNDARY}'.encode())]
+        if content_length:
+            headers.append((b'content-length', str(len(body)).encode()))
+        self.request = Request({'type': 'http', 'method': 'POST', 'headers': headers}, self.receive)
+
+    async def receive(self):
+        self.received += 1
+        more_body = self.received < len(self.chunks)
+        return {'type': 'http.request', 'body': self.chunks[self.received - 1], 'more_body': more_body}
+
+
+def receive(streamed, **kwargs):
+    return asyncio.run(uploads.receive_uploads(streamed.request, **kwargs))
+
+
+def test_upload_is_written_once_as_it_arrives():
+    streamed = StreamedRequest(multipart_body([('report.pdf', PDF_BYTES)]))
+    [(filename, path)] = receive(streamed)
+    try:
+        assert filename == 'report.pdf'
+        with open(path, 'rb') as f:
+            assert f.read() == PDF_BYTES
+    finally:
+        os.unlink(path)
+
+
+def test_declared_oversized_body_is_rejected_before_reading():
+    streamed = StreamedRequest(multipart_body([('report.pdf', PDF_BYTES * 20)]))
+    with pytest.raises(HTTPException) as error:
+        receive(streamed, max_bytes=1000)
+    assert error.value.status_code == 413
+    assert streamed.received == 0
+
+
+def test_undeclared_oversized_body_stops_at_the_limit():
+    big_pdf = PDF_BYTES * 100
+    streamed = StreamedRequest(multipart_body([('report.pdf', big_pdf)]), content_length=False)
+    with pytest.raises(HTTPException) as error:
+        receive(streamed, max_bytes=len(PDF_BYTES) * 10)
+    assert error.value.status_code == 413
+    assert streamed.received < len(streamed.chunks) // 5
+
+
+def test_non_pdf_is_rejected_on_its_first_bytes():
+    streamed = StreamedRequest(multipart_body([('report.pdf', b'<html>' + b'0' * 50000)]))
+    with pytest.raises(HTTPException) as error:
+        receive(streamed)
+    assert error.value.status_code == 400
+    assert streamed.received <= 3
+
+
+def test_batch_limits_files_and_removes_partial_uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads.tempfile, 'tempdir', str(tmp_path))
+    body = multipart_body([('a.pdf', PDF_BYTES), ('b.zip', uploads.ZIP_MAGIC + b'0' * 100), ('c.pdf', PDF_BYTES)],
+                          field='files')
+    with pytest.raises(HTTPException) as error:
+        receive(StreamedRequest(body), field='files', suffixes=('.pdf', '.zip'), max_files=2)
+    assert error.value.status_code == 400
+    assert not os.listdir(tmp_path)
+
+    files = receive(StreamedRequest(body), field='files', suffixes=('.pdf', '.zip'), max_files=3)
+    assert [(name, os.path.splitext(path)[1]) for name, path in files] == [
+        ('a.pdf', '.pdf'), ('b.zip', '.zip'), ('c.pdf', '.pdf')]
@@ -0,0 +1,41 @@
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import parse_cache
+import watcher
+
+
+def watch_once(folder_watcher):
+    """One pass of the watch loop: scan, then convert what settled until nothing is left"""
+    folder_watcher.executor = ProcessPoolExecutor(max_workers=1)
+    try:
+        folder_watcher.scan()
+        deadline = time.monotonic() + 60
+        while (folder_watcher.pending or folder_watcher.running) and time.monotonic() < deadline:
+            folder_watcher.collect()
+            folder_watcher.start_settled()
+            time.sleep(0.05)
+    finally:
+        folder_watcher.executor.shutdown(wait=True)
+        folder_watcher.collect()
+
+
+def test_new_file_is_converted_and_skipped_after_restart(report_pdfs, tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'CACHE_MAX_BYTES', 0)
+    monkeypatch.setattr(watcher, 'SETTLE_SECONDS', 0)
+    shutil.copy(report_pdfs['biloxi'], tmp_path / 'Biloxi 08202025.pdf')
+
+    watch_once(watcher.FolderWatcher([tmp_path], workers=1, use_events=False))
+    outputs = sorted(name for name in os.listdir(tmp_path) if name.endswith('.xlsx'))
+    assert len(outputs) == 1
+    status_lines = (tmp_path / watcher.STATUS_LOG_NAME).read_text().splitlines()
+    assert [line.split('\t')[1:3] for line in status_lines] == [['ok', 'Biloxi 08202025.pdf']]
+
+    # A new watcher reads the manifest and leaves the converted file alone
+    restarted = watcher.FolderWatcher([tmp_path], workers=1, use_events=False)
+    watch_once(restarted)
+    assert restarted.seen
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.xlsx')) == outputs
+    assert (tmp_path / watcher.STATUS_LOG_NAME).read_text().splitlines() == status_lines
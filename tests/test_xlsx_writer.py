@@ -0,0 +1,41 @@
+import io
+
+import openpyxl
+
+import xlsx_writer
+
+COLUMNS = ['Account', 'Amount', 'Note']
+ROWS = [['ABC1', 101.01, None], ['ABC22', 5, 'x' * 80], ['ABC12345', 12345.5, 'short']]
+
+
+def written_sheet(rows):
+    buffer = io.BytesIO()
+    xlsx_writer.write_xlsx(buffer, [('Claims', COLUMNS, rows)])
+    buffer.seek(0)
+    return openpyxl.load_workbook(buffer)['Claims']
+
+
+def test_columns_are_sized_to_the_longest_value():
+    worksheet = written_sheet(ROWS)
+    widths = [worksheet.column_dimensions[letter].width for letter in 'ABC']
+    # 'ABC12345' is longer than its header, the header 'Amount' shorter than '12345.5'; the note is capped
+    assert widths == [8 + xlsx_writer.COLUMN_PADDING, 7 + xlsx_writer.COLUMN_PADDING, xlsx_writer.MAX_COLUMN_WIDTH]
+    assert [cell.value for cell in worksheet[1]] == COLUMNS
+    assert worksheet['A1'].font.bold
+    assert [[cell.value for cell in row] for row in worksheet.iter_rows(min_row=2)] == ROWS
+
+
+def test_generated_rows_are_sized_like_a_list(monkeypatch):
+    # A tiny spool limit moves the buffered rows to a temporary file
+    monkeypatch.setattr(xlsx_writer, 'SPOOL_MAX_BYTES', 10)
+    list_sheet = written_sheet(ROWS)
+    generated_sheet = written_sheet(row for row in ROWS)
+    for letter in 'ABC':
+        assert generated_sheet.column_dimensions[letter].width == list_sheet.column_dimensions[letter].width
+    assert ([[cell.value for cell in row] for row in generated_sheet.iter_rows()]
+            == [[cell.value for cell in row] for row in list_sheet.iter_rows()])
+
+
+def test_record_rows_follow_the_column_order():
+    records = [{'Note': 'n', 'Account': 'ABC1'}, {'Amount': 2}]
+    assert list(xlsx_writer.record_rows(records, COLUMNS)) == [['ABC1', None, 'n'], [None, 2, None]]
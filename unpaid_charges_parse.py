@@ -1,49 +1,77 @@
-import pandas as pd
 import re
-import PyPDF2
-import pdfplumber
-import openpyxl
-from openpyxl.styles import Font, Alignment
+import keyword_match
+import pdf_extract
+import xlsx_writer
+import output_formats
 
-def extract_text_from_pdf(pdf_path):
-    text_content = ""
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text_content += page.extract_text() + "\n"
-        
-        if not text_content.strip():
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text_content += page.extract_text() + "\n"
-    except Exception as e:
-        pass
-    return text_content
-
-def parse_unpaid_charges(text_content):
-    charges_data = []
-    lines = [line.strip() for line in text_content.split('\n') if line.strip()]
-    
+# Text extraction engine for this report format (see pdf_extract.EXTRACTION_BACKENDS)
+EXTRACTION_BACKEND = 'pypdf2'
+
+# Bump whenever a change alters the parsed output, so cached results are not reused
+PARSER_VERSION = '1' + keyword_match.keywords_version('unpaid')
+
+def open_pdf_document(pdf_path, backend=None, workers=None):
+    """Open the PDF with this report's extraction backend and the pdfplumber fallback"""
+    return pdf_extract.PDFDocument(pdf_path, backend or EXTRACTION_BACKEND, fallback='pdfplumber', workers=workers)
+
+def extract_pages_from_pdf(pdf_path, backend=None, workers=None):
+    """Return (page_texts, page_engines); empty pages are retried with pdfplumber (slower but better)"""
+    return pdf_extract.extract_pages(pdf_path, backend or EXTRACTION_BACKEND, fallback='pdfplumber', workers=workers)
+
+def extract_text_from_pdf(pdf_path, backend=None, workers=None):
+    page_texts, page_engines = extract_pages_from_pdf(pdf_path, backend, workers)
+    return pdf_extract.join_pages(page_texts)
+
+# Matched on the upper-cased line; BILXY_KEYWORDS_FILE can add a client's own (see keyword_match)
+UNPAID_HEADER_WORDS = keyword_match.configured_keywords('unpaid', 'header_words', [
+    "UNPAID CHARGES", "FILTER:", "PRINTED ON:", "PAGE #:", "TOTAL UNITS:", "TOTAL CHARGES:"])
+UNPAID_HEADER_SEARCH = keyword_match.compile_keywords(word.upper() for word in UNPAID_HEADER_WORDS).search
+DATA_LINE_PATTERN = re.compile(r'^\d{2}/\d{2}/\d{4}')
+
+def is_header_line(line):
+    """Report header/footer lines and column header lines"""
+    if UNPAID_HEADER_SEARCH(line.upper()):
+        return True
+    return "Date" in line and ("Patient" in line or "Code" in line)
+
+def is_entry_boundary(line):
+    """Lines that end the continuation of a data entry"""
+    return bool(DATA_LINE_PATTERN.match(line)) or "Payor:" in line or is_header_line(line)
+
+def parse_unpaid_charges(text_content, progress=None):
+    """Parse the document text (or a list of page texts) into a list of charge records.
+    progress(pages_parsed, lines_parsed) is called after each page."""
+    return list(iter_unpaid_charges(pdf_extract.iter_lines(text_content, progress)))
+
+def iter_unpaid_charges_from_pdf(pdf_path, backend=None):
+    """Stream charge records straight from the PDF, extracting one page at a time"""
+    page_texts = (page_text for page_text, engine in
+                  pdf_extract.iter_pages(pdf_path, backend or EXTRACTION_BACKEND, fallback='pdfplumber'))
+    return iter_unpaid_charges(pdf_extract.iter_lines(page_texts))
+
+def iter_unpaid_charges(lines):
+    """Yield charge records from a stream of stripped lines.
+
+    A data entry starts on a date line and continues until the next boundary line,
+    so the pending entry and the current payor carry over between pages.
+    """
     current_payor_primary = ""
     current_payor_secondary = ""
-    
+    pending_line = None
 
-    
+    for line in lines:
+        if pending_line is not None:
+            if not is_entry_boundary(line):
+                # Continuation of the pending data entry
+                pending_line += " " + line
+                continue
+            record = parse_charge_line(pending_line, current_payor_primary, current_payor_secondary)
+            if record:
+                yield record
+            pending_line = None
 
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        
-        # Skip header/footer lines
-        if any(word in line.upper() for word in ["UNPAID CHARGES", "FILTER:", "PRINTED ON:", "PAGE #:", "TOTAL UNITS:", "TOTAL CHARGES:"]):
-            i += 1
-            continue
-        
-        # Skip column headers
-        if "Date" in line and ("Patient" in line or "Code" in line):
-            i += 1
+        # Skip header/footer lines and column headers
+        if is_header_line(line):
             continue
             
         # Extract Payor information
@@ -65,201 +93,173 @@ def parse_unpaid_charges(text_content):
                 if secondary_match:
                     current_payor_secondary = secondary_match.group(1).strip()
 
-            
-            i += 1
             continue
             
-        # Parse data lines - look for date pattern
-        if re.match(r'^\d{2}/\d{2}/\d{4}', line):
-            # Check if next line continues this entry
-            combined_line = line
-            j = i + 1
-            while j < len(lines):
-                next_line = lines[j]
-                if (re.match(r'^\d{2}/\d{2}/\d{4}', next_line) or 
-                    "Payor:" in next_line or
-                    any(word in next_line.upper() for word in ["UNPAID CHARGES", "FILTER:", "PRINTED ON:", "PAGE #:", "TOTAL UNITS:", "TOTAL CHARGES:"]) or
-                    ("Date" in next_line and ("Patient" in next_line or "Code" in next_line))):
-                    break
-                combined_line += " " + next_line
-                j += 1
-            
-            i = j - 1
-            tokens = combined_line.split()
-            
-            if len(tokens) >= 3:
-                try:
-                    date = tokens[0]
-                    patient_num = tokens[1] if len(tokens) > 1 else ""
-                    
-                    # Find key elements first
-                    code_idx = -1
-                    amount_indices = []
-                    units_idx = -1
-                    
-                    # Find 5-digit code
-                    for idx in range(len(tokens)):
-                        if re.match(r'^\d{5}$', tokens[idx]):
-                            code_idx = idx
-                            break
-                    
-                    # Find all amounts (decimal numbers)
-                    for idx in range(len(tokens)):
-                        if re.match(r'^\d+\.\d{2}$', tokens[idx]):
-                            amount_indices.append(idx)
-                    
-                    # Find units (1-2 digit number, search from end backwards)
-                    for idx in range(len(tokens)-1, -1, -1):
-                        if re.match(r'^\d{1,2}$', tokens[idx]):
-                            # Make sure it's not a date part or patient number
-                            if idx > 2 and not re.match(r'^\d{2}/\d{2}/\d{4}$', tokens[idx-1] if idx > 0 else ''):
-                                units_idx = idx
-                                break
-                    
-                    if code_idx == -1:
-                        continue
-                    
-                    # Code
-                    code = tokens[code_idx]
-                    
-                    # Find single letter (usually 'A') between clinician and patient name
-                    single_letter_idx = -1
-                    if len(amount_indices) > 0 and units_idx > 0:
-                        first_amount_idx = amount_indices[0]
-                        for idx in range(first_amount_idx + 1, units_idx):
-                            if idx < len(tokens) and len(tokens[idx]) == 1 and tokens[idx].isalpha():
-                                single_letter_idx = idx
-                                break
-                    
-                    # Clinician - between first amount and single letter
-                    clinician = ""
-                    if len(amount_indices) > 0 and single_letter_idx > 0:
-                        first_amount_idx = amount_indices[0]
-                        clinician_parts = []
-                        for idx in range(first_amount_idx + 1, single_letter_idx):
-                            if idx < len(tokens):
-                                clinician_parts.append(tokens[idx])
-                        clinician = ' '.join(clinician_parts)
-                    
-                    # Patient Name - between single letter and units
-                    patient_name = ""
-
-                    
-                    if single_letter_idx > 0 and units_idx > 0:
-                        name_parts = []
-                        for idx in range(single_letter_idx + 1, units_idx):
-                            if idx < len(tokens):
-                                name_parts.append(tokens[idx])
-                        full_name = ' '.join(name_parts).rstrip(',')
-                        
-                        # Remove single alphabetic characters at the beginning
-                        name_tokens = full_name.split()
-                        while name_tokens and len(name_tokens[0]) == 1 and name_tokens[0].isalpha():
-                            name_tokens.pop(0)
-                        patient_name = ' '.join(name_tokens)
-
-                    elif units_idx > 0:
-                        # Fallback: look for name pattern before units
-                        name_parts = []
-                        # Look for comma-containing tokens or name-like patterns
-                        start_search = len(amount_indices) if amount_indices else 8
-                        for idx in range(start_search, units_idx):
-                            if idx < len(tokens):
-                                token = tokens[idx]
-                                # Start collecting from comma or name-like token
-                                if ',' in token or (len(token) > 2 and not token.isupper()):
-                                    for name_idx in range(idx, units_idx):
-                                        if name_idx < len(tokens):
-                                            name_parts.append(tokens[name_idx])
-                                    break
-                        
-                        if name_parts:
-                            full_name = ' '.join(name_parts).rstrip(',')
-                            name_tokens = full_name.split()
-                            while name_tokens and len(name_tokens[0]) == 1 and name_tokens[0].isalpha():
-                                name_tokens.pop(0)
-                            patient_name = ' '.join(name_tokens)
-
-                    else:
-                        pass
-                    
-                    # Units
-                    units = tokens[units_idx] if units_idx > 0 else ""
-                    
-                    # Description - between code and first amount
-                    description = ""
-                    if len(amount_indices) > 0:
-                        first_amount_idx = amount_indices[0]
-                        if code_idx + 1 < first_amount_idx:
-                            description = ' '.join(tokens[code_idx+1:first_amount_idx])
-                    
-                    # Amounts
-                    amount = float(tokens[amount_indices[0]]) if len(amount_indices) > 0 else 0.0
-                    balance = float(tokens[amount_indices[1]]) if len(amount_indices) > 1 else amount
-                    
-                    # Account Type - after units
-                    account_type = ""
-                    if units_idx > 0 and units_idx + 1 < len(tokens):
-                        remaining = tokens[units_idx+1:]
-                        filtered_remaining = []
-                        for token in remaining:
-                            if not re.match(r'^\d+\.\d{2}$', token):
-                                filtered_remaining.append(token)
-                        account_type = ' '.join(filtered_remaining)
-                    
-                    record = {
-                        'Date': date,
-                        'Patient #': patient_num,
-                        'Patient Name': patient_name,
-                        'Code': code,
-                        'Units': units,
-                        'Description': description,
-                        'Amount': amount,
-                        'Balance': balance,
-                        'Clinician': clinician,
-                        'Account Type': account_type,
-                        'Payor Primary': current_payor_primary,
-                        'Payor Secondary': current_payor_secondary
-                    }
-                    charges_data.append(record)
-                    
-                except (ValueError, IndexError):
-                    pass
-        
-        i += 1
-    
+        # Data lines start with a date; following lines may continue the entry
+        if DATA_LINE_PATTERN.match(line):
+            pending_line = line
 
-    
+    if pending_line is not None:
+        record = parse_charge_line(pending_line, current_payor_primary, current_payor_secondary)
+        if record:
+            yield record
 
+def parse_charge_line(combined_line, current_payor_primary, current_payor_secondary):
+    """Parse one data entry (a date line plus its continuation lines) into a record, or None"""
+    tokens = combined_line.split()
     
-    return charges_data
+    if len(tokens) < 3:
+        return None
+
+    try:
+        date = tokens[0]
+        patient_num = tokens[1] if len(tokens) > 1 else ""
+
+        # Find key elements first
+        code_idx = -1
+        amount_indices = []
+        units_idx = -1
+
+        # Find 5-digit code
+        for idx in range(len(tokens)):
+            if re.match(r'^\d{5}$', tokens[idx]):
+                code_idx = idx
+                break
+
+        # Find all amounts (decimal numbers)
+        for idx in range(len(tokens)):
+            if re.match(r'^\d+\.\d{2}$', tokens[idx]):
+                amount_indices.append(idx)
+
+        # Find units (1-2 digit number, search from end backwards)
+        for idx in range(len(tokens)-1, -1, -1):
+            if re.match(r'^\d{1,2}$', tokens[idx]):
+                # Make sure it's not a date part or patient number
+                if idx > 2 and not re.match(r'^\d{2}/\d{2}/\d{4}$', tokens[idx-1] if idx > 0 else ''):
+                    units_idx = idx
+                    break
+
+        if code_idx == -1:
+            return None
+
+        # Code
+        code = tokens[code_idx]
+
+        # Find single letter (usually 'A') between clinician and patient name
+        single_letter_idx = -1
+        if len(amount_indices) > 0 and units_idx > 0:
+            first_amount_idx = amount_indices[0]
+            for idx in range(first_amount_idx + 1, units_idx):
+                if idx < len(tokens) and len(tokens[idx]) == 1 and tokens[idx].isalpha():
+                    single_letter_idx = idx
+                    break
+
+        # Clinician - between first amount and single letter
+        clinician = ""
+        if len(amount_indices) > 0 and single_letter_idx > 0:
+            first_amount_idx = amount_indices[0]
+            clinician_parts = []
+            for idx in range(first_amount_idx + 1, single_letter_idx):
+                if idx < len(tokens):
+                    clinician_parts.append(tokens[idx])
+            clinician = ' '.join(clinician_parts)
+
+        # Patient Name - between single letter and units
+        patient_name = ""
+
+
+        if single_letter_idx > 0 and units_idx > 0:
+            name_parts = []
+            for idx in range(single_letter_idx + 1, units_idx):
+                if idx < len(tokens):
+                    name_parts.append(tokens[idx])
+            full_name = ' '.join(name_parts).rstrip(',')
+
+            # Remove single alphabetic characters at the beginning
+            name_tokens = full_name.split()
+            while name_tokens and len(name_tokens[0]) == 1 and name_tokens[0].isalpha():
+                name_tokens.pop(0)
+            patient_name = ' '.join(name_tokens)
+
+        elif units_idx > 0:
+            # Fallback: look for name pattern before units
+            name_parts = []
+            # Look for comma-containing tokens or name-like patterns
+            start_search = len(amount_indices) if amount_indices else 8
+            for idx in range(start_search, units_idx):
+                if idx < len(tokens):
+                    token = tokens[idx]
+                    # Start collecting from comma or name-like token
+                    if ',' in token or (len(token) > 2 and not token.isupper()):
+                        for name_idx in range(idx, units_idx):
+                            if name_idx < len(tokens):
+                                name_parts.append(tokens[name_idx])
+                        break
+
+            if name_parts:
+                full_name = ' '.join(name_parts).rstrip(',')
+                name_tokens = full_name.split()
+                while name_tokens and len(name_tokens[0]) == 1 and name_tokens[0].isalpha():
+                    name_tokens.pop(0)
+                patient_name = ' '.join(name_tokens)
+
+        else:
+            pass
+
+        # Units
+        units = tokens[units_idx] if units_idx > 0 else ""
+
+        # Description - between code and first amount
+        description = ""
+        if len(amount_indices) > 0:
+            first_amount_idx = amount_indices[0]
+            if code_idx + 1 < first_amount_idx:
+                description = ' '.join(tokens[code_idx+1:first_amount_idx])
+
+        # Amounts
+        amount = float(tokens[amount_indices[0]]) if len(amount_indices) > 0 else 0.0
+        balance = float(tokens[amount_indices[1]]) if len(amount_indices) > 1 else amount
+
+        # Account Type - after units
+        account_type = ""
+        if units_idx > 0 and units_idx + 1 < len(tokens):
+            remaining = tokens[units_idx+1:]
+            filtered_remaining = []
+            for token in remaining:
+                if not re.match(r'^\d+\.\d{2}$', token):
+                    filtered_remaining.append(token)
+            account_type = ' '.join(filtered_remaining)
+
+        record = {
+            'Date': date,
+            'Patient #': patient_num,
+            'Patient Name': patient_name,
+            'Code': code,
+            'Units': units,
+            'Description': description,
+            'Amount': amount,
+            'Balance': balance,
+            'Clinician': clinician,
+            'Account Type': account_type,
+            'Payor Primary': current_payor_primary,
+            'Payor Secondary': current_payor_secondary
+        }
+        return record
+
+    except (ValueError, IndexError):
+        return None
+
+# Columns of the 'Unpaid Charges' sheet, in order
+CHARGE_COLUMNS = ['Date', 'Patient #', 'Patient Name', 'Code', 'Units', 'Description',
+                  'Amount', 'Balance', 'Clinician', 'Account Type', 'Payor Primary', 'Payor Secondary']
+
+def output_sheets(charges_data):
+    return [('Unpaid Charges', CHARGE_COLUMNS, xlsx_writer.record_rows(charges_data, CHARGE_COLUMNS))]
 
 def create_xlsx_file(charges_data, output_path):
-    columns = ['Date', 'Patient #', 'Patient Name', 'Code', 'Units', 'Description', 
-               'Amount', 'Balance', 'Clinician', 'Account Type', 'Payor Primary', 'Payor Secondary']
-    df = pd.DataFrame(charges_data, columns=columns)
-    
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Unpaid Charges', index=False)
-        
-        workbook = writer.book
-        worksheet = writer.sheets['Unpaid Charges']
-        header_font = Font(bold=True)
-        header_alignment = Alignment(horizontal='center')
-        
-        for col_num, column_title in enumerate(df.columns, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.font = header_font
-            cell.alignment = header_alignment
-        
-        for column in worksheet.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
\ No newline at end of file
+    """Write the charges sheet through a write-only workbook; charges_data may be a generator"""
+    xlsx_writer.write_xlsx(output_path, output_sheets(charges_data))
+
+def create_output_file(charges_data, output_path, output_format='xlsx'):
+    """Write the charges in any of output_formats.OUTPUT_FORMATS (xlsx, csv, jsonl, parquet)"""
+    output_formats.write_output(output_path, output_format, output_sheets(charges_data))
@@ -0,0 +1,227 @@
+import os
+import tempfile
+import zipfile
+
+from fastapi import HTTPException
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Largest accepted upload, in megabytes (env MAX_UPLOAD_MB)
+MAX_UPLOAD_BYTES = int(float(os.environ.get('MAX_UPLOAD_MB', '250')) * 1024 * 1024)
+# Zip members are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Every PDF starts with this signature; readers accept it anywhere in the first 1024 bytes
+PDF_MAGIC = b'%PDF-'
+PDF_MAGIC_WINDOW = 1024
+
+# Zip archives (batch uploads) start with a local file header
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Most files accepted in one batch, uploaded individually or inside a zip (env MAX_BATCH_FILES)
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', '50'))
+
+# Allowance for the multipart boundaries and headers around the file in the request body
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def too_large(max_bytes):
+    return HTTPException(status_code=413, detail=f"File is larger than the {max_bytes / (1024 * 1024):g} MB limit")
+
+
+def has_signature(chunk, suffix):
+    """Whether the start of a file carries the signature of its type ('.pdf' or '.zip')"""
+    if suffix == '.zip':
+        return chunk.startswith(ZIP_MAGIC)
+    return PDF_MAGIC in chunk[:PDF_MAGIC_WINDOW]
+
+
+class _FileParts:
+    """python-multipart callbacks that write the files of one form field straight to temporary
+    files, checking each file's name, signature and size as its bytes arrive"""
+
+    def __init__(self, field, suffixes, max_bytes, max_files):
+        self.field = field
+        self.suffixes = suffixes
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.files = []
+        self.header_field = b''
+        self.header_value = b''
+        self.disposition = b''
+        self.current = None
+
+    def callbacks(self):
+        return {name: getattr(self, name) for name in (
+            'on_part_begin', 'on_header_field', 'on_header_value', 'on_header_end', 'on_headers_finished',
+            'on_part_data', 'on_part_end')}
+
+    def on_part_begin(self):
+        self.disposition = b''
+        self.current = None
+
+    def on_header_field(self, data, start, end):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        if self.header_field.lower() == b'content-disposition':
+            self.disposition = self.header_value
+        self.header_field = self.header_value = b''
+
+    def on_headers_finished(self):
+        disposition, options = parse_options_header(self.disposition)
+        if options.get(b'name', b'').decode('utf-8', 'replace') != self.field or b'filename' not in options:
+            return
+        filename = options[b'filename'].decode('utf-8', 'replace')
+        if not filename.lower().endswith(self.suffixes):
+            raise HTTPException(status_code=400, detail="Only PDF files are allowed" if self.suffixes == ('.pdf',)
+                                else f"Only PDF and zip files are allowed: {filename}")
+        if len(self.files) == self.max_files:
+            raise HTTPException(status_code=400, detail=f"More than {self.max_files} files in one batch")
+        suffix = '.zip' if filename.lower().endswith('.zip') else '.pdf'
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        self.files.append((filename, temp_file.name))
+        # The start of the file is held back until its signature can be checked
+        self.current = {'file': temp_file, 'suffix': suffix, 'size': 0, 'head': b''}
+
+    def on_part_data(self, data, start, end):
+        current = self.current
+        if current is None:
+            return
+        chunk = data[start:end]
+        current['size'] += len(chunk)
+        if current['size'] > self.max_bytes:
+            raise too_large(self.max_bytes)
+        if current['head'] is not None:
+            current['head'] += chunk
+            if len(current['head']) < PDF_MAGIC_WINDOW:
+                return
+            chunk = self.check_head()
+        current['file'].write(chunk)
+
+    def check_head(self):
+        current = self.current
+        head, current['head'] = current['head'], None
+        if not has_signature(head, current['suffix']):
+            raise HTTPException(status_code=400, detail="File is not a zip archive" if current['suffix'] == '.zip'
+                                else "File is not a PDF")
+        return head
+
+    def on_part_end(self):
+        current = self.current
+        if current is None:
+            return
+        if current['size'] == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+        if current['head'] is not None:
+            current['file'].write(self.check_head())
+        current['file'].close()
+        self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current['file'].close()
+
+
+async def receive_uploads(request, field='file', suffixes=('.pdf',), max_bytes=None, max_files=1):
+    """Read the multipart/form-data body of request and write the files in its field to temporary
+    files; returns [(filename, path)].
+
+    The body is read from the request stream as it arrives and each file is written to disk once.
+    A declared Content-Length over the limit is rejected before anything is read; otherwise a file
+    without the signature of its type, over max_bytes (MAX_UPLOAD_BYTES by default) or beyond
+    max_files is rejected as soon as that is known, and the files written so far are removed.
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    max_body_bytes = max_bytes * max_files + MULTIPART_OVERHEAD_BYTES
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_body_bytes:
+        raise too_large(max_bytes)
+    content_type, options = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+
+    parts = _FileParts(field, suffixes, max_bytes, max_files)
+    parser = MultipartParser(options[b'boundary'], parts.callbacks())
+    try:
+        try:
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > max_body_bytes:
+                    raise too_large(max_bytes)
+                parser.write(chunk)
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="There was an error parsing the body")
+        finally:
+            parts.close()
+        if not parts.files:
+            raise HTTPException(status_code=400, detail=f"No file uploaded in '{field}'")
+    except BaseException:
+        for filename, temp_path in parts.files:
+            os.unlink(temp_path)
+        raise
+    return parts.files
+
+
+def openapi_upload(field='file', many=False):
+    """openapi_extra describing the upload of an endpoint that reads it with receive_uploads()"""
+    file_schema = {'type': 'string', 'format': 'binary'}
+    schema = {'type': 'object', 'required': [field],
+              'properties': {field: {'type': 'array', 'items': file_schema} if many else file_schema}}
+    return {'requestBody': {'required': True, 'content': {'multipart/form-data': {'schema': schema}}}}
+
+
+async def receive_pdf(request, max_bytes=None):
+    """Receive the PDF uploaded as 'file' (see receive_uploads); returns (filename, path)"""
+    return (await receive_uploads(request, max_bytes=max_bytes))[0]
+
+
+def extract_zip_pdfs(zip_path, max_bytes=None, max_files=None):
+    """Copy the PDFs inside a zip archive to temporary files and return [(name, path)].
+
+    Folders in the archive are flattened to the file name; other files are ignored. Members are
+    checked like uploads (PDF signature, max_bytes each), reading the decompressed data, so a
+    misleading header in the archive cannot get past the limit.
+    """
+    max_bytes = MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    max_files = MAX_BATCH_FILES if max_files is None else max_files
+    extracted = []
+    try:
+        try:
+            archive = zipfile.ZipFile(zip_path)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="File is not a zip archive")
+        with archive:
+            members = [member for member in archive.infolist()
+                       if not member.is_dir() and member.filename.lower().endswith('.pdf')
+                       and not member.filename.startswith('__MACOSX/')]
+            if not members:
+                raise HTTPException(status_code=400, detail="No PDF files in the zip archive")
+            if len(members) > max_files:
+                raise HTTPException(status_code=400, detail=f"More than {max_files} files in one batch")
+            for member in members:
+                name = os.path.basename(member.filename)
+                with archive.open(member) as source, \
+                        tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_pdf:
+                    extracted.append((name, temp_pdf.name))
+                    size = 0
+                    while True:
+                        chunk = source.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        if size == 0 and not has_signature(chunk, '.pdf'):
+                            raise HTTPException(status_code=400, detail=f"{name} is not a PDF")
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise too_large(max_bytes)
+                        temp_pdf.write(chunk)
+    except BaseException:
+        for name, temp_path in extracted:
+            os.unlink(temp_path)
+        raise
+    return extracted
@@ -0,0 +1,299 @@
+import argparse
+import importlib
+import os
+import queue
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cli
+import converter
+import output_formats
+import pdf_extract
+
+# File system events come from watchdog (inotify on Linux) when it is installed;
+# without it the directories are scanned every POLL_SECONDS
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+POLL_SECONDS = float(os.environ.get('WATCH_POLL_SECONDS', '2'))
+# With file system events, the directories are still rescanned this often in case an event was lost
+RESCAN_SECONDS = 60
+# A file is converted once its size and modification time have not changed for SETTLE_SECONDS
+SETTLE_SECONDS = float(os.environ.get('WATCH_SETTLE_SECONDS', '3'))
+# A settled PDF without its %%EOF trailer is taken as still being written, up to this many seconds
+INCOMPLETE_TIMEOUT = 60
+PDF_TRAILER = b'%%EOF'
+PDF_TRAILER_WINDOW = 1024
+TICK_SECONDS = 0.5
+
+# Written into each watched directory: what has been converted (so a restart does not convert
+# it again) and a line per converted or failed file
+MANIFEST_NAME = '.bilxy_manifest.json'
+STATUS_LOG_NAME = 'bilxy_status.log'
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards the paths of created, modified and moved-in PDFs to a queue"""
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        path = getattr(event, 'dest_path', None) or event.src_path
+        if isinstance(path, bytes):
+            path = os.fsdecode(path)
+        if path.lower().endswith('.pdf'):
+            self.events.put(path)
+
+
+def has_pdf_trailer(path):
+    """Whether the end of the file has the %%EOF marker a complete PDF ends with"""
+    try:
+        with open(path, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            file.seek(max(file.tell() - PDF_TRAILER_WINDOW, 0))
+            return PDF_TRAILER in file.read()
+    except OSError:
+        return False
+
+
+def is_done(entry, sha256, settings):
+    """Whether a manifest entry already covers this content: converted (and the output is still
+    there) or failed, with the same settings and parser version"""
+    if entry and entry.get('status') == 'error':
+        if entry.get('sha256') != sha256 or entry.get('settings') != settings:
+            return False
+        try:
+            return importlib.import_module(entry['parser']).PARSER_VERSION == entry['parser_version']
+        except Exception:
+            return False
+    return cli.is_unchanged(entry, sha256, settings)
+
+
+class FolderWatcher:
+    """Converts the PDFs that appear in a set of directories, writing each output and a status log
+    line next to the PDF. Conversions run in a bounded process pool; files still being written are
+    left until they settle. Every directory keeps a manifest, so a restart skips converted files."""
+
+    def __init__(self, directories, workers=None, output_format='xlsx', backend=None, parser_choice='auto',
+                 use_events=True):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.workers = max(workers or converter.CONVERSION_WORKERS, 1)
+        self.output_format = output_format
+        self.backend = backend
+        self.kind, self.file_type = cli.PARSER_CHOICES[parser_choice]
+        self.settings = {'parser_choice': parser_choice, 'format': output_format, 'backend': backend or ''}
+        self.use_events = use_events and Observer is not None
+
+        self.manifests = {directory: cli.load_manifest(os.path.join(directory, MANIFEST_NAME))
+                          for directory in self.directories}
+        # path -> (size, mtime_ns) of the version that was last converted or skipped
+        self.seen = {}
+        # path -> (size, mtime_ns, seconds when that was first seen) of files waiting to settle
+        self.pending = {}
+        # future -> (path, manifest key, file info) of running conversions
+        self.running = {}
+        self.events = queue.Queue()
+        self.executor = None
+        self.observer = None
+        self.stopping = False
+
+    def log(self, directory, status, pdf_name, message):
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t{status}\t{pdf_name}\t{message}"
+        print(line)
+        try:
+            with open(os.path.join(directory, STATUS_LOG_NAME), 'a', encoding='utf-8') as file:
+                file.write(line + '\n')
+        except OSError as e:
+            print(f"Could not write status log in {directory}: {e}")
+
+    def scan(self):
+        """Queue every PDF in the watched directories that is new or changed"""
+        for directory in self.directories:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                print(f"Cannot scan {directory}: {e}")
+                continue
+            for entry in entries:
+                if entry.name.lower().endswith('.pdf') and entry.is_file():
+                    self.notice(entry.path)
+
+    def notice(self, path):
+        """A PDF was created or changed: (re)start its settle time unless it is already handled"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        version = (stat.st_size, stat.st_mtime_ns)
+        if self.seen.get(path) == version or path in self.pending:
+            return
+        if any(running_path == path for running_path, key, file_info in self.running.values()):
+            return
+        self.pending[path] = version + (time.monotonic(),)
+
+    def start_settled(self):
+        """Submit the pending files that have stopped changing, while the pool has room"""
+        now = time.monotonic()
+        for path, (size, mtime_ns, changed_at) in list(self.pending.items()):
+            # Keep the queue in front of the pool short; the rest waits in pending
+            if len(self.running) >= self.workers * 2:
+                return
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+                continue
+            waited = now - changed_at
+            if waited < SETTLE_SECONDS or stat.st_size == 0:
+                continue
+            if not has_pdf_trailer(path) and waited < INCOMPLETE_TIMEOUT:
+                continue
+            del self.pending[path]
+            self.submit(path)
+
+    def submit(self, path):
+        directory = os.path.dirname(path)
+        manifest = self.manifests[directory]
+        key = os.path.realpath(path)
+        entry = manifest.get(key)
+        try:
+            sha256, stat = cli.content_hash(path, entry)
+        except OSError:
+            return
+        self.seen[path] = (stat.st_size, stat.st_mtime_ns)
+        if is_done(entry, sha256, self.settings):
+            return
+        file_info = {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        future = self.executor.submit(cli.convert_file, path, directory, self.backend, self.output_format,
+                                      self.kind, self.file_type)
+        self.running[future] = (path, key, file_info)
+
+    def collect(self):
+        """Place the outputs of finished conversions and record them"""
+        for future in [future for future in self.running if future.done()]:
+            path, key, file_info = self.running.pop(future)
+            directory = os.path.dirname(path)
+            pdf_name = os.path.basename(path)
+            try:
+                summary = future.result()
+            except BrokenProcessPool as e:
+                # A worker died (out of memory, crash, Ctrl+C); the file is tried again later,
+                # in a new pool unless the watcher is stopping
+                print(f"Worker pool failed while converting {pdf_name}: {e}")
+                self.seen.pop(path, None)
+                if not self.stopping:
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                continue
+            except Exception as e:
+                summary = {'status': 'error', 'detail': str(e)}
+
+            manifest = self.manifests[directory]
+            if summary['status'] == 'ok':
+                target = cli.place_output(summary)
+                manifest[key] = cli.manifest_entry(file_info, self.settings, summary, target)
+                self.log(directory, 'ok', pdf_name,
+                         f"{os.path.basename(target)}\t{cli.describe_counts(summary)}\t{summary['seconds']}s")
+            else:
+                manifest[key] = dict(file_info, settings=self.settings, status='error', detail=summary['detail'],
+                                     parser=summary.get('parser'), parser_version=summary.get('parser_version'),
+                                     converted_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+                self.log(directory, 'error', pdf_name, summary['detail'])
+            try:
+                cli.save_manifest(os.path.join(directory, MANIFEST_NAME), manifest)
+            except OSError as e:
+                print(f"Could not save manifest in {directory}: {e}")
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        """Watch until stopped (Ctrl+C or SIGTERM); running conversions are finished first"""
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                raise ValueError(f"Not a directory: {directory}")
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        if self.use_events:
+            self.observer = Observer()
+            handler = _EventHandler(self.events)
+            for directory in self.directories:
+                self.observer.schedule(handler, directory, recursive=False)
+            self.observer.start()
+        signal.signal(signal.SIGTERM, self.stop)
+        mode = 'file system events' if self.use_events else f'polling every {POLL_SECONDS:g}s'
+        print(f"Watching {', '.join(self.directories)} with {self.workers} workers ({mode})")
+
+        rescan_interval = RESCAN_SECONDS if self.use_events else POLL_SECONDS
+        last_scan = None
+        try:
+            while not self.stopping:
+                if last_scan is None or time.monotonic() - last_scan >= rescan_interval:
+                    self.scan()
+                    last_scan = time.monotonic()
+                while True:
+                    try:
+                        self.notice(self.events.get_nowait())
+                    except queue.Empty:
+                        break
+                self.collect()
+                self.start_settled()
+                time.sleep(TICK_SECONDS)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping = True
+            print("Stopping: waiting for running conversions")
+            if self.observer:
+                self.observer.stop()
+                self.observer.join()
+            self.executor.shutdown(wait=True)
+            self.collect()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python main.py watch',
+        description="Convert PDFs as they land in one or more directories. Outputs and a status log "
+                    f"({STATUS_LOG_NAME}) are written next to the PDFs.",
+    )
+    parser.add_argument('directories', nargs='+', help="directories to watch")
+    parser.add_argument('-j', '--workers', type=int, default=converter.CONVERSION_WORKERS,
+                        help=f"worker processes (default: {converter.CONVERSION_WORKERS})")
+    parser.add_argument('-p', '--parser', choices=sorted(cli.PARSER_CHOICES), default='auto',
+                        help="parser for every file; 'auto' picks one per file (default)")
+    parser.add_argument('-f', '--format', choices=sorted(output_formats.OUTPUT_FORMATS),
+                        default=output_formats.DEFAULT_FORMAT, help="output format (default: xlsx)")
+    parser.add_argument('-b', '--backend', choices=sorted(pdf_extract.EXTRACTION_BACKENDS),
+                        help="text extraction backend (default: the parser's own)")
+    parser.add_argument('--poll', action='store_true', help="scan the directories instead of using file system events")
+    args = parser.parse_args(argv)
+    try:
+        output_formats.validate_format(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    watcher = FolderWatcher(args.directories, args.workers, args.format, args.backend, args.parser,
+                            use_events=not args.poll)
+    try:
+        watcher.run()
+    except ValueError as e:
+        parser.error(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import json
+import tempfile
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
+
+# Column widths are sized to the longest value plus padding, up to MAX_COLUMN_WIDTH
+MAX_COLUMN_WIDTH = 50
+COLUMN_PADDING = 2
+
+# Rows from a generator are buffered here until the column widths are known;
+# past SPOOL_MAX_BYTES the buffer moves to a temporary file
+SPOOL_MAX_BYTES = 4 * 1024 * 1024
+
+
+def record_rows(records, columns):
+    """Rows of values in column order from dict records; missing fields become empty cells"""
+    for record in records:
+        yield [record.get(column) for column in columns]
+
+
+class SpooledRows:
+    """Buffer of rows that can be read back any number of times, kept as JSON lines in a
+    SpooledTemporaryFile so memory does not grow with the number of rows"""
+
+    def __init__(self, rows):
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode='w+', encoding='utf-8')
+        for row in rows:
+            self.file.write(json.dumps(row))
+            self.file.write('\n')
+
+    def __iter__(self):
+        self.file.seek(0)
+        for line in self.file:
+            yield json.loads(line)
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnWidths:
+    """Longest header or value seen in each column, tracked as rows are produced
+    so the worksheet never has to be read back to size its columns"""
+
+    def __init__(self, columns):
+        self.max_lengths = [len(str(column)) for column in columns]
+
+    def update(self, row):
+        max_lengths = self.max_lengths
+        for index, value in enumerate(row):
+            if value is None:
+                continue
+            length = len(value) if isinstance(value, str) else len(str(value))
+            if length > max_lengths[index]:
+                max_lengths[index] = length
+
+    def track(self, rows):
+        """Pass rows through while recording their lengths"""
+        for row in rows:
+            self.update(row)
+            yield row
+
+    def widths(self):
+        """Column widths: the longest value padded, capped at MAX_COLUMN_WIDTH"""
+        return [min(max_length + COLUMN_PADDING, MAX_COLUMN_WIDTH) for max_length in self.max_lengths]
+
+
+def write_sheet(workbook, title, columns, rows):
+    """Add a write-only sheet with a bold, centred header row and sized columns.
+    rows may be any iterable; it is consumed once."""
+    # The column widths have to be set before the first row is written, so rows from a
+    # generator are measured while they are spooled and rows in a list in one pass up front
+    column_widths = ColumnWidths(columns)
+    spooled_rows = None
+    if isinstance(rows, (list, tuple)):
+        for row in rows:
+            column_widths.update(row)
+    else:
+        rows = spooled_rows = SpooledRows(column_widths.track(rows))
+    try:
+        worksheet = workbook.create_sheet(title)
+        for index, width in enumerate(column_widths.widths(), 1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+
+        header_font = Font(bold=True)
+        header_alignment = Alignment(horizontal='center')
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = header_font
+            cell.alignment = header_alignment
+            header.append(cell)
+        worksheet.append(header)
+
+        for row in rows:
+            worksheet.append(row)
+    finally:
+        if spooled_rows:
+            spooled_rows.close()
+
+
+def write_xlsx(output_path, sheets):
+    """Write a workbook with openpyxl's write-only mode, so memory use does not depend on the
+    number of rows. output_path may be a path or a binary file object;
+    sheets is a list of (title, columns, rows) with rows as lists of values."""
+    workbook = Workbook(write_only=True)
+    for title, columns, rows in sheets:
+        write_sheet(workbook, title, columns, rows)
+    workbook.save(output_path)